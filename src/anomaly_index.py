@@ -0,0 +1,128 @@
+"""
+Compiled anomaly interval index.
+
+POS_ANOMALIES / ECOMM_ANOMALIES used to be turned into an ad-hoc
+{date: {location: {"types", "hour"}}} dict in every function that needed them,
+keeping only one "hour" per location and day and ignoring start_hour/end_hour.
+AnomalyIndex compiles an anomaly list once into per-(location, date) interval
+lists sorted by start hour:
+
+- "hour": h                        -> active during [h, h + 1)
+- "start_hour": s, "end_hour": e   -> active during [s, e)
+- neither                          -> active the whole day, [0, 24)
+
+It answers "which anomalies are active at this hour" with a dict lookup plus a
+bisect, and produces hour masks for the vectorized generators. Those only change
+the hourly series for LOAD_ANOMALY_TYPES (more cost and utilization) and
+IDLE_ANOMALY_TYPES (the service is down, so utilization drops to idle); other
+types only raise incidents.
+"""
+
+import bisect
+import datetime
+from collections import namedtuple
+
+import numpy as np
+
+Anomaly = namedtuple("Anomaly", ["location", "date", "type", "start_hour", "end_hour", "has_window"])
+
+DEFAULT_INCIDENT_HOUR = 12
+
+# Anomaly types of the POS and ecommerce profiles that change the hourly cost/utilization series
+LOAD_ANOMALY_TYPES = frozenset({
+    "Peak Event Impact", "Significant Technical Problem",
+    "DDoS Attack", "Flash Sale Gone Wrong", "Payment Processing Issues", "Unexpected Traffic Surge",
+})
+IDLE_ANOMALY_TYPES = frozenset({
+    "Unauthorized Shutdown", "System Malfunction", "Hardware Failure", "Network Connectivity Loss",
+    "Website Outage",
+})
+
+
+def parse_anomaly(anomaly):
+    """Normalize an anomaly dict (as in POS_ANOMALIES) into an Anomaly record."""
+    if isinstance(anomaly, Anomaly):
+        return anomaly
+    date = anomaly["date"]
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    if anomaly.get("hour") is not None:
+        start_hour, end_hour = anomaly["hour"], anomaly["hour"] + 1
+    elif anomaly.get("start_hour") is not None:
+        start_hour = anomaly["start_hour"]
+        end_hour = anomaly.get("end_hour", start_hour + 1)
+    else:
+        return Anomaly(anomaly["location"], date, anomaly["type"], 0, 24, False)
+    if not 0 <= start_hour < end_hour <= 24:
+        raise ValueError(f"Invalid anomaly window {start_hour}-{end_hour} in {anomaly}")
+    return Anomaly(anomaly["location"], date, anomaly["type"], start_hour, end_hour, True)
+
+
+class AnomalyIndex:
+    """Anomaly intervals keyed by (location, date)."""
+
+    def __init__(self, anomalies=()):
+        by_day = {}
+        for anomaly in anomalies:
+            record = parse_anomaly(anomaly)
+            by_day.setdefault((record.location, record.date), []).append(record)
+        self._by_day = {key: sorted(records, key=lambda r: r.start_hour) for key, records in by_day.items()}
+        self._starts = {key: [r.start_hour for r in records] for key, records in self._by_day.items()}
+        dates = {}
+        for location, date in self._by_day:
+            dates.setdefault(location, []).append(date)
+        self._dates = {location: sorted(location_dates) for location, location_dates in dates.items()}
+
+    @classmethod
+    def of(cls, anomalies):
+        """Return anomalies unchanged if already compiled, otherwise compile them."""
+        return anomalies if isinstance(anomalies, cls) else cls(anomalies or ())
+
+    def __len__(self):
+        return sum(len(records) for records in self._by_day.values())
+
+    def on(self, location, date):
+        """All anomalies for a location and day, sorted by start hour."""
+        return self._by_day.get((location, date), [])
+
+    def active(self, location, date, hour):
+        """Anomalies whose window covers the given hour."""
+        key = (location, date)
+        records = self._by_day.get(key)
+        if not records:
+            return []
+        candidates = records[:bisect.bisect_right(self._starts[key], hour)]
+        return [record for record in candidates if record.end_hour > hour]
+
+    def types_on(self, location, date):
+        return [record.type for record in self.on(location, date)]
+
+    def dates(self, location, start_date, end_date):
+        """Days with anomalies for a location within [start_date, end_date]."""
+        location_dates = self._dates.get(location, [])
+        return location_dates[bisect.bisect_left(location_dates, start_date):
+                              bisect.bisect_right(location_dates, end_date)]
+
+    def records(self, location, start_date, end_date):
+        """Anomaly records for a location within [start_date, end_date]."""
+        return [record for date in self.dates(location, start_date, end_date) for record in self.on(location, date)]
+
+    def hour_mask(self, location, grid, types=None):
+        """Boolean array over the HourGrid's hours, True while any (matching) anomaly is active."""
+        mask = np.zeros(len(grid), dtype=bool)
+        first_day = grid.days[0].astype(datetime.date)
+        last_day = grid.days[-1].astype(datetime.date)
+        for date in self.dates(location, first_day, last_day):
+            offset = (date - first_day).days * 24
+            for record in self.on(location, date):
+                if types is None or record.type in types:
+                    mask[offset + record.start_hour:offset + record.end_hour] = True
+        return mask
+
+    def effect_masks(self, location, grid):
+        """(load mask, idle mask) over the HourGrid's hours, see LOAD_ANOMALY_TYPES and IDLE_ANOMALY_TYPES."""
+        return self.hour_mask(location, grid, LOAD_ANOMALY_TYPES), self.hour_mask(location, grid, IDLE_ANOMALY_TYPES)
+
+    def incident_hour(self, record):
+        """Hour at which an incident for the anomaly is opened."""
+        return record.start_hour if record.has_window else DEFAULT_INCIDENT_HOUR
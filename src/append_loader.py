@@ -0,0 +1,144 @@
+"""
+Incremental append mode for the hourly collections.
+
+Instead of dropping the collections and regenerating YEAR_TO_GENERATE, this finds
+the latest timestamp per resource_id in cost_data and resource_utilization and
+generates only the hours after it, up to `until` (the current UTC hour by default).
+Resources listed in cloud_resources without any hourly data start on January 1st
+of YEAR_TO_GENERATE. The profile (POS or ecommerce) of a resource comes from its
+app_id and its location from the resource_id prefix, as written by the populators
+and scale_dataset.py.
+"""
+
+import datetime
+
+import numpy as np
+from pymongo import MongoClient
+
+from demo_constants import (YEAR_TO_GENERATE, MONGO_URI, DATABASE_NAME, LOCATIONS)
+from vectorized_hourly import iter_hourly_batches
+from parallel_loader import PROFILES
+from timeseries_schema import (SCHEMA_FLAT, SCHEMA_META, detect_schema_mode, document_resource_id, load_metas,
+                               resource_id_path)
+import populate_collections_pos as pos
+import populate_collection_ecommerce as ecommerce
+
+HOURLY_COLLECTIONS = ["cost_data", "resource_utilization"]
+PROFILE_APP_PREFIXES = {
+    "pos": pos.POS_APPLICATION_NAME.lower().replace(' ', '_'),
+    "ecommerce": ecommerce.ECOMM_APPLICATION_NAME.lower().replace(' ', '_'),
+}
+# Longest slug first so that no location slug shadows a longer one sharing its prefix
+LOCATION_SLUGS = sorted(((location.lower().replace(' ', '_'), location) for location in LOCATIONS),
+                        key=lambda item: -len(item[0]))
+
+
+def latest_timestamps(db, collection_name, schema_mode=SCHEMA_FLAT):
+    """
+    Latest timestamp per resource_id (meta.resource_id in the "meta" schema mode).
+
+    The $sort on (resource_id, timestamp desc) followed by $group/$first is the
+    "last point" shape that time-series collections answer from the bucket index
+    without unpacking every measurement.
+    """
+    resource_id = resource_id_path(schema_mode)
+    pipeline = [
+        {"$sort": {resource_id: 1, "timestamp": -1}},
+        {"$group": {"_id": f"${resource_id}", "latest": {"$first": "$timestamp"}}},
+    ]
+    return {row["_id"]: row["latest"] for row in db[collection_name].aggregate(pipeline)}
+
+
+def resource_location(resource_id):
+    for slug, location in LOCATION_SLUGS:
+        if resource_id.startswith(slug + "-"):
+            return location
+    return None
+
+
+def resource_profile(resource):
+    for profile, prefix in PROFILE_APP_PREFIXES.items():
+        if resource.get("app_id", "").startswith(prefix):
+            return profile
+    return None
+
+
+def plan_append(db, until, schema_mode=SCHEMA_FLAT):
+    """
+    Group resources that need the same range of hours.
+
+    Returns:
+        (groups, latest) where groups maps (profile, resume_after) to a list of
+        (resource_id, location) and latest maps collection -> resource_id -> timestamp
+    """
+    latest = {name: latest_timestamps(db, name, schema_mode) for name in HOURLY_COLLECTIONS}
+    default_start = datetime.datetime(YEAR_TO_GENERATE, 1, 1) - datetime.timedelta(hours=1)
+    groups = {}
+    for resource in db["cloud_resources"].find({}, {"resource_id": 1, "app_id": 1}):
+        resource_id = resource["resource_id"]
+        profile = resource_profile(resource)
+        location = resource_location(resource_id)
+        if profile is None or location is None:
+            print(f"Skipping {resource_id}: unknown profile or location.")
+            continue
+        resume_after = min(latest[name].get(resource_id, default_start) for name in HOURLY_COLLECTIONS)
+        if resume_after < until:
+            groups.setdefault((profile, resume_after), []).append((resource_id, location))
+    return groups, latest
+
+
+def append_hourly_data(until=None, seed=None, mongo_uri=MONGO_URI, database_name=DATABASE_NAME):
+    """
+    Generate and insert only the hours missing since the last load.
+
+    Args:
+        until: Last hour to generate, naive UTC like the stored timestamps (default: the current UTC hour)
+        seed: Seed for the numpy RNG
+
+    Returns:
+        Dict of documents inserted per collection
+    """
+    # Stored timestamps are naive UTC
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    until = (until or now).replace(minute=0, second=0, microsecond=0)
+    client = MongoClient(mongo_uri)
+    db = client[database_name]
+    rng = np.random.default_rng(seed)
+    schema_mode = detect_schema_mode(db)
+    groups, latest = plan_append(db, until, schema_mode)
+    metas = load_metas(db) if schema_mode == SCHEMA_META else None
+
+    counts = {}
+    for (profile, resume_after), resources in groups.items():
+        generate_arrays, calendar_table, anomalies = PROFILES[profile]
+        resource_ids = [resource_id for resource_id, _ in resources]
+        print(f"Appending {profile} hours after {resume_after} for {len(resource_ids)} resource(s)...")
+        hourly_batches = iter_hourly_batches(generate_arrays, resource_ids, resume_after.date(), until.date(),
+                                             calendar_table, rng, anomalies=anomalies,
+                                             locations=[location for _, location in resources], metas=metas)
+        for collection_name, docs in hourly_batches:
+            # Grids are whole days; keep only the hours this collection is missing
+            collection_latest = latest[collection_name]
+            docs = [doc for doc in docs
+                    if doc["timestamp"] <= until
+                    and doc["timestamp"] > collection_latest.get(document_resource_id(doc), resume_after)]
+            if docs:
+                db[collection_name].insert_many(docs, ordered=False)
+                counts[collection_name] = counts.get(collection_name, 0) + len(docs)
+
+    client.close()
+    for collection_name in HOURLY_COLLECTIONS:
+        print(f"Appended {counts.get(collection_name, 0)} documents to '{collection_name}'.")
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Top up cost_data/resource_utilization with the missing hours")
+    parser.add_argument("--until", type=datetime.datetime.fromisoformat, default=None,
+                        help="Last hour to generate, ISO format in UTC (default: the current UTC hour)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    append_hourly_data(until=args.until, seed=args.seed)
@@ -0,0 +1,152 @@
+"""
+Asyncio loader that overlaps hourly data generation with insertion.
+
+store_data_mongodb_hourly waits for every insert_many before generating the next
+batch. Here generation runs in a worker thread while PyMongo's AsyncMongoClient
+keeps up to max_in_flight insert batches outstanding, so on a non-local cluster
+the network round trips are hidden behind generation. The insert batch size
+adapts to the observed write latency: it grows while batches come back well under
+target_latency and shrinks when they take longer.
+"""
+
+import asyncio
+import datetime
+import random
+import time
+
+import numpy as np
+from pymongo import AsyncMongoClient, MongoClient
+
+from demo_constants import (YEAR_TO_GENERATE, MONGO_URI, DATABASE_NAME)
+from vectorized_hourly import iter_hourly_batches
+from parallel_loader import PROFILES, store_catalog, store_incidents
+from timeseries_schema import SCHEMA_META, detect_schema_mode, load_metas
+
+GENERATION_BATCH_SIZE = 1000
+DEFAULT_MAX_IN_FLIGHT = 4
+
+
+class AdaptiveBatchSizer:
+    """Adjusts insert batch size towards a target per-batch write latency."""
+
+    def __init__(self, initial=5000, minimum=500, maximum=50000, target_latency=0.5):
+        self.batch_size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+
+    def record(self, latency):
+        if latency < self.target_latency / 2:
+            size = self.batch_size * 1.5
+        elif latency > self.target_latency:
+            size = self.batch_size * self.target_latency / latency
+        else:
+            return
+        self.batch_size = int(min(self.maximum, max(self.minimum, size)))
+
+
+async def insert_batches_async(batches, db, max_in_flight=DEFAULT_MAX_IN_FLIGHT, sizer=None):
+    """
+    Insert a stream of (collection_name, documents) batches with bounded concurrency.
+
+    Args:
+        batches: Iterator of (collection_name, documents), advanced in a worker thread
+        db: AsyncDatabase to insert into
+        max_in_flight: Maximum number of concurrent insert_many calls
+        sizer: AdaptiveBatchSizer controlling the insert batch size
+
+    Returns:
+        Dict of documents inserted per collection
+    """
+    sizer = sizer or AdaptiveBatchSizer()
+    slots = asyncio.Semaphore(max_in_flight)
+    pending = set()
+    counts = {}
+    buffers = {}
+
+    async def insert(collection_name, docs):
+        try:
+            start = time.perf_counter()
+            await db[collection_name].insert_many(docs, ordered=False)
+            sizer.record(time.perf_counter() - start)
+            counts[collection_name] = counts.get(collection_name, 0) + len(docs)
+        finally:
+            slots.release()
+
+    async def dispatch(collection_name, docs):
+        await slots.acquire()
+        for task in [task for task in pending if task.done()]:
+            pending.discard(task)
+            task.result()  # surface insert errors early
+        pending.add(asyncio.create_task(insert(collection_name, docs)))
+
+    iterator = iter(batches)
+    while True:
+        item = await asyncio.to_thread(next, iterator, None)
+        if item is None:
+            break
+        collection_name, docs = item
+        buffer = buffers.setdefault(collection_name, [])
+        buffer.extend(docs)
+        while len(buffer) >= sizer.batch_size:
+            size = sizer.batch_size
+            await dispatch(collection_name, buffer[:size])
+            del buffer[:size]
+
+    for collection_name, buffer in buffers.items():
+        if buffer:
+            await dispatch(collection_name, buffer)
+    await asyncio.gather(*pending)
+    return counts
+
+
+async def reseed_async(seed=0, max_in_flight=DEFAULT_MAX_IN_FLIGHT, years=(YEAR_TO_GENERATE,), trusted_load=False):
+    """
+    Full POS + ecommerce reseed with the hourly series loaded through the async client.
+    Expects the collections to exist (see create_collections.py).
+    """
+    random.seed(seed)
+    client = MongoClient(MONGO_URI)
+    db = client[DATABASE_NAME]
+    resource_ids = store_catalog(db)
+    metas = load_metas(db) if detect_schema_mode(db) == SCHEMA_META else None
+
+    rng = np.random.default_rng(seed)
+
+    def hourly_batches():
+        for profile, ids in resource_ids.items():
+            generate_arrays, calendar, anomalies = PROFILES[profile]
+            for year in years:
+                yield from iter_hourly_batches(generate_arrays, ids.values(),
+                                               datetime.date(year, 1, 1), datetime.date(year, 12, 31),
+                                               calendar, rng, GENERATION_BATCH_SIZE,
+                                               anomalies=anomalies, locations=ids.keys(), metas=metas)
+
+    async_client = AsyncMongoClient(MONGO_URI)
+    sizer = AdaptiveBatchSizer()
+    start = time.perf_counter()
+    try:
+        counts = await insert_batches_async(hourly_batches(), async_client[DATABASE_NAME], max_in_flight, sizer)
+    finally:
+        await async_client.close()
+    elapsed = time.perf_counter() - start
+    rows = sum(counts.values())
+    print(f"Inserted {rows} hourly documents in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s, "
+          f"final batch size {sizer.batch_size}).")
+
+    store_incidents(db, resource_ids, years, trusted_load)
+    client.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reseed the FinOps demo dataset with overlapped async inserts")
+    parser.add_argument("--in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT, help="Concurrent insert batches")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trusted-load", action="store_true",
+                        help="Bypass the $jsonSchema validators when inserting incidents and problems")
+    args = parser.parse_args()
+
+    asyncio.run(reseed_async(seed=args.seed, max_in_flight=args.in_flight, trusted_load=args.trusted_load))
+    print("\nCMDB-like data generation and storage complete.")
@@ -0,0 +1,70 @@
+"""
+Buffered, unordered bulk inserts for the populators.
+
+Incidents and problems used to be written with one insert_one per document,
+which on a remote cluster means one round trip each. BufferedInserter collects
+documents per collection and flushes them with unordered insert_many once
+batch_size is reached. With trusted_load=True the inserts bypass the $jsonSchema
+validators installed by create_collections, for loads of generator output that
+is already known to be well formed.
+"""
+
+from pymongo.errors import BulkWriteError
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class BufferedInserter:
+    """Per-collection insert buffer with a single-line progress counter."""
+
+    def __init__(self, db, batch_size=DEFAULT_BATCH_SIZE, trusted_load=False, show_progress=True):
+        self.db = db
+        self.batch_size = batch_size
+        self.trusted_load = trusted_load
+        self.show_progress = show_progress
+        self.buffers = {}
+        self.inserted = {}
+        self.rejected = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, collection_name, document):
+        buffer = self.buffers.setdefault(collection_name, [])
+        buffer.append(document)
+        if len(buffer) >= self.batch_size:
+            self.flush(collection_name)
+
+    def flush(self, collection_name=None):
+        names = [collection_name] if collection_name else list(self.buffers)
+        for name in names:
+            docs = self.buffers.get(name)
+            if not docs:
+                continue
+            self.buffers[name] = []
+            try:
+                result = self.db[name].insert_many(docs, ordered=False,
+                                                   bypass_document_validation=self.trusted_load)
+                inserted = len(result.inserted_ids)
+            except BulkWriteError as e:
+                # Unordered: every valid document is still written, only the failures are reported
+                errors = e.details.get("writeErrors", [])
+                inserted = e.details.get("nInserted", len(docs) - len(errors))
+                self.rejected[name] = self.rejected.get(name, 0) + len(errors)
+                if errors:
+                    print(f"\n{len(errors)} document(s) rejected by '{name}': {errors[0].get('errmsg')}")
+            self.inserted[name] = self.inserted.get(name, 0) + inserted
+            self._print_progress()
+
+    def close(self):
+        self.flush()
+        if self.show_progress and self.inserted:
+            print()
+
+    def _print_progress(self):
+        if self.show_progress:
+            summary = ", ".join(f"{name}: {count}" for name, count in self.inserted.items())
+            print(f"\rInserted {summary}", end="", flush=True)
@@ -0,0 +1,126 @@
+"""
+Shared calendar feature table for the POS and ecommerce generators.
+
+The populators used to rebuild their holiday list and re-derive the weekday,
+weekend and weekly pattern for every generated hour. CalendarTable precomputes
+one row of features per day (weekday, weekend, holiday, weekly pattern and a
+profile-specific seasonal multiplier) for a range of years. Scalar lookups are
+O(1) by day ordinal, and the same columns are exposed as NumPy arrays for the
+vectorized hour grids. The table extends itself when asked about a year outside
+its range.
+"""
+
+import datetime
+from collections import namedtuple
+
+import numpy as np
+
+WEEKLY_PATTERNS = ["Lower", "Normal", "Peak"]
+
+DayFeatures = namedtuple("DayFeatures", ["weekday", "weekend", "holiday", "weekly_pattern", "seasonal_multiplier"])
+
+POS_HOLIDAYS = [
+    datetime.date(2024, 1, 1), datetime.date(2024, 2, 14), datetime.date(2024, 5, 12),
+    datetime.date(2024, 5, 27), datetime.date(2024, 6, 16),
+    datetime.date(2024, 7, 4), datetime.date(2024, 9, 2), datetime.date(2024, 10, 31),
+    datetime.date(2024, 11, 28), datetime.date(2024, 11, 29), datetime.date(2024, 12, 25),
+    datetime.date(2025, 1, 1), datetime.date(2025, 2, 14), 
+    datetime.date(2025, 2, 17), datetime.date(2025, 5, 11),
+    datetime.date(2025, 5, 26), datetime.date(2025, 6, 15),
+    datetime.date(2025, 7, 4), datetime.date(2025, 9, 1), datetime.date(2025, 10, 31),
+    datetime.date(2025, 11, 27), datetime.date(2025, 11, 28), datetime.date(2025, 12, 25)
+]
+
+ECOMM_HOLIDAYS = [
+    datetime.date(2024, 1, 1),  # New Year's Day
+    datetime.date(2024, 2, 14), # Valentine's Day
+    datetime.date(2024, 5, 12), # Mother's Day
+    datetime.date(2024, 5, 27), # Memorial Day
+    datetime.date(2024, 6, 16), # Father's Day
+    datetime.date(2024, 7, 4),  # Independence Day
+    datetime.date(2024, 9, 2),  # Labor Day
+    datetime.date(2024, 11, 28),# Thanksgiving
+    datetime.date(2024, 11, 29),# Black Friday
+    datetime.date(2024, 12, 2),  # Cyber Monday
+    datetime.date(2024, 12, 25),# Christmas Day
+    datetime.date(2025, 1, 1),   # New Year's Day
+    datetime.date(2025, 2, 14),  # Valentine's Day
+    datetime.date(2025, 2, 17),  # Presidents' Day
+    datetime.date(2025, 5, 11),  # Mother's Day (2nd Sunday in May)
+    datetime.date(2025, 5, 26),  # Memorial Day
+    datetime.date(2025, 6, 15),  # Father's Day (3rd Sunday in June)
+    datetime.date(2025, 7, 4),   # Independence Day
+    datetime.date(2025, 9, 1),   # Labor Day
+    datetime.date(2025, 11, 27), # Thanksgiving Day
+    datetime.date(2025, 11, 28), # Black Friday (Day after Thanksgiving)
+    datetime.date(2025, 12, 1),  # Cyber Monday (First Monday after Thanksgiving)
+    datetime.date(2025, 12, 25), # Christmas Day
+]
+
+
+def weekly_pattern_for(weekday):
+    if weekday < 4:  # Monday to Thursday
+        return "Lower"
+    elif weekday == 4:  # Friday
+        return "Normal"
+    else:  # Saturday and Sunday
+        return "Peak"
+
+
+class CalendarTable:
+    """Per-day calendar features for a holiday calendar and seasonality profile."""
+
+    def __init__(self, holidays=(), seasonality=None, start_year=None, end_year=None):
+        self.holidays = frozenset(holidays)
+        self.seasonality = seasonality
+        years = [day.year for day in self.holidays] or [datetime.date.today().year]
+        self._build(start_year or min(years), end_year or max(years))
+
+    def _build(self, start_year, end_year):
+        self.start_year = start_year
+        self.end_year = end_year
+        self.start_ordinal = datetime.date(start_year, 1, 1).toordinal()
+        days = [datetime.date.fromordinal(ordinal) for ordinal in
+                range(self.start_ordinal, datetime.date(end_year, 12, 31).toordinal() + 1)]
+        self._rows = []
+        for day in days:
+            weekday = day.weekday()
+            self._rows.append(DayFeatures(
+                weekday=weekday,
+                weekend=weekday >= 5,
+                holiday=day in self.holidays,
+                weekly_pattern=weekly_pattern_for(weekday),
+                seasonal_multiplier=self.seasonality(day) if self.seasonality else 1.0,
+            ))
+        self.weekday = np.array([row.weekday for row in self._rows])
+        self.weekend = self.weekday >= 5
+        self.holiday = np.array([row.holiday for row in self._rows])
+        self.weekly_pattern = np.array([WEEKLY_PATTERNS.index(row.weekly_pattern) for row in self._rows])
+        self.seasonal_multiplier = np.array([row.seasonal_multiplier for row in self._rows])
+        self.month = np.array([day.month for day in days])
+
+    def _ensure(self, year):
+        if year < self.start_year or year > self.end_year:
+            self._build(min(year, self.start_year), max(year, self.end_year))
+
+    def features(self, date):
+        offset = date.toordinal() - self.start_ordinal
+        if offset < 0 or offset >= len(self._rows):
+            self._ensure(date.year)
+            offset = date.toordinal() - self.start_ordinal
+        return self._rows[offset]
+
+    def is_weekend(self, date):
+        return self.features(date).weekend
+
+    def is_holiday(self, date):
+        return self.features(date).holiday
+
+    def get_weekly_pattern(self, date):
+        return self.features(date).weekly_pattern
+
+    def day_slice(self, start_date, end_date):
+        """Slice of the per-day arrays covering [start_date, end_date]."""
+        self._ensure(start_date.year)
+        self._ensure(end_date.year)
+        return slice(start_date.toordinal() - self.start_ordinal, end_date.toordinal() - self.start_ordinal + 1)
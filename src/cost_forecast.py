@@ -0,0 +1,256 @@
+"""
+Batched seasonal cost forecasts for every resource and application.
+
+The generators shape hourly cost multiplicatively: a peak-hour factor (10:00-20:00)
+and a weekend factor on top of a base level. The model mirrors that in log space,
+
+    log(cost[t]) = level + trend * day(t) + hour_of_day(t) + day_of_week(t)
+
+and fits it to all series in one least-squares solve: the series share the hourly
+grid, so they share one design matrix and numpy solves for every series' coefficients
+at once instead of fitting one model per loop iteration. Missing hours are filled
+with the series' mean for that hour of day before fitting.
+
+Forecasts are written to the forecasts collection, one document per series
+(_id "resource:<resource_id>" or "app:<app_id>") with daily totals, an
+approximate 95% interval and the in-sample error. The agent's get_cost_forecast
+tool reads them.
+
+    python src/cost_forecast.py --history-days 28 --horizon-days 14
+"""
+
+import datetime
+import time
+import warnings
+
+import numpy as np
+from pymongo import MongoClient, ReplaceOne
+
+from demo_constants import (MONGO_URI, DATABASE_NAME)
+from timeseries_schema import detect_schema_mode, document_resource_id, resource_id_path
+
+FORECASTS_COLLECTION = "forecasts"
+LEVELS = ["resource", "app"]
+DEFAULT_HISTORY_DAYS = 28
+DEFAULT_HORIZON_DAYS = 14
+MIN_OBSERVED_DAYS = 7
+# Costs are rounded to 4 decimals by the generators; keeps log() finite for zero costs
+MIN_COST = 1e-4
+FILL_REFITS = 10
+
+
+def hour_grid(start, hours):
+    """Hourly datetime64 grid starting at start."""
+    return np.datetime64(start.replace(tzinfo=None), "h") + np.arange(hours).astype("timedelta64[h]")
+
+
+def design_matrix(timestamps, origin):
+    """
+    Regressors for the hourly grid: intercept, linear trend in days since origin,
+    hour of day and day of week (one-hot, first level dropped).
+    """
+    hours = timestamps.astype("datetime64[h]").astype(np.int64)
+    hour_of_day = hours % 24
+    # 1970-01-01 was a Thursday; shift so Monday is 0 like datetime.weekday()
+    day_of_week = (hours // 24 + 3) % 7
+    days = (hours - np.datetime64(origin, "h").astype(np.int64)) / 24.0
+    columns = [np.ones(len(timestamps)), days]
+    columns += [(hour_of_day == h).astype(float) for h in range(1, 24)]
+    columns += [(day_of_week == d).astype(float) for d in range(1, 7)]
+    return np.column_stack(columns)
+
+
+def fill_missing(matrix, timestamps):
+    """Replace NaN cells with the series' mean for the same hour of day (its overall mean as fallback)."""
+    filled = matrix.copy()
+    hour_of_day = timestamps.astype("datetime64[h]").astype(np.int64) % 24
+    with warnings.catch_warnings():
+        # All-NaN rows ("Mean of empty slice") fall back further down
+        warnings.simplefilter("ignore", RuntimeWarning)
+        overall = np.nanmean(matrix, axis=1)
+        for h in range(24):
+            columns = hour_of_day == h
+            hourly = np.nanmean(matrix[:, columns], axis=1)
+            hourly = np.where(np.isnan(hourly), overall, hourly)
+            block = filled[:, columns]
+            filled[:, columns] = np.where(np.isnan(block), hourly[:, None], block)
+    return filled
+
+
+def fit_seasonal(matrix, timestamps, refits=FILL_REFITS):
+    """
+    Fit every row of a (series x hours) cost matrix at once. After the first fit,
+    missing hours are refilled with the fitted values and the model refitted, so
+    gaps do not pull the weekday/weekend effects towards the hourly mean.
+
+    Returns:
+        (coefficients of shape (regressors, series), in-sample RMSE per series in cost units)
+    """
+    X = design_matrix(timestamps, timestamps[0])
+    # One pseudo-inverse serves every series and every refit
+    solve = np.linalg.pinv(X)
+    missing = np.isnan(matrix)
+    y = np.log(np.maximum(fill_missing(matrix, timestamps), MIN_COST))
+    coefficients = solve @ y.T
+    for _ in range(refits if missing.any() else 0):
+        y = np.where(missing, (X @ coefficients).T, y)
+        coefficients = solve @ y.T
+    fitted = np.exp(X @ coefficients).T
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        rmse = np.sqrt(np.nanmean((matrix - fitted) ** 2, axis=1))
+    return coefficients, rmse
+
+
+def predict(coefficients, timestamps, origin):
+    """Hourly cost forecasts (series x hours) for the given grid."""
+    return np.exp(design_matrix(timestamps, origin) @ coefficients).T
+
+
+def load_cost_matrix(db, start, hours, schema_mode=None):
+    """
+    Hourly cost per resource on [start, start + hours).
+
+    Returns:
+        (resource_ids, matrix of shape (resources, hours) with NaN for missing hours)
+    """
+    schema_mode = schema_mode or detect_schema_mode(db)
+    end = start + datetime.timedelta(hours=hours)
+    projection = {"_id": 0, resource_id_path(schema_mode): 1, "timestamp": 1, "cost": 1}
+    rows, ids, columns, values = {}, [], [], []
+    for doc in db["cost_data"].find({"timestamp": {"$gte": start, "$lt": end}}, projection, batch_size=10000):
+        resource_id = document_resource_id(doc)
+        ids.append(rows.setdefault(resource_id, len(rows)))
+        columns.append(int((doc["timestamp"].replace(tzinfo=None) - start.replace(tzinfo=None)).total_seconds()
+                           // 3600))
+        values.append(doc.get("cost"))
+    matrix = np.full((len(rows), hours), np.nan)
+    if rows:
+        matrix[np.asarray(ids), np.asarray(columns)] = np.asarray(values, dtype=float)
+    return list(rows), matrix
+
+
+def aggregate_series(keys, matrix, group_of):
+    """
+    Sum resource rows into group rows (e.g. apps); an hour stays NaN only when no
+    resource of the group has a point for it.
+
+    Returns:
+        (group keys, group matrix)
+    """
+    groups = sorted({group_of[key] for key in keys if group_of.get(key) is not None})
+    index = {group: i for i, group in enumerate(groups)}
+    sums = np.zeros((len(groups), matrix.shape[1]))
+    seen = np.zeros((len(groups), matrix.shape[1]), dtype=bool)
+    rows = [(i, index[group_of[key]]) for i, key in enumerate(keys) if group_of.get(key) is not None]
+    if rows:
+        source, target = (np.asarray(part) for part in zip(*rows))
+        np.add.at(sums, target, np.nan_to_num(matrix[source]))
+        np.logical_or.at(seen, target, ~np.isnan(matrix[source]))
+    return groups, np.where(seen, sums, np.nan)
+
+
+def forecast_documents(level, keys, matrix, history_start, horizon_days, generated_at, app_of=None):
+    """
+    Fit the series and build one forecasts document per series with enough history.
+
+    Returns:
+        List of documents with daily forecasts and their approximate 95% interval
+    """
+    hours = matrix.shape[1]
+    history = hour_grid(history_start, hours)
+    observed_days = (~np.isnan(matrix)).reshape(len(keys), -1, 24).any(axis=2).sum(axis=1)
+    usable = np.flatnonzero(observed_days >= MIN_OBSERVED_DAYS)
+    if len(usable) == 0:
+        return []
+    coefficients, rmse = fit_seasonal(matrix[usable], history)
+    future = hour_grid(history_start + datetime.timedelta(hours=hours), horizon_days * 24)
+    daily = predict(coefficients, future, history[0]).reshape(len(usable), horizon_days, 24).sum(axis=2)
+    # Hourly errors treated as independent within a day
+    margin = 1.96 * rmse * np.sqrt(24)
+    days = [(history_start + datetime.timedelta(hours=hours, days=d)).replace(tzinfo=None) for d in range(horizon_days)]
+    history_end = (history_start + datetime.timedelta(hours=hours)).replace(tzinfo=None)
+    documents = []
+    for i, row in enumerate(usable):
+        key = keys[row]
+        documents.append({
+            "_id": f"{level}:{key}",
+            "level": level,
+            "key": key,
+            "app_id": key if level == "app" else (app_of or {}).get(key),
+            "generated_at": generated_at,
+            "history_start": history_start.replace(tzinfo=None),
+            "history_end": history_end,
+            "horizon_days": horizon_days,
+            "daily": [{"date": day, "cost": float(daily[i, d]), "lower": float(max(0.0, daily[i, d] - margin[i])),
+                       "upper": float(daily[i, d] + margin[i])} for d, day in enumerate(days)],
+            "total_cost": float(daily[i].sum()),
+            "rmse": float(rmse[i]),
+            "model": "log-linear trend + hour-of-day + day-of-week",
+        })
+    return documents
+
+
+def run_forecasts(history_days=DEFAULT_HISTORY_DAYS, horizon_days=DEFAULT_HORIZON_DAYS, levels=LEVELS, db=None,
+                  schema_mode=None):
+    """
+    Forecast every resource and app from the last history_days of cost_data.
+
+    Returns:
+        Dict with the series forecast per level and the fit time in seconds
+    """
+    client = None
+    if db is None:
+        client = MongoClient(MONGO_URI)
+        db = client[DATABASE_NAME]
+    latest = db["cost_data"].find_one({}, {"timestamp": 1}, sort=[("timestamp", -1)])
+    if latest is None:
+        print("No cost data to forecast.")
+        if client is not None:
+            client.close()
+        return {}
+    # Whole days ending with the latest day of data
+    history_end = latest["timestamp"].replace(hour=0, minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+    history_start = history_end - datetime.timedelta(days=history_days)
+
+    start = time.perf_counter()
+    resource_ids, matrix = load_cost_matrix(db, history_start, history_days * 24, schema_mode)
+    load_seconds = time.perf_counter() - start
+    app_of = {doc["resource_id"]: doc.get("app_id")
+              for doc in db["cloud_resources"].find({}, {"resource_id": 1, "app_id": 1})}
+
+    generated_at = datetime.datetime.now(datetime.timezone.utc)
+    start = time.perf_counter()
+    documents = []
+    for level in levels:
+        if level == "resource":
+            documents += forecast_documents(level, resource_ids, matrix, history_start, horizon_days, generated_at,
+                                            app_of)
+        else:
+            apps, app_matrix = aggregate_series(resource_ids, matrix, app_of)
+            documents += forecast_documents(level, apps, app_matrix, history_start, horizon_days, generated_at)
+    fit_seconds = time.perf_counter() - start
+
+    if documents:
+        db[FORECASTS_COLLECTION].bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in documents],
+                                            ordered=False)
+    # Series that dropped out (no longer enough history) lose their stale forecast
+    db[FORECASTS_COLLECTION].delete_many({"level": {"$in": list(levels)}, "generated_at": {"$lt": generated_at}})
+    counts = {level: sum(1 for doc in documents if doc["level"] == level) for level in levels}
+    print(f"Loaded {len(resource_ids)} resource series in {load_seconds:.1f}s; fitted {sum(counts.values())} "
+          f"series ({counts}) in {fit_seconds:.2f}s; {horizon_days}-day forecasts written to '{FORECASTS_COLLECTION}'.")
+    if client is not None:
+        client.close()
+    return {"series": counts, "load_seconds": load_seconds, "fit_seconds": fit_seconds}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Forecast daily cost for every resource and application")
+    parser.add_argument("--history-days", type=int, default=DEFAULT_HISTORY_DAYS, help="Days of history to fit")
+    parser.add_argument("--horizon-days", type=int, default=DEFAULT_HORIZON_DAYS, help="Days to forecast")
+    parser.add_argument("--levels", nargs="+", choices=LEVELS, default=LEVELS)
+    args = parser.parse_args()
+
+    run_forecasts(args.history_days, args.horizon_days, args.levels)
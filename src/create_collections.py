@@ -9,18 +9,28 @@ This script creates MongoDB collections with proper validation schemas and confi
 - incidents
 - problems
 - resource_utilization (time series)
+
+With --schema-mode meta the time series use a metaField subdocument
+(see timeseries_schema.py) instead of the bare resource_id. Their bucketing
+(--granularity or --bucket-span) and block compressor (--block-compressor)
+are configurable; timeseries_benchmark.py compares the settings.
 """
 
 from pymongo import MongoClient
 from pymongo.operations import SearchIndexModel
 
 from demo_constants import (YEAR_TO_GENERATE, MONGO_URI, DATABASE_NAME, LOCATIONS)
+from timeseries_schema import (SCHEMA_FLAT, SCHEMA_MODES, GRANULARITIES, DEFAULT_GRANULARITY, BLOCK_COMPRESSORS,
+                               detect_schema_mode, storage_options, timeseries_options)
+from index_advisor import advise, format_keys
 
-def create_collections():
+def create_collections(schema_mode=SCHEMA_FLAT, granularity=DEFAULT_GRANULARITY, bucket_span_seconds=None,
+                       block_compressor=None, database_name=DATABASE_NAME):
         
     # Connect to MongoDB
     client = MongoClient(MONGO_URI)
-    db = client[DATABASE_NAME]
+    db = client[database_name]
+    timeseries = timeseries_options(schema_mode, granularity, bucket_span_seconds)
 
     # Drop existing collections if they exist
     collections = [
@@ -95,11 +105,8 @@ def create_collections():
     # Create cost_data collection (time series)
     db.create_collection(
         "cost_data",
-        timeseries={
-            "timeField": "timestamp",
-            "metaField": "resource_id",
-            "granularity": "hours"
-        }
+        timeseries=timeseries,
+        **storage_options(block_compressor)
     )
     print("Created cost_data collection (time series)")
 
@@ -165,11 +172,8 @@ def create_collections():
     # Create resource_utilization collection (time series)
     db.create_collection(
         "resource_utilization",
-        timeseries={
-            "timeField": "timestamp",
-            "metaField": "resource_id",
-            "granularity": "hours"
-        }
+        timeseries=timeseries,
+        **storage_options(block_compressor)
     )
     print("Created resource_utilization collection (time series)")
 
@@ -181,12 +185,16 @@ def create_collections():
     print("\nCollection creation completed successfully!")
     
 
-def create_indexes():
+def create_indexes(schema_mode=None):
     """
     Create indexes for the collections to improve query performance.
+
+    Besides the single-field indexes below, builds the compound indexes that
+    index_advisor.py proposes for the agent tool and view query shapes.
     """
     client = MongoClient(MONGO_URI)
     db = client[DATABASE_NAME]
+    schema_mode = schema_mode or detect_schema_mode(db)
 
     # Create indexes for applications collection
     db.applications.create_index("app_id")
@@ -202,6 +210,12 @@ def create_indexes():
     db.problems.create_index("problem_id")
     db.problems.create_index("app_id")
     print("Created indexes for problems collection")
+
+    # Create the compound indexes matching the agent tool and view query shapes
+    for collection_name, proposals in advise(schema_mode).items():
+        for proposal in proposals:
+            db[collection_name].create_index(proposal["keys"])
+            print(f"Created index ({format_keys(proposal['keys'])}) on {collection_name}")
     
     # Create your search index model, then create the search index
     search_index_model = SearchIndexModel(
@@ -221,5 +235,20 @@ def create_indexes():
         
 
 if __name__ == "__main__":
-    #create_collections()
-    create_indexes()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create the FinOps demo collections and indexes")
+    parser.add_argument("--schema-mode", choices=SCHEMA_MODES, default=SCHEMA_FLAT,
+                        help="metaField layout of cost_data/resource_utilization (default: flat)")
+    parser.add_argument("--granularity", choices=GRANULARITIES, default=DEFAULT_GRANULARITY,
+                        help="Time-series bucketing granularity (default: hours)")
+    parser.add_argument("--bucket-span", type=int, default=None,
+                        help="Custom bucketMaxSpanSeconds/bucketRoundingSeconds instead of --granularity (MongoDB 6.3+)")
+    parser.add_argument("--block-compressor", choices=BLOCK_COMPRESSORS, default=None,
+                        help="WiredTiger block compressor of the time series (default: server default, snappy)")
+    parser.add_argument("--indexes-only", action="store_true", help="Only create the indexes")
+    args = parser.parse_args()
+
+    if not args.indexes_only:
+        create_collections(args.schema_mode, args.granularity, args.bucket_span, args.block_compressor)
+    create_indexes(None if args.indexes_only else args.schema_mode)
\ No newline at end of file
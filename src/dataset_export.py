@@ -0,0 +1,278 @@
+"""
+Offline Parquet export of the FinOps dataset and a bulk loader for it.
+
+export_dataset generates the same dataset as parallel_loader.reseed_parallel for a
+given seed, but writes it to a directory of Parquet files instead of MongoDB:
+
+    <output_dir>/applications/part-00000.parquet
+    <output_dir>/cloud_resources/part-00000.parquet
+    <output_dir>/cost_data/year=2024/month=01/pos-austin.parquet
+    <output_dir>/resource_utilization/year=2024/month=01/pos-austin.parquet
+    <output_dir>/incidents/part-00000.parquet
+    <output_dir>/problems/part-00000.parquet
+
+The hourly collections are partitioned like the parallel loader's (location, month)
+shards, so a subset can be picked by path and the files can be inspected with
+pandas or pyarrow. load_dataset streams the files back into MongoDB: each worker
+process reads a file in large record batches, encodes them to BSON up front
+(RawBSONDocument) and issues unordered insert_many calls.
+
+Parquet has no notion of an absent field, so fields that are None are dropped on
+load. pyarrow is only needed for this module.
+"""
+
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bson
+from bson.raw_bson import RawBSONDocument
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from demo_constants import (YEAR_TO_GENERATE, MONGO_URI, DATABASE_NAME)
+from parallel_loader import generate_catalog, plan_shards, generate_shard_batches, store_incidents
+from timeseries_schema import SCHEMA_FLAT, SCHEMA_META, SCHEMA_MODES, build_metas
+
+COLLECTIONS = ["applications", "cloud_resources", "cost_data", "resource_utilization", "incidents", "problems"]
+EXPORT_BATCH_SIZE = 5000
+LOAD_BATCH_SIZE = 50000
+
+_worker_db = None
+
+
+def _require_pyarrow():
+    if pq is None:
+        raise ImportError("pyarrow is required for Parquet export/load. Install with: pip install pyarrow")
+
+
+def table_from_docs(docs):
+    """
+    Arrow table with a column for every field of any document. pa.Table.from_pylist
+    takes the columns from the first document only, which would drop fields that only
+    some documents have (e.g. POS vs. ecommerce incidents); missing fields become nulls,
+    which drop_nulls removes again on load.
+    """
+    columns = {}
+    for doc in docs:
+        for key in doc:
+            columns.setdefault(key, None)
+    return pa.Table.from_pydict({key: [doc.get(key) for doc in docs] for key in columns})
+
+
+def _init_worker(mongo_uri, database_name):
+    global _worker_db
+    _worker_db = MongoClient(mongo_uri)[database_name]
+
+
+class ParquetDatasetWriter:
+    """
+    Sink with BufferedInserter's add/flush/close interface that appends documents to
+    Parquet part files, one directory per collection.
+    """
+
+    def __init__(self, output_dir, batch_size=EXPORT_BATCH_SIZE):
+        _require_pyarrow()
+        self.output_dir = output_dir
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.inserted = {}
+        self.files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, collection_name, document):
+        buffer = self.buffers.setdefault(collection_name, [])
+        buffer.append(document)
+        if len(buffer) >= self.batch_size:
+            self.flush(collection_name)
+
+    def flush(self, collection_name=None):
+        names = [collection_name] if collection_name else list(self.buffers)
+        for name in names:
+            docs = self.buffers.get(name)
+            if docs:
+                self.buffers[name] = []
+                self.write_table(name, docs)
+
+    def close(self):
+        self.flush()
+
+    def write_table(self, collection_name, docs, partition=None, file_name=None):
+        """Write docs as one Parquet file and return its path."""
+        directory = os.path.join(self.output_dir, collection_name, *(partition or []))
+        os.makedirs(directory, exist_ok=True)
+        if file_name is None:
+            file_name = f"part-{len(os.listdir(directory)):05d}.parquet"
+        path = os.path.join(directory, file_name)
+        pq.write_table(table_from_docs(docs), path)
+        self.inserted[collection_name] = self.inserted.get(collection_name, 0) + len(docs)
+        self.files.append(path)
+        return path
+
+    def write_shard(self, shard):
+        """Stream one (location, month) shard into one file per hourly collection."""
+        partition = [f"year={shard['year']}", f"month={shard['month']:02d}"]
+        file_name = f"{shard['profile']}-{shard['location'].lower().replace(' ', '_')}.parquet"
+        writers = {}
+        try:
+            for collection_name, docs in generate_shard_batches(shard):
+                table = table_from_docs(docs)
+                if collection_name not in writers:
+                    directory = os.path.join(self.output_dir, collection_name, *partition)
+                    os.makedirs(directory, exist_ok=True)
+                    path = os.path.join(directory, file_name)
+                    writers[collection_name] = pq.ParquetWriter(path, table.schema)
+                    self.files.append(path)
+                writers[collection_name].write_table(table)
+                self.inserted[collection_name] = self.inserted.get(collection_name, 0) + len(docs)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+
+def export_dataset(output_dir, seed=0, years=(YEAR_TO_GENERATE,), schema_mode=SCHEMA_FLAT):
+    """
+    Generate the demo dataset into Parquet files without a database.
+
+    Args:
+        output_dir: Directory to write the dataset into
+        seed: Base seed; the same seed reproduces reseed_parallel's documents
+        years: Iterable of years to generate
+        schema_mode: "flat" or "meta" hourly documents; must match the target collections
+
+    Returns:
+        Dict with per-collection row counts, elapsed seconds and rows_per_second
+    """
+    random.seed(seed)
+    start = time.perf_counter()
+    writer = ParquetDatasetWriter(output_dir)
+
+    applications, resources, resource_ids = generate_catalog()
+    writer.write_table("applications", applications)
+    writer.write_table("cloud_resources", resources)
+
+    metas = build_metas(resources, applications) if schema_mode == SCHEMA_META else None
+    shards = []
+    for profile, ids in resource_ids.items():
+        shards.extend(plan_shards(profile, ids, years, seed, metas=metas))
+    for done, shard in enumerate(shards, start=1):
+        writer.write_shard(shard)
+        print(f"\rShards exported: {done}/{len(shards)}", end="", flush=True)
+    print()
+
+    store_incidents(None, resource_ids, years, writer=writer)
+    writer.close()
+
+    elapsed = time.perf_counter() - start
+    rows = sum(writer.inserted.values())
+    return {"counts": dict(writer.inserted), "rows": rows, "elapsed_seconds": elapsed,
+            "rows_per_second": rows / elapsed if elapsed > 0 else 0.0}
+
+
+def iter_dataset_files(input_dir, collections=None):
+    """Yield (collection_name, path) for every Parquet file of the selected collections."""
+    for collection_name in collections or COLLECTIONS:
+        root = os.path.join(input_dir, collection_name)
+        for directory, _, files in sorted(os.walk(root)):
+            for file_name in sorted(files):
+                if file_name.endswith(".parquet"):
+                    yield collection_name, os.path.join(directory, file_name)
+
+
+def drop_nulls(value):
+    """Recursively remove None-valued fields (Parquet fills absent struct fields with nulls)."""
+    if isinstance(value, dict):
+        return {key: drop_nulls(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [drop_nulls(item) for item in value]
+    return value
+
+
+def iter_encoded_batches(path, batch_size=LOAD_BATCH_SIZE):
+    """Read a Parquet file in record batches and encode every row to BSON."""
+    _require_pyarrow()
+    for record_batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield [RawBSONDocument(bson.encode(drop_nulls(row))) for row in record_batch.to_pylist()]
+
+
+def load_file(task):
+    """Worker entry point: insert one Parquet file with the worker's own client."""
+    collection_name, path, batch_size, trusted_load = task
+    inserted = rejected = 0
+    for docs in iter_encoded_batches(path, batch_size):
+        try:
+            _worker_db[collection_name].insert_many(docs, ordered=False, bypass_document_validation=trusted_load)
+            inserted += len(docs)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            inserted += e.details.get("nInserted", len(docs) - len(errors))
+            rejected += len(errors)
+    return collection_name, inserted, rejected
+
+
+def load_dataset(input_dir, collections=None, max_workers=None, batch_size=LOAD_BATCH_SIZE, trusted_load=False,
+                 mongo_uri=MONGO_URI, database_name=DATABASE_NAME):
+    """
+    Stream an exported dataset into MongoDB, one file per worker task.
+    Expects the collections to exist (see create_collections.py).
+
+    Returns:
+        Dict with per-collection inserted/rejected counts, elapsed seconds and rows_per_second
+    """
+    tasks = [(collection_name, path, batch_size, trusted_load)
+             for collection_name, path in iter_dataset_files(input_dir, collections)]
+    counts, rejected = {}, {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(mongo_uri, database_name)) as executor:
+        for done, (collection_name, inserted, failed) in enumerate(executor.map(load_file, tasks), start=1):
+            counts[collection_name] = counts.get(collection_name, 0) + inserted
+            if failed:
+                rejected[collection_name] = rejected.get(collection_name, 0) + failed
+            print(f"\rFiles loaded: {done}/{len(tasks)}", end="", flush=True)
+    print()
+    elapsed = time.perf_counter() - start
+    rows = sum(counts.values())
+    return {"counts": counts, "rejected": rejected, "rows": rows, "elapsed_seconds": elapsed,
+            "rows_per_second": rows / elapsed if elapsed > 0 else 0.0}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the FinOps dataset to Parquet, or load an export into MongoDB")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Generate the dataset into Parquet files")
+    export_parser.add_argument("output_dir")
+    export_parser.add_argument("--seed", type=int, default=0)
+    export_parser.add_argument("--years", type=int, nargs="+", default=[YEAR_TO_GENERATE])
+    export_parser.add_argument("--schema-mode", choices=SCHEMA_MODES, default=SCHEMA_FLAT,
+                               help="metaField layout of the hourly documents (default: flat)")
+    load_parser = subparsers.add_parser("load", help="Stream an exported dataset into MongoDB")
+    load_parser.add_argument("input_dir")
+    load_parser.add_argument("--collections", nargs="+", choices=COLLECTIONS, default=None)
+    load_parser.add_argument("--workers", type=int, default=None)
+    load_parser.add_argument("--batch-size", type=int, default=LOAD_BATCH_SIZE)
+    load_parser.add_argument("--trusted-load", action="store_true", help="Bypass the $jsonSchema validators")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        report = export_dataset(args.output_dir, seed=args.seed, years=args.years, schema_mode=args.schema_mode)
+    else:
+        report = load_dataset(args.input_dir, collections=args.collections, max_workers=args.workers,
+                              batch_size=args.batch_size, trusted_load=args.trusted_load)
+    for collection_name, count in report["counts"].items():
+        print(f"- {collection_name}: {count}")
+    print(f"{report['rows']} rows in {report['elapsed_seconds']:.1f}s ({report['rows_per_second']:,.0f} rows/s)")
@@ -1,6 +1,11 @@
 # Contents of src/constants.py
 
 MONGO_URI = "mongodb+srv://credentials@cluster-server/?appName=DemoApp"
+# Shared agent client pool (optional, see mongo_pool.py)
+MONGO_MAX_POOL_SIZE = 50
+MONGO_MIN_POOL_SIZE = 0
+MONGO_WAIT_QUEUE_TIMEOUT_MS = 10000
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 10000
 VOYAGEAI_API_KEY = "vai-api-key"
 OPENAI_API_KEY = "sk-proj-openai-api-key"
 
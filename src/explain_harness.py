@@ -0,0 +1,271 @@
+"""
+Explain-plan regression harness.
+
+Runs every query the demo issues with explain("executionStats") against a seeded
+database and compares the plans with a stored baseline:
+
+- the find() calls of the finops_agent tools, captured with index_advisor's
+  recording FinOpsContext and replayed with values taken from the database
+- the gen_mv_* view and rollup pipelines (without their $merge stage, which explain
+  cannot run)
+- the $vectorSearch and hybrid search pipelines (search_pipelines.py), using an
+  existing incident embedding as query vector; they only run on Atlas
+
+For each query it records docs and keys examined, docs returned, whether the plan
+has a COLLSCAN or a blocking in-memory sort, and the execution time. A query
+regresses when it gains a COLLSCAN or a blocking sort, examines clearly more
+documents, gets clearly slower, or stops running. Seed the database the same way
+for every run (e.g. parallel_loader.py --seed 42) so the numbers are comparable.
+
+    python src/explain_harness.py --update-baseline   # record the baseline
+    python src/explain_harness.py                     # exits 1 on regression
+"""
+
+import json
+import os
+import sys
+import time
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from demo_constants import (MONGO_URI, DATABASE_NAME)
+from gen_mv_cloud_waste import cloud_waste_pipeline
+from gen_mv_cost_anomalies import cost_anomaly_pipeline, cost_spike_pipeline
+from gen_mv_cost_rollups import app_trend_pipeline, resource_rollup_pipeline
+from index_advisor import record_tool_calls, tool_calls
+from search_pipelines import hybrid_search_pipeline, vector_search_pipeline
+from timeseries_schema import detect_schema_mode
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "explain_baseline.json")
+EXAMINED_RATIO = 1.5
+EXAMINED_SLACK = 100
+TIME_RATIO = 3.0
+TIME_SLACK_MS = 50
+SEARCH_QUERY = "payment gateway timeout"
+
+# Explain output keys that echo the command or describe plans that did not run
+_SKIPPED_KEYS = {"command", "originalCommand", "rejectedPlans", "allPlansExecution", "serverInfo", "serverParameters"}
+
+
+def tool_queries(db):
+    """
+    The agent tool find() calls, with an app_id and business unit from the database.
+
+    Returns:
+        List of {"name", "collection", "filter", "sort", "limit"}
+    """
+    import finops_agent
+
+    app = db["applications"].find_one({}, {"app_id": 1, "business_unit": 1}) or {}
+    calls = tool_calls(finops_agent, app_id=app.get("app_id", "app"), business_unit=app.get("business_unit", "Retail"))
+    queries, names = [], set()
+    for query in record_tool_calls(calls).queries:
+        name = f"{query['source']}:{'+'.join(query['filter']) or 'all'}"
+        while name in names:
+            name += "'"
+        names.add(name)
+        queries.append(dict(query, name=name))
+    return queries
+
+
+def view_queries(schema_mode):
+    """The gen_mv_* pipelines, minus the $merge/$out stage."""
+    def without_output(pipeline):
+        return [stage for stage in pipeline if "$merge" not in stage and "$out" not in stage]
+
+    return [
+        {"name": "mv_cloud_waste", "collection": "resource_utilization",
+         "pipeline": without_output(cloud_waste_pipeline(schema_mode=schema_mode))},
+        {"name": "mv_cost_anomalies", "collection": "cost_data",
+         "pipeline": without_output(cost_anomaly_pipeline(schema_mode=schema_mode))},
+        {"name": "mv_cost_spikes", "collection": "cost_data",
+         "pipeline": without_output(cost_spike_pipeline(schema_mode=schema_mode))},
+        {"name": "cost_rollups:resource_month", "collection": "cost_data",
+         "pipeline": without_output(resource_rollup_pipeline("month", schema_mode=schema_mode))},
+        {"name": "cost_rollups:app_trend", "collection": "costs_per_resource",
+         "pipeline": without_output(app_trend_pipeline())},
+    ]
+
+
+def search_queries(db, query=SEARCH_QUERY):
+    """The incident search pipelines, or [] when no incident has an embedding yet."""
+    doc = db["incidents"].find_one({"embedding": {"$exists": True}}, {"embedding": 1})
+    if doc is None:
+        print("Skipping search pipelines: no incident embeddings (run gen_embeddings.py).")
+        return []
+    return [
+        {"name": "semantic_search", "collection": "incidents", "pipeline": vector_search_pipeline(doc["embedding"])},
+        {"name": "hybrid_search", "collection": "incidents",
+         "pipeline": hybrid_search_pipeline(query, doc["embedding"])},
+    ]
+
+
+def explain_command(query):
+    if "pipeline" in query:
+        return {"aggregate": query["collection"], "pipeline": query["pipeline"], "cursor": {}}
+    command = {"find": query["collection"], "filter": query["filter"]}
+    if query.get("sort"):
+        command["sort"] = dict(query["sort"])
+    if query.get("limit"):
+        command["limit"] = query["limit"]
+    return command
+
+
+def _walk(node, summary):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key in _SKIPPED_KEYS:
+                continue
+            if key == "stage" and isinstance(value, str):
+                summary["stages"].add(value)
+            elif key == "$sort":
+                summary["stages"].add("$sort")
+            elif key == "collectionScans" and value:
+                summary["stages"].add("COLLSCAN")
+            elif key == "totalDocsExamined":
+                summary["docs_examined"] += value
+            elif key == "totalKeysExamined":
+                summary["keys_examined"] += value
+            elif key in ("executionTimeMillis", "executionTimeMillisEstimate"):
+                summary["execution_ms"] = max(summary["execution_ms"], value)
+            _walk(value, summary)
+    elif isinstance(node, list):
+        for item in node:
+            _walk(item, summary)
+
+
+def summarize_explain(explain):
+    """
+    Reduce an explain("executionStats") document to the metrics the harness compares.
+    Handles find and aggregate output, with or without a "stages" list.
+
+    Returns:
+        Dict with docs_examined, keys_examined, returned, collscan, blocking_sort,
+        execution_ms and the sorted plan stage names
+    """
+    summary = {"docs_examined": 0, "keys_examined": 0, "execution_ms": 0, "stages": set()}
+    _walk(explain, summary)
+    if "executionStats" in explain:
+        returned = explain["executionStats"].get("nReturned")
+    else:
+        returned = (explain.get("stages") or [{}])[-1].get("nReturned")
+    stages = summary.pop("stages")
+    summary.update(returned=returned, collscan="COLLSCAN" in stages,
+                   blocking_sort="SORT" in stages or "$sort" in stages, stages=sorted(stages))
+    return summary
+
+
+def explain_query(db, query):
+    """Run one query with explain("executionStats") and summarize it (or record the error)."""
+    start = time.perf_counter()
+    try:
+        explain = db.command("explain", explain_command(query), verbosity="executionStats")
+    except PyMongoError as e:
+        return {"error": str(e).split(", full error")[0]}
+    summary = summarize_explain(explain)
+    summary["wall_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return summary
+
+
+def run_harness(db, include_tools=True):
+    """
+    Explain every query.
+
+    Returns:
+        Dict with the dataset "counts" and per-query "queries" summaries
+    """
+    queries = []
+    if include_tools:
+        try:
+            queries += tool_queries(db)
+        except ImportError as e:
+            print(f"Skipping agent tool queries, finops_agent could not be imported: {e}")
+    queries += view_queries(detect_schema_mode(db))
+    queries += search_queries(db)
+
+    results = {}
+    for query in queries:
+        results[query["name"]] = explain_query(db, query)
+    counts = {name: db[name].estimated_document_count()
+              for name in sorted({query["collection"] for query in queries})}
+    return {"counts": counts, "queries": results}
+
+
+def compare_to_baseline(report, baseline, examined_ratio=EXAMINED_RATIO, time_ratio=TIME_RATIO):
+    """
+    Plan regressions of a harness report against a stored one.
+
+    Returns:
+        List of human-readable regression messages (empty when nothing regressed)
+    """
+    regressions = []
+    for name, before in baseline.get("queries", {}).items():
+        after = report["queries"].get(name)
+        if after is None:
+            continue
+        if "error" in after:
+            if "error" not in before:
+                regressions.append(f"{name}: no longer runs ({after['error']})")
+            continue
+        if "error" in before:
+            continue
+        if after["collscan"] and not before["collscan"]:
+            regressions.append(f"{name}: now uses a COLLSCAN")
+        if after["blocking_sort"] and not before["blocking_sort"]:
+            regressions.append(f"{name}: now sorts in memory")
+        allowed = max(before["docs_examined"] * examined_ratio, before["docs_examined"] + EXAMINED_SLACK)
+        if after["docs_examined"] > allowed:
+            regressions.append(f"{name}: examines {after['docs_examined']} docs (baseline {before['docs_examined']})")
+        if after["execution_ms"] > before["execution_ms"] * time_ratio + TIME_SLACK_MS:
+            regressions.append(f"{name}: takes {after['execution_ms']} ms (baseline {before['execution_ms']} ms)")
+    return regressions
+
+
+def print_report(report):
+    print(f"{'query':45} {'examined':>10} {'keys':>10} {'returned':>9} {'ms':>7}  plan")
+    for name, result in report["queries"].items():
+        if "error" in result:
+            print(f"{name:45} error: {result['error']}")
+            continue
+        flags = [flag for flag, on in (("COLLSCAN", result["collscan"]), ("SORT", result["blocking_sort"])) if on]
+        returned = "-" if result["returned"] is None else result["returned"]
+        print(f"{name:45} {result['docs_examined']:>10} {result['keys_examined']:>10} {returned:>9} "
+              f"{result['execution_ms']:>7}  {' '.join(flags) or 'ok'}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Explain every demo query and compare the plans with a baseline")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--skip-tools", action="store_true", help="Skip the agent tools (no finops_agent import)")
+    parser.add_argument("--examined-ratio", type=float, default=EXAMINED_RATIO)
+    parser.add_argument("--time-ratio", type=float, default=TIME_RATIO)
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    report = run_harness(client[DATABASE_NAME], include_tools=not args.skip_tools)
+    client.close()
+    print_report(report)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        sys.exit(0)
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first.")
+        sys.exit(0)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("counts") != report["counts"]:
+        print(f"Warning: document counts differ from the baseline ({baseline.get('counts')}); "
+              "seed the database the same way for comparable plans.")
+    regressions = compare_to_baseline(report, baseline, args.examined_ratio, args.time_ratio)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} plan regression(s) against {args.baseline}")
+    sys.exit(1 if regressions else 0)
@@ -8,10 +8,12 @@ from typing import List, Dict, Any, Optional, Union
 from pydantic import BaseModel, Field
 from pydantic_ai import Agent, RunContext
 from pymongo import MongoClient
+from pymongo.asynchronous.collection import AsyncCollection
 from pymongo.collection import Collection
 import os
 from enum import Enum
 import demo_constants
+import mongo_pool
 
 
 # Pydantic Models for structured data
@@ -78,6 +80,24 @@ class CostTrend(BaseModel):
     cost_change_percentage: Optional[float] = None
 
 
+class ForecastPoint(BaseModel):
+    date: datetime
+    cost: float
+    lower: float
+    upper: float
+
+
+class CostForecast(BaseModel):
+    level: str
+    key: str
+    app_id: Optional[str] = None
+    generated_at: datetime
+    history_end: datetime
+    total_cost: float
+    rmse: float
+    daily: List[ForecastPoint]
+
+
 class Problem(BaseModel):
     problem_id: str
     app_id: str
@@ -113,16 +133,34 @@ class FinOpsContext(BaseModel):
         self.debug_mode = demo_constants.AGENT_DEBUG
         
     def get_client(self) -> MongoClient:
-        return MongoClient(self.connection_string)
+        # Process-wide pooled client, shared by every tool call and context
+        return mongo_pool.get_client(self.connection_string)
     
     def get_collection(self, collection_name: str) -> Collection:
         client = self.get_client()
         db = client[self.database_name]
         return db[collection_name]
 
+    def get_async_collection(self, collection_name: str) -> AsyncCollection:
+        # Shared AsyncMongoClient of the running event loop, used by the tools
+        client = mongo_pool.get_async_client(self.connection_string)
+        return client[self.database_name][collection_name]
+
+    def close(self):
+        """Close the shared client (e.g. on shutdown); later calls open a new one"""
+        mongo_pool.close_clients()
+
+    async def aclose(self):
+        """Close the shared async client of the running event loop and the shared sync client"""
+        await mongo_pool.close_async_clients()
+        mongo_pool.close_clients()
+
 
 # Tool Functions
-def get_applications(ctx: RunContext[FinOpsContext], business_unit: Optional[str] = None) -> List[Application]:
+# The tools are coroutines on PyMongo's async API, so tool calls the model requests
+# in one step run concurrently and never block the CLI or FastAPI event loop.
+# index_advisor and explain_harness record their queries through ShapeRecorder.
+async def get_applications(ctx: RunContext[FinOpsContext], business_unit: Optional[str] = None) -> List[Application]:
     """
     Retrieve applications, optionally filtered by business unit.
     
@@ -132,17 +170,17 @@ def get_applications(ctx: RunContext[FinOpsContext], business_unit: Optional[str
     Returns:
         List of applications
     """
-    collection = ctx.deps.get_collection("applications")
+    collection = ctx.deps.get_async_collection("applications")
     
     filter_query = {}
     if business_unit:
         filter_query["business_unit"] = {"$regex": business_unit, "$options": "i"}
     
-    apps = list(collection.find(filter_query))
+    apps = await collection.find(filter_query).to_list()
     return [Application(**app) for app in apps]
 
 
-def get_cloud_resources(
+async def get_cloud_resources(
     ctx: RunContext[FinOpsContext], 
     app_id: Optional[str] = None,
     environment: Optional[Environment] = None,
@@ -159,7 +197,7 @@ def get_cloud_resources(
     Returns:
         List of cloud resources
     """
-    collection = ctx.deps.get_collection("cloud_resources")
+    collection = ctx.deps.get_async_collection("cloud_resources")
     
     filter_query = {}
     if app_id:
@@ -169,11 +207,11 @@ def get_cloud_resources(
     if provider:
         filter_query["provider"] = provider.value
     
-    resources = list(collection.find(filter_query))
+    resources = await collection.find(filter_query).to_list()
     return [CloudResource(**resource) for resource in resources]
 
 
-def analyze_waste(
+async def analyze_waste(
     ctx: RunContext[FinOpsContext],
     app_id: Optional[str] = None,
     business_unit: Optional[str] = None,
@@ -190,7 +228,7 @@ def analyze_waste(
     Returns:
         List of waste analysis results
     """
-    collection = ctx.deps.get_collection("cloud_waste")
+    collection = ctx.deps.get_async_collection("cloud_waste")
     
     filter_query = {}
     if app_id:
@@ -201,7 +239,7 @@ def analyze_waste(
         filter_query["waste_percentage"] = {"$gte": min_waste_percentage}
     
     # Sort by waste percentage descending to prioritize biggest opportunities
-    waste_data = list(collection.find(filter_query).sort("waste_percentage", -1))
+    waste_data = await collection.find(filter_query).sort("waste_percentage", -1).to_list()
     
     return [WasteAnalysis(
         resource_id=item["_id"],
@@ -217,7 +255,7 @@ def analyze_waste(
     ) for item in waste_data]
 
 
-def get_cost_trends(
+async def get_cost_trends(
     ctx: RunContext[FinOpsContext],
     app_id: Optional[str] = None,
     days_back: int = 30
@@ -232,18 +270,53 @@ def get_cost_trends(
     Returns:
         Cost trend data
     """
-    collection = ctx.deps.get_collection("costs_trend_per_app")
+    collection = ctx.deps.get_async_collection("costs_trend_per_app")
     
-    filter_query = {}
+    # Daily rollups (see gen_mv_cost_rollups.py), so days_back maps to documents
+    filter_query = {"granularity": "day"}
     if app_id:
         filter_query["app_id"] = app_id
     
     # Get cost trends sorted by date
-    trends = list(collection.find(filter_query).sort("period_start", -1).limit(days_back))
+    trends = await collection.find(filter_query).sort("period_start", -1).limit(days_back).to_list()
     return trends
 
 
-def get_problems_and_incidents(
+async def get_cost_forecast(
+    ctx: RunContext[FinOpsContext],
+    app_id: Optional[str] = None,
+    resource_id: Optional[str] = None,
+    days_ahead: int = 7
+) -> List[CostForecast]:
+    """
+    Get forecast daily costs, with a 95% interval, for applications or resources.
+    
+    Args:
+        app_id: Forecast of one application (default: all applications)
+        resource_id: Forecast of one resource instead of an application
+        days_ahead: Number of forecast days to return
+    
+    Returns:
+        Cost forecasts, highest forecast spend first
+    """
+    collection = ctx.deps.get_async_collection("forecasts")
+    
+    # Written by cost_forecast.py, one document per app or resource
+    if resource_id:
+        filter_query = {"_id": f"resource:{resource_id}"}
+    elif app_id:
+        filter_query = {"_id": f"app:{app_id}"}
+    else:
+        filter_query = {"level": "app"}
+    
+    forecasts = await collection.find(filter_query).sort("total_cost", -1).to_list()
+    for forecast in forecasts:
+        forecast["daily"] = forecast["daily"][:days_ahead]
+        forecast["total_cost"] = sum(day["cost"] for day in forecast["daily"])
+    return [CostForecast(**forecast) for forecast in forecasts]
+
+
+async def get_problems_and_incidents(
     ctx: RunContext[FinOpsContext],
     app_id: Optional[str] = None,
     include_resolved: bool = False
@@ -258,7 +331,7 @@ def get_problems_and_incidents(
     Returns:
         List of problems
     """
-    collection = ctx.deps.get_collection("problems")
+    collection = ctx.deps.get_async_collection("problems")
     
     filter_query = {}
     if app_id:
@@ -266,11 +339,11 @@ def get_problems_and_incidents(
     if not include_resolved:
         filter_query["resolution_date"] = {"$exists": False}
     
-    problems = list(collection.find(filter_query).sort("priority", 1))
+    problems = await collection.find(filter_query).sort("priority", 1).to_list()
     return [Problem(**problem) for problem in problems]
 
 
-def calculate_potential_savings(
+async def calculate_potential_savings(
     ctx: RunContext[FinOpsContext],
     business_unit: Optional[str] = None
 ) -> Dict[str, float]:
@@ -283,7 +356,7 @@ def calculate_potential_savings(
     Returns:
         Savings summary
     """
-    waste_analysis = analyze_waste(ctx, business_unit=business_unit, min_waste_percentage=10.0)
+    waste_analysis = await analyze_waste(ctx, business_unit=business_unit, min_waste_percentage=10.0)
     
     total_monthly_cost = sum(w.monthly_cost for w in waste_analysis)
     total_waste_cost = sum(w.estimated_waste_cost for w in waste_analysis)
@@ -297,7 +370,7 @@ def calculate_potential_savings(
     }
 
 
-def get_top_cost_drivers(
+async def get_top_cost_drivers(
     ctx: RunContext[FinOpsContext],
     limit: int = 10
 ) -> List[Dict[str, Any]]:
@@ -310,10 +383,10 @@ def get_top_cost_drivers(
     Returns:
         Top cost drivers
     """
-    collection = ctx.deps.get_collection("costs_per_application")
+    collection = ctx.deps.get_async_collection("costs_per_application")
     
     # Get applications sorted by total cost
-    cost_drivers = list(collection.find().sort("total_cost", -1).limit(limit))
+    cost_drivers = await collection.find().sort("total_cost", -1).limit(limit).to_list()
     return cost_drivers
 
 
@@ -338,6 +411,7 @@ finops_agent = Agent(
     - Analyze cloud resource utilization and waste
     - Calculate potential savings from optimization efforts
     - Track cost trends across different time periods
+    - Forecast daily spend per application or resource
     - Correlate problems/incidents with financial impact
     - Generate executive summaries and detailed reports
 
@@ -354,6 +428,7 @@ finops_agent = Agent(
         get_cloud_resources, 
         analyze_waste,
         get_cost_trends,
+        get_cost_forecast,
         get_problems_and_incidents,
         calculate_potential_savings,
         get_top_cost_drivers
@@ -389,6 +464,7 @@ async def demo_finops_agent():
         except Exception as e:
             print(f"❌ Error: {str(e)}")
         print("-" * 30)
+    await context.aclose()
 
 
 # CLI Interface for the agent
@@ -413,6 +489,8 @@ class FinOpsAgentCLI:
                     break
                 elif query.lower() == 'help':
                     self.show_help()
+                elif query.lower() == 'pool':
+                    print(f"\n🔌 {mongo_pool.pool_stats()}")
                 elif query:
                     result = await finops_agent.run(query, deps=self.context)
                     print(f"\n📊 {result.data}")
@@ -422,6 +500,7 @@ class FinOpsAgentCLI:
                 break
             except Exception as e:
                 print(f"❌ Error: {str(e)}")
+        await self.context.aclose()
     
     def show_help(self):
         print("""
@@ -430,9 +509,11 @@ class FinOpsAgentCLI:
 - Analyze waste for [app_id/business_unit]  
 - Calculate savings for [business_unit]
 - Show cost trends for [app_id]
+- Forecast costs for [app_id]
 - List open problems with cost impact
 - Show top cost drivers
 - Generate executive summary
+- pool - Show MongoDB connection pool metrics
 - help - Show this help
 - quit - Exit the application
         """)
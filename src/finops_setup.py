@@ -102,6 +102,7 @@ async def test_agent_basic_query():
 # Enhanced FinOps Agent with configuration
 from finops_agent import finops_agent, FinOpsContext
 import logging
+import mongo_pool
 
 
 class ConfiguredFinOpsAgent:
@@ -116,7 +117,7 @@ class ConfiguredFinOpsAgent:
         if not validation["valid"]:
             raise ValueError(f"Configuration errors: {', '.join(validation['issues'])}")
         
-        # Initialize context
+        # Initialize context (tool calls share the process-wide pooled MongoDB clients)
         self.context = FinOpsContext()
         
         # Set up OpenAI (if using OpenAI models)
@@ -155,9 +156,18 @@ class ConfiguredFinOpsAgent:
             "database": self.config.database_name,
             "debug_mode": self.config.debug_mode,
             "tools_available": len(finops_agent.tool),
+            "mongo_pool": mongo_pool.pool_stats(),
             "status": "ready"
         }
 
+    def close(self):
+        """Close the shared MongoDB client"""
+        self.context.close()
+
+    async def aclose(self):
+        """Close the shared MongoDB clients, including the async client of the running event loop"""
+        await self.context.aclose()
+
 
 # Web API using FastAPI (optional)
 try:
@@ -176,7 +186,12 @@ try:
     def create_finops_api(config_file: str = ".env") -> FastAPI:
         """Create FastAPI application for FinOps agent"""
         app = FastAPI(title="FinOps AI Agent API", version="1.0.0")
-        agent = ConfiguredFinOpsAgent(config_file)
+        # Configuration comes from demo_constants; config_file is kept for compatibility
+        agent = ConfiguredFinOpsAgent()
+        
+        @app.on_event("shutdown")
+        async def close_mongo_client():
+            await agent.aclose()
         
         @app.get("/")
         async def root():
@@ -186,6 +201,10 @@ try:
         async def get_agent_info():
             return agent.get_agent_info()
         
+        @app.get("/agent/pool")
+        async def get_pool_stats():
+            return mongo_pool.pool_stats()
+        
         @app.post("/query", response_model=QueryResponse)
         async def query_agent(request: QueryRequest):
             import time
@@ -219,3 +238,4 @@ if __name__ == "__main__":
         agent = ConfiguredFinOpsAgent()
         print("FinOps Agent configured and ready!")
         print(f"Agent info: {agent.get_agent_info()}")
+        agent.close()
@@ -2,57 +2,36 @@ from datetime import datetime, tzinfo, timezone
 from pymongo import MongoClient
 
 from demo_constants import MONGO_URI, DATABASE_NAME
+from timeseries_schema import SCHEMA_FLAT, SCHEMA_META, detect_schema_mode, resource_id_path
+from gen_mv_cost_rollups import WATERMARKS_COLLECTION, watermark_upper_bound
 
 # This script creates a MongoDB view to identify cost anomalies in cloud resources.
 
-def create_cloud_waste_view(viewname='mv_cloud_waste'):
-    client = MongoClient(MONGO_URI)
-    db = client[DATABASE_NAME]
-    collection = db['resource_utilization']
-    
-    collection.aggregate([
+# Resource and application fields of the view, taken from the joined documents (flat
+# schema) or straight from the metaField subdocument (meta schema, no joins needed)
+DETAIL_FIELDS = {
+    SCHEMA_FLAT: {
+        'app_id': '$app_details.app_id', 
+        'app_name': '$app_details.name', 
+        'business_unit': '$app_details.business_unit', 
+        'resource_type': '$resource_details.resource_type', 
+        'environment': '$resource_details.environment', 
+    },
+    SCHEMA_META: {
+        'app_id': '$meta.app_id', 
+        'app_name': '$meta.app_name', 
+        'business_unit': '$meta.business_unit', 
+        'resource_type': '$meta.resource_type', 
+        'environment': '$meta.environment', 
+    },
+}
+
+def detail_lookup_stages(schema_mode):
+    """$lookup/$unwind stages resolving resource and application details (flat schema only)."""
+    if schema_mode == SCHEMA_META:
+        return []
+    return [
         {
-            '$match': {
-                'timestamp': {
-                    '$gte': datetime(2024, 12, 1, 0, 0, 0, tzinfo=timezone.utc), 
-                    '$lte': datetime(2024, 12, 31, 0, 0, 0, tzinfo=timezone.utc)
-                }
-            }
-        }, {
-            '$group': {
-                '_id': '$resource_id', 
-                'avg_cpu_utilization': {
-                    '$avg': '$cpu_utilization'
-                }, 
-                'avg_memory_utilization': {
-                    '$avg': '$memory_utilization'
-                }, 
-                'app_id': {
-                    '$first': '$resource_id'
-                }
-            }
-        }, {
-            '$addFields': {
-                'average_utilization': {
-                    '$avg': [
-                        '$avg_cpu_utilization', '$avg_memory_utilization', '$avg_storage_utilization'
-                    ]
-                }, 
-                'waste_percentage': {
-                    '$multiply': [
-                        {
-                            '$subtract': [
-                                1, {
-                                    '$avg': [
-                                        '$avg_cpu_utilization', '$avg_memory_utilization', '$avg_storage_utilization'
-                                    ]
-                                }
-                            ]
-                        }, 100
-                    ]
-                }
-            }
-        }, {
             '$lookup': {
                 'from': 'cloud_resources', 
                 'localField': '_id', 
@@ -70,13 +49,19 @@ def create_cloud_waste_view(viewname='mv_cloud_waste'):
             }
         }, {
             '$unwind': '$app_details'
-        }, {
+        }
+    ]
+
+def correlated_cost_stages(resource_id, start, end):
+    """Original plan: a correlated $lookup into cost_data per resource group."""
+    return [
+        {
             '$lookup': {
                 'from': 'cost_data', 
                 'let': {
                     'resource_id': '$_id', 
-                    'start_date': datetime(2024, 12, 1, 0, 0, 0, tzinfo=timezone.utc), 
-                    'end_date': datetime(2024, 12, 31, 0, 0, 0, tzinfo=timezone.utc)
+                    'start_date': start, 
+                    'end_date': end
                 }, 
                 'pipeline': [
                     {
@@ -85,7 +70,7 @@ def create_cloud_waste_view(viewname='mv_cloud_waste'):
                                 '$and': [
                                     {
                                         '$eq': [
-                                            '$resource_id', '$$resource_id'
+                                            f'${resource_id}', '$$resource_id'
                                         ]
                                     }, {
                                         '$gte': [
@@ -115,13 +100,115 @@ def create_cloud_waste_view(viewname='mv_cloud_waste'):
                 'path': '$cost_data', 
                 'preserveNullAndEmptyArrays': True
             }
-        }, {
+        }
+    ]
+
+def union_cost_stages(start, end):
+    """
+    Alternative plan: cost points of the window are unioned into the utilization
+    stream (see cloud_waste_pipeline) and summed by the same $group, so cost_data is
+    scanned once instead of once per resource.
+    """
+    return [
+        {
+            '$unionWith': {
+                'coll': 'cost_data', 
+                'pipeline': [
+                    {
+                        '$match': {
+                            'timestamp': {
+                                '$gte': start, 
+                                '$lte': end
+                            }
+                        }
+                    }
+                ]
+            }
+        }
+    ]
+
+COST_JOINS = ['lookup', 'union']
+
+# Default analysis window (both bounds inclusive); mv_registry.py passes rolling windows
+WINDOW_START = datetime(2024, 12, 1, 0, 0, 0, tzinfo=timezone.utc)
+WINDOW_END = datetime(2024, 12, 31, 0, 0, 0, tzinfo=timezone.utc)
+
+def cloud_waste_pipeline(viewname='mv_cloud_waste', schema_mode=SCHEMA_FLAT, start=WINDOW_START, end=WINDOW_END,
+                         cost_join='lookup'):
+    """
+    cost_join selects how the window's cost per resource is attached: 'lookup' runs
+    the correlated cost_data $lookup per resource, 'union' sums cost_data in the
+    same $group pass as the utilization (benchmarked by waste_join_benchmark.py).
+    """
+    if cost_join not in COST_JOINS:
+        raise ValueError(f"Unknown cost join '{cost_join}', expected one of {COST_JOINS}")
+    resource_id = resource_id_path(schema_mode)
+    group_meta = {'meta': {'$first': '$meta'}} if schema_mode == SCHEMA_META else {}
+    union = cost_join == 'union'
+    # Cost points carry no cpu_utilization; they only count towards total_cost
+    group_cost = {
+        'total_cost': {'$sum': '$cost'},
+        'utilization_points': {'$sum': {'$cond': [{'$eq': [{'$type': '$cpu_utilization'}, 'missing']}, 0, 1]}}
+    } if union else {}
+    # Resources with cost points only are dropped right after the $group, before the detail lookups
+    utilization_only = [{'$match': {'utilization_points': {'$gt': 0}}}] if union else []
+    cost_stages = [
+        {'$set': {'cost_data': {'total_cost': '$total_cost'}}}
+    ] if union else correlated_cost_stages(resource_id, start, end)
+    return [
+        {
+            '$match': {
+                'timestamp': {
+                    '$gte': start, 
+                    '$lte': end
+                }
+            }
+        },
+        *(union_cost_stages(start, end) if union else []),
+        {
+            '$group': {
+                '_id': f'${resource_id}', 
+                'avg_cpu_utilization': {
+                    '$avg': '$cpu_utilization'
+                }, 
+                'avg_memory_utilization': {
+                    '$avg': '$memory_utilization'
+                }, 
+                'app_id': {
+                    '$first': f'${resource_id}'
+                },
+                **group_meta,
+                **group_cost
+            }
+        },
+        *utilization_only,
+        {
+            '$addFields': {
+                'average_utilization': {
+                    '$avg': [
+                        '$avg_cpu_utilization', '$avg_memory_utilization', '$avg_storage_utilization'
+                    ]
+                }, 
+                'waste_percentage': {
+                    '$multiply': [
+                        {
+                            '$subtract': [
+                                1, {
+                                    '$avg': [
+                                        '$avg_cpu_utilization', '$avg_memory_utilization', '$avg_storage_utilization'
+                                    ]
+                                }
+                            ]
+                        }, 100
+                    ]
+                }
+            }
+        },
+        *detail_lookup_stages(schema_mode),
+        *cost_stages,
+        {
             '$project': {
-                'app_id': '$app_details.app_id', 
-                'app_name': '$app_details.name', 
-                'business_unit': '$app_details.business_unit', 
-                'resource_type': '$resource_details.resource_type', 
-                'environment': '$resource_details.environment', 
+                **DETAIL_FIELDS[schema_mode],
                 'average_utilization': {
                     '$multiply': [
                         '$average_utilization', 100
@@ -161,11 +248,201 @@ def create_cloud_waste_view(viewname='mv_cloud_waste'):
                 'whenNotMatched': 'insert'
             }
         }
-    ])
+    ]
+
+def create_cloud_waste_view(viewname='mv_cloud_waste', schema_mode=None, cost_join='lookup'):
+    client = MongoClient(MONGO_URI)
+    db = client[DATABASE_NAME]
+    collection = db['resource_utilization']
+    schema_mode = schema_mode or detect_schema_mode(db, 'resource_utilization')
+    
+    collection.aggregate(cloud_waste_pipeline(viewname, schema_mode, cost_join=cost_join))
+    
+# Incremental refresh: per (resource, month) running sums and counts of cpu and
+# memory utilization and cost are kept in cloud_waste_state. Each refresh folds in
+# only the points whose _id lies between the stored watermark and an upper bound
+# taken at the start of the run, so no point is counted twice and the cost scales
+# with the new data. As for the cost rollups, the bound lags the clock by
+# WATERMARK_GRACE: _ids are generated by the writers, and a point whose _id was
+# generated just before the run but is still in flight stays above the bound. The view is then rebuilt for every resource from the state
+# of the selected month (the latest one by default).
+
+STATE_COLLECTION = 'cloud_waste_state'
+SUM_FIELDS = {
+    'resource_utilization': {'cpu': '$cpu_utilization', 'memory': '$memory_utilization'},
+    'cost_data': {'cost': '$cost'},
+}
+
+def fold_pipeline(collection_name, id_range, schema_mode=SCHEMA_FLAT):
+    """Add the sums/counts of the points with _id in id_range to cloud_waste_state."""
+    resource_id = resource_id_path(schema_mode)
+    sums = {}
+    for name, path in SUM_FIELDS[collection_name].items():
+        sums[f'{name}_sum'] = {'$sum': path}
+        sums[f'{name}_count'] = {'$sum': {'$cond': [{'$isNumber': path}, 1, 0]}}
+    carry_meta = {'meta': {'$first': '$meta'}} if schema_mode == SCHEMA_META else {}
+    return [
+        {
+            '$match': {'_id': id_range}
+        }, {
+            '$group': {
+                '_id': {
+                    'resource_id': f'${resource_id}', 
+                    'month': {'$dateTrunc': {'date': '$timestamp', 'unit': 'month'}}
+                },
+                **sums,
+                **carry_meta
+            }
+        }, {
+            '$set': {
+                'resource_id': '$_id.resource_id', 
+                'month': '$_id.month'
+            }
+        }, {
+            '$merge': {
+                'into': STATE_COLLECTION, 
+                'on': '_id', 
+                'whenMatched': [
+                    {
+                        '$set': {
+                            field: {'$add': [{'$ifNull': [f'${field}', 0]}, f'$$new.{field}']} for field in sums
+                        }
+                    }
+                ], 
+                'whenNotMatched': 'insert'
+            }
+        }
+    ]
+
+def _average(name):
+    return {'$cond': [{'$gt': [f'${name}_count', 0]}, {'$divide': [f'${name}_sum', f'${name}_count']}, None]}
+
+def incremental_waste_pipeline(month, viewname='mv_cloud_waste', schema_mode=SCHEMA_FLAT, resource_ids=None):
+    """Rebuild the waste view from the state of one month, for every resource or only resource_ids."""
+    group_meta = {'meta': {'$first': '$meta'}} if schema_mode == SCHEMA_META else {}
+    return [
+        {
+            '$match': {
+                'month': month,
+                **({'resource_id': {'$in': sorted(resource_ids)}} if resource_ids is not None else {})
+            }
+        }, {
+            '$group': {
+                '_id': '$resource_id', 
+                **{field: {'$sum': f'${field}'} for field in
+                   ('cpu_sum', 'cpu_count', 'memory_sum', 'memory_count', 'cost_sum')},
+                **group_meta
+            }
+        }, {
+            '$addFields': {
+                'average_utilization': {'$avg': [_average('cpu'), _average('memory')]}
+            }
+        }, {
+            '$match': {'average_utilization': {'$ne': None}}
+        }, {
+            '$addFields': {
+                'waste_percentage': {'$multiply': [{'$subtract': [1, '$average_utilization']}, 100]}
+            }
+        },
+        *detail_lookup_stages(schema_mode),
+        {
+            '$project': {
+                **DETAIL_FIELDS[schema_mode],
+                'average_utilization': {'$multiply': ['$average_utilization', 100]}, 
+                'waste_percentage': 1, 
+                'monthly_cost': '$cost_sum', 
+                'estimated_waste_cost': {'$multiply': ['$cost_sum', {'$divide': ['$waste_percentage', 100]}]},
+                'period_start': month
+            }
+        }, {
+            '$merge': {
+                'into': viewname, 
+                'on': '_id', 
+                'whenMatched': 'replace', 
+                'whenNotMatched': 'insert'
+            }
+        }
+    ]
+
+def fold_new_points(db, upper, viewname='mv_cloud_waste', schema_mode=SCHEMA_FLAT):
+    """
+    Fold the points between each collection's watermark and upper into the state
+    and advance the watermarks to upper.
+
+    Returns:
+        {collection_name: _id range that was folded}
+    """
+    folded = {}
+    for collection_name in SUM_FIELDS:
+        watermark_id = f'{viewname}:{collection_name}'
+        state = db[WATERMARKS_COLLECTION].find_one({'_id': watermark_id})
+        id_range = {'$lte': upper}
+        if state:
+            id_range['$gt'] = state['last_id']
+        db[collection_name].aggregate(fold_pipeline(collection_name, id_range, schema_mode), allowDiskUse=True)
+        db[WATERMARKS_COLLECTION].replace_one({'_id': watermark_id}, {'_id': watermark_id, 'last_id': upper,
+                                                                      'updated_at': datetime.now(timezone.utc)},
+                                              upsert=True)
+        folded[collection_name] = id_range
+    return folded
+
+def refresh_cloud_waste_view(viewname='mv_cloud_waste', month=None, full=False, schema_mode=None):
+    """
+    Fold new utilization and cost points into the state and rebuild the view.
+
+    Args:
+        viewname: Output collection
+        month: First day of the month to report (default: the latest month in the state)
+        full: Drop the state and fold in all points again
+        schema_mode: "flat" or "meta" (default: detected from resource_utilization)
+
+    Returns:
+        The reported month
+    """
+    client = MongoClient(MONGO_URI)
+    db = client[DATABASE_NAME]
+    schema_mode = schema_mode or detect_schema_mode(db, 'resource_utilization')
+    if full:
+        db[STATE_COLLECTION].drop()
+        db[WATERMARKS_COLLECTION].delete_many({'_id': {'$in': [f'{viewname}:{name}' for name in SUM_FIELDS]}})
+
+    # Points with a later _id are left for the next refresh
+    upper = watermark_upper_bound()
+    for collection_name in fold_new_points(db, upper, viewname, schema_mode):
+        print(f"Folded new '{collection_name}' points into {STATE_COLLECTION}.")
+
+    if month is None:
+        latest = db[STATE_COLLECTION].find_one({}, {'month': 1}, sort=[('month', -1)])
+        if latest is None:
+            print("No utilization data to report.")
+            client.close()
+            return None
+        month = latest['month']
+    db[STATE_COLLECTION].aggregate(incremental_waste_pipeline(month, viewname, schema_mode))
+    # Resources that have no data in the reported month drop out of the view
+    db[viewname].delete_many({'period_start': {'$ne': month}})
+    client.close()
+    return month
     
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the mv_cloud_waste view")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Fold in only points since the last refresh and report every resource")
+    parser.add_argument("--month", type=lambda value: datetime.strptime(value, "%Y-%m"), default=None,
+                        help="Month to report with --incremental, YYYY-MM (default: latest)")
+    parser.add_argument("--full", action="store_true", help="With --incremental, rebuild the state from scratch")
+    parser.add_argument("--cost-join", choices=COST_JOINS, default='lookup',
+                        help="How cost_data is joined: correlated $lookup per resource or one $unionWith pass")
+    args = parser.parse_args()
+
     viewname = 'mv_cloud_waste'
-    create_cloud_waste_view(viewname)
-    print(f"View '{viewname}' created successfully.")
+    if args.incremental:
+        month = refresh_cloud_waste_view(viewname, month=args.month, full=args.full)
+        print(f"View '{viewname}' refreshed for {month:%Y-%m}." if month else f"View '{viewname}' not refreshed.")
+    else:
+        create_cloud_waste_view(viewname, cost_join=args.cost_join)
+        print(f"View '{viewname}' created successfully.")
     
         
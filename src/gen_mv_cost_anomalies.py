@@ -1,23 +1,28 @@
-from datetime import datetime, tzinfo, timezone
+from datetime import datetime, timedelta, tzinfo, timezone
 from pymongo import MongoClient
 
 from demo_constants import MONGO_URI, DATABASE_NAME
+from timeseries_schema import SCHEMA_FLAT, SCHEMA_META, detect_schema_mode, resource_id_path
 
 # This script creates a MongoDB view to identify cost anomalies in cloud resources.
 
-def create_cost_anomaly_view(viewname='mv_cost_anomalies'):
-    client = MongoClient(MONGO_URI)
-    db = client[DATABASE_NAME]
-    collection = db['cost_data']
-    
-    collection.aggregate([
+# Default months compared: points from PREVIOUS_START on, CURRENT_START splitting them
+PREVIOUS_START = datetime(2024, 9, 1, 0, 0, 0, tzinfo=timezone.utc)
+CURRENT_START = datetime(2024, 10, 1, 0, 0, 0, tzinfo=timezone.utc)
+
+def cost_anomaly_pipeline(viewname='mv_cost_anomalies', schema_mode=SCHEMA_FLAT, previous_start=PREVIOUS_START,
+                          current_start=CURRENT_START, end=None, resource_ids=None):
+    """
+    With the flat schema every cost point is joined to its resource to find the app;
+    with the meta schema app and resource details come from the metaField subdocument.
+    Points in [previous_start, current_start) are the previous month, points from
+    current_start on (up to end, exclusive, when given) the current one.
+    resource_ids restricts the pipeline to those resources (view_watcher.py deltas).
+    """
+    meta = schema_mode == SCHEMA_META
+    resource_id = resource_id_path(schema_mode)
+    resource_join = [] if meta else [
         {
-            '$match': {
-                'timestamp': {
-                    '$gte': datetime(2024, 9, 1, 0, 0, 0, tzinfo=timezone.utc)
-                }
-            }
-        }, {
             '$lookup': {
                 'from': 'cloud_resources', 
                 'localField': 'resource_id', 
@@ -26,7 +31,51 @@ def create_cost_anomaly_view(viewname='mv_cost_anomalies'):
             }
         }, {
             '$unwind': '$resource'
+        }
+    ]
+    details_join = [] if meta else [
+        {
+            '$lookup': {
+                'from': 'applications', 
+                'localField': '_id.app_id', 
+                'foreignField': 'app_id', 
+                'as': 'app_details'
+            }
         }, {
+            '$unwind': '$app_details'
+        }, {
+            '$lookup': {
+                'from': 'cloud_resources', 
+                'localField': '_id.resource_id', 
+                'foreignField': 'resource_id', 
+                'as': 'resource_details'
+            }
+        }, {
+            '$unwind': '$resource_details'
+        }
+    ]
+    carry_meta = {'meta': {'$first': '$meta'}} if meta else {}
+    details = {
+        'app_name': '$meta.app_name', 
+        'resource_type': '$meta.resource_type', 
+        'environment': '$meta.environment', 
+    } if meta else {
+        'app_name': '$app_details.name', 
+        'resource_type': '$resource_details.resource_type', 
+        'environment': '$resource_details.environment', 
+    }
+    return [
+        {
+            '$match': {
+                'timestamp': {
+                    '$gte': previous_start,
+                    **({'$lt': end} if end is not None else {})
+                },
+                **({resource_id: {'$in': sorted(resource_ids)}} if resource_ids is not None else {})
+            }
+        },
+        *resource_join,
+        {
             '$addFields': {
                 'month': {
                     '$dateToString': {
@@ -36,25 +85,30 @@ def create_cost_anomaly_view(viewname='mv_cost_anomalies'):
                 }, 
                 'is_current_month': {
                     '$gte': [
-                        '$timestamp', datetime(2024, 10, 1, 0, 0, 0, tzinfo=timezone.utc)
+                        '$timestamp', current_start
                     ]
                 }
             }
         }, {
             '$group': {
                 '_id': {
-                    'app_id': '$resource.app_id', 
-                    'resource_id': '$resource_id', 
+                    'app_id': '$meta.app_id' if meta else '$resource.app_id', 
+                    'resource_id': f'${resource_id}', 
                     'is_current_month': '$is_current_month'
                 }, 
                 'cost': {
                     '$sum': '$cost'
                 }, 
+                # Whole days, so the same day number in two months counts twice
                 'days_count': {
                     '$addToSet': {
-                        '$dayOfMonth': '$timestamp'
+                        '$dateTrunc': {
+                            'date': '$timestamp', 
+                            'unit': 'day'
+                        }
                     }
-                }
+                },
+                **carry_meta
             }
         }, {
             '$addFields': {
@@ -107,7 +161,8 @@ def create_cost_anomaly_view(viewname='mv_cost_anomalies'):
                             }, '$cost', 0
                         ]
                     }
-                }
+                },
+                **carry_meta
             }
         }, {
             '$addFields': {
@@ -139,54 +194,275 @@ def create_cost_anomaly_view(viewname='mv_cost_anomalies'):
                     '$gte': 20
                 }
             }
+        },
+        *details_join,
+        {
+            '$project': {
+                'app_id': '$_id.app_id', 
+                '_id': '$_id.resource_id', 
+                **details,
+                'previous_month_daily_avg': 1, 
+                'current_month_daily_avg': 1, 
+                'percentage_increase': 1, 
+                'previous_month_total': 1, 
+                'current_month_total': 1
+            }
+        }, {
+            '$sort': {
+                'percentage_increase': -1
+            }
+        }, {
+            '$merge':{
+                'into': viewname, 
+                'on': '_id',
+                'whenMatched': 'replace', 
+                'whenNotMatched': 'insert'
+            }
+        }
+    ]
+
+# Rolling detector: each hourly cost point is compared with the same resource's
+# previous WINDOW_HOURS hours. Points at least Z_THRESHOLD standard deviations above
+# the rolling mean are spikes; one row per resource keeps its largest spike.
+WINDOW_HOURS = 168
+Z_THRESHOLD = 3.0
+MIN_POINTS = 24
+EWMA_HOURS = 24
+
+def cost_spike_pipeline(viewname='mv_cost_spikes', schema_mode=SCHEMA_FLAT, start=CURRENT_START, end=None,
+                        window_hours=WINDOW_HOURS, threshold=Z_THRESHOLD, min_points=MIN_POINTS,
+                        ewma_hours=EWMA_HOURS):
+    """
+    Hourly spikes from start on (up to end, exclusive, when given). The window_hours
+    before start are read too, so the first points already have a full baseline.
+    The rolling statistics exclude the point itself; expected_cost is the EWMA
+    (span ewma_hours) up to the previous point.
+    """
+    meta = schema_mode == SCHEMA_META
+    resource_id = resource_id_path(schema_mode)
+    # The previous window_hours hours, excluding the point itself
+    baseline = {
+        'range': [-window_hours, -1], 
+        'unit': 'hour'
+    }
+    details_join = [] if meta else [
+        {
+            '$lookup': {
+                'from': 'cloud_resources', 
+                'localField': '_id', 
+                'foreignField': 'resource_id', 
+                'as': 'resource_details'
+            }
+        }, {
+            '$unwind': '$resource_details'
         }, {
             '$lookup': {
                 'from': 'applications', 
-                'localField': '_id.app_id', 
+                'localField': 'resource_details.app_id', 
                 'foreignField': 'app_id', 
                 'as': 'app_details'
             }
         }, {
             '$unwind': '$app_details'
+        }
+    ]
+    details = {
+        'app_id': '$meta.app_id', 
+        'app_name': '$meta.app_name', 
+        'resource_type': '$meta.resource_type', 
+        'environment': '$meta.environment', 
+    } if meta else {
+        'app_id': '$app_details.app_id', 
+        'app_name': '$app_details.name', 
+        'resource_type': '$resource_details.resource_type', 
+        'environment': '$resource_details.environment', 
+    }
+    return [
+        {
+            '$match': {
+                'timestamp': {
+                    '$gte': start - timedelta(hours=window_hours),
+                    **({'$lt': end} if end is not None else {})
+                }
+            }
         }, {
-            '$lookup': {
-                'from': 'cloud_resources', 
-                'localField': '_id.resource_id', 
-                'foreignField': 'resource_id', 
-                'as': 'resource_details'
+            '$setWindowFields': {
+                'partitionBy': f'${resource_id}', 
+                'sortBy': {
+                    'timestamp': 1
+                }, 
+                'output': {
+                    'rolling_mean': {
+                        '$avg': '$cost', 
+                        'window': baseline
+                    }, 
+                    'rolling_std': {
+                        '$stdDevPop': '$cost', 
+                        'window': baseline
+                    }, 
+                    'rolling_points': {
+                        '$count': {}, 
+                        'window': baseline
+                    }, 
+                    'ewma': {
+                        '$expMovingAvg': {
+                            'input': '$cost', 
+                            'N': ewma_hours
+                        }
+                    }
+                }
             }
         }, {
-            '$unwind': '$resource_details'
+            '$setWindowFields': {
+                'partitionBy': f'${resource_id}', 
+                'sortBy': {
+                    'timestamp': 1
+                }, 
+                'output': {
+                    'expected_cost': {
+                        '$shift': {
+                            'output': '$ewma', 
+                            'by': -1
+                        }
+                    }
+                }
+            }
+        }, {
+            '$match': {
+                'timestamp': {
+                    '$gte': start
+                }, 
+                'rolling_points': {
+                    '$gte': min_points
+                }, 
+                'rolling_std': {
+                    '$gt': 0
+                }
+            }
+        }, {
+            '$addFields': {
+                'z_score': {
+                    '$divide': [
+                        {
+                            '$subtract': [
+                                '$cost', '$rolling_mean'
+                            ]
+                        }, '$rolling_std'
+                    ]
+                }
+            }
+        }, {
+            '$match': {
+                'z_score': {
+                    '$gte': threshold
+                }
+            }
+        }, {
+            '$sort': {
+                'z_score': -1
+            }
         }, {
+            '$group': {
+                '_id': f'${resource_id}', 
+                'z_score': {
+                    '$first': '$z_score'
+                }, 
+                'spike_at': {
+                    '$first': '$timestamp'
+                }, 
+                'cost': {
+                    '$first': '$cost'
+                }, 
+                'rolling_mean': {
+                    '$first': '$rolling_mean'
+                }, 
+                'rolling_std': {
+                    '$first': '$rolling_std'
+                }, 
+                'expected_cost': {
+                    '$first': '$expected_cost'
+                }, 
+                'spike_hours': {
+                    '$sum': 1
+                }, 
+                'first_spike': {
+                    '$min': '$timestamp'
+                }, 
+                'last_spike': {
+                    '$max': '$timestamp'
+                },
+                **({'meta': {'$first': '$meta'}} if meta else {})
+            }
+        },
+        *details_join,
+        {
             '$project': {
-                'app_id': '$_id.app_id', 
-                'app_name': '$app_details.name', 
-                '_id': '$_id.resource_id', 
-                'resource_type': '$resource_details.resource_type', 
-                'environment': '$resource_details.environment', 
-                'previous_month_daily_avg': 1, 
-                'current_month_daily_avg': 1, 
-                'percentage_increase': 1, 
-                'previous_month_total': 1, 
-                'current_month_total': 1
+                **details,
+                'z_score': 1, 
+                'spike_at': 1, 
+                'cost': 1, 
+                'rolling_mean': 1, 
+                'rolling_std': 1, 
+                'expected_cost': 1, 
+                'spike_hours': 1, 
+                'first_spike': 1, 
+                'last_spike': 1, 
+                'window_hours': {
+                    '$literal': window_hours
+                }
             }
         }, {
             '$sort': {
-                'percentage_increase': -1
+                'z_score': -1
             }
         }, {
-            '$merge':{
+            '$merge': {
                 'into': viewname, 
-                'on': '_id',
+                'on': '_id', 
                 'whenMatched': 'replace', 
                 'whenNotMatched': 'insert'
             }
         }
-    ])
+    ]
+
+def create_cost_anomaly_view(viewname='mv_cost_anomalies', schema_mode=None):
+    client = MongoClient(MONGO_URI)
+    db = client[DATABASE_NAME]
+    collection = db['cost_data']
+    schema_mode = schema_mode or detect_schema_mode(db)
+    
+    collection.aggregate(cost_anomaly_pipeline(viewname, schema_mode))
+
+def create_cost_spike_view(viewname='mv_cost_spikes', schema_mode=None, start=CURRENT_START, end=None,
+                           window_hours=WINDOW_HOURS, threshold=Z_THRESHOLD):
+    client = MongoClient(MONGO_URI)
+    db = client[DATABASE_NAME]
+    collection = db['cost_data']
+    schema_mode = schema_mode or detect_schema_mode(db)
+    
+    collection.aggregate(cost_spike_pipeline(viewname, schema_mode, start, end, window_hours, threshold),
+                         allowDiskUse=True)
     
 if __name__ == "__main__":
-    viewname = 'mv_cost_anomalies'
-    create_cost_anomaly_view(viewname)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the cost anomaly views")
+    parser.add_argument("--detector", choices=['monthly', 'zscore'], default='monthly',
+                        help="monthly: daily average up 20%% month over month (mv_cost_anomalies); "
+                             "zscore: rolling hourly z-scores (mv_cost_spikes)")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=CURRENT_START,
+                        help="With --detector zscore, first hour to check, ISO format")
+    parser.add_argument("--window-hours", type=int, default=WINDOW_HOURS, help="Rolling baseline length in hours")
+    parser.add_argument("--threshold", type=float, default=Z_THRESHOLD, help="z-score flagging a spike")
+    args = parser.parse_args()
+
+    if args.detector == 'zscore':
+        viewname = 'mv_cost_spikes'
+        start = args.start if args.start.tzinfo else args.start.replace(tzinfo=timezone.utc)
+        create_cost_spike_view(viewname, start=start, window_hours=args.window_hours, threshold=args.threshold)
+    else:
+        viewname = 'mv_cost_anomalies'
+        create_cost_anomaly_view(viewname)
     print(f"View '{viewname}' created successfully.")
     
         
@@ -0,0 +1,299 @@
+import datetime
+from bson import ObjectId
+from pymongo import MongoClient
+
+from demo_constants import MONGO_URI, DATABASE_NAME
+from timeseries_schema import SCHEMA_META, detect_schema_mode, resource_id_path
+
+# This script maintains the cost rollup collections read by the FinOps agent:
+#
+#   costs_per_resource     one document per (resource, granularity, period_start)
+#   costs_trend_per_app    one document per (app, granularity, period_start)
+#   costs_per_application  one document per app with its total cost
+#
+# Granularities are day, week (starting Monday) and month. A run looks only at the
+# cost_data points with an _id above the stored watermark and at or below an upper
+# bound taken when the run starts; the bound becomes the new watermark. ObjectIds are
+# generated by the writers, so with several writers (parallel_loader workers,
+# live_feed_simulator, append_loader) they are not ordered by insert time. The bound
+# therefore lags the clock by WATERMARK_GRACE: a point whose _id was generated just
+# before the run but that is still in flight stays above it for the next run.
+# The day/week/month periods the points fall into are recomputed in full from
+# cost_data and $merge'd over the previous values, so re-running is idempotent.
+# The app level is then rebuilt from costs_per_resource for the affected apps only.
+
+GRANULARITIES = ['day', 'week', 'month']
+WATERMARKS_COLLECTION = 'rollup_watermarks'
+WATERMARK_ID = 'cost_rollups'
+WATERMARK_GRACE = datetime.timedelta(minutes=1)
+
+
+def period_start(timestamp, granularity):
+    """Start of the day/week/month containing timestamp, matching $dateTrunc."""
+    day = datetime.datetime(timestamp.year, timestamp.month, timestamp.day)
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity '{granularity}', expected one of {GRANULARITIES}")
+
+
+def next_period(start, granularity):
+    if granularity == 'day':
+        return start + datetime.timedelta(days=1)
+    if granularity == 'week':
+        return start + datetime.timedelta(days=7)
+    return (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def watermark_upper_bound(now=None, grace=WATERMARK_GRACE):
+    """Largest _id a run rolls up: ObjectIds generated up to `grace` before now."""
+    return ObjectId.from_datetime((now or datetime.datetime.now(datetime.timezone.utc)) - grace)
+
+
+def changed_ranges(db, watermark=None, upper=None, schema_mode=None):
+    """
+    First/last timestamp per resource among the cost points with watermark < _id <= upper.
+
+    Returns:
+        Dict mapping resource_id -> (first, last)
+    """
+    resource_id = resource_id_path(schema_mode)
+    id_range = {}
+    if watermark is not None:
+        id_range['$gt'] = watermark
+    if upper is not None:
+        id_range['$lte'] = upper
+    pipeline = [
+        {
+            '$group': {
+                '_id': f'${resource_id}',
+                'first': {'$min': '$timestamp'},
+                'last': {'$max': '$timestamp'}
+            }
+        }
+    ]
+    if id_range:
+        # Time-series buckets keep min/max _id, so buckets outside the range are skipped unopened
+        pipeline.insert(0, {'$match': {'_id': id_range}})
+    ranges = {}
+    for row in db['cost_data'].aggregate(pipeline, allowDiskUse=True):
+        ranges[row['_id']] = (row['first'], row['last'])
+    return ranges
+
+
+def changed_periods_match(ranges, granularity, schema_mode=None):
+    """
+    $match selecting every cost point in the periods touched by the changed ranges.
+    Resources with the same period range share one $in clause.
+    """
+    resource_id = resource_id_path(schema_mode)
+    by_range = {}
+    for rid, (first, last) in ranges.items():
+        bounds = (period_start(first, granularity), next_period(period_start(last, granularity), granularity))
+        by_range.setdefault(bounds, []).append(rid)
+    clauses = [{resource_id: {'$in': sorted(ids)}, 'timestamp': {'$gte': start, '$lt': end}}
+               for (start, end), ids in sorted(by_range.items())]
+    return clauses[0] if len(clauses) == 1 else {'$or': clauses}
+
+
+def resource_rollup_pipeline(granularity, match=None, schema_mode=None):
+    """Roll cost_data up to one costs_per_resource document per resource and period."""
+    meta = schema_mode == SCHEMA_META
+    resource_id = resource_id_path(schema_mode)
+    trunc = {'date': '$timestamp', 'unit': granularity}
+    if granularity == 'week':
+        trunc['startOfWeek'] = 'monday'
+    app_join = [] if meta else [
+        {
+            '$lookup': {
+                'from': 'cloud_resources',
+                'localField': '_id.resource_id',
+                'foreignField': 'resource_id',
+                'as': 'resource'
+            }
+        }
+    ]
+    return [
+        {'$match': match or {}},
+        {
+            '$group': {
+                '_id': {
+                    'resource_id': f'${resource_id}',
+                    'period_start': {'$dateTrunc': trunc}
+                },
+                'total_cost': {'$sum': '$cost'},
+                'points': {'$sum': 1},
+                **({'app_id': {'$first': '$meta.app_id'}} if meta else {})
+            }
+        },
+        *app_join,
+        {
+            '$project': {
+                '_id': {
+                    'resource_id': '$_id.resource_id',
+                    'granularity': granularity,
+                    'period_start': '$_id.period_start'
+                },
+                'resource_id': '$_id.resource_id',
+                'app_id': '$app_id' if meta else {'$first': '$resource.app_id'},
+                'granularity': granularity,
+                'period_start': '$_id.period_start',
+                'total_cost': 1,
+                'points': 1
+            }
+        }, {
+            '$merge': {
+                'into': 'costs_per_resource',
+                'on': '_id',
+                'whenMatched': 'replace',
+                'whenNotMatched': 'insert'
+            }
+        }
+    ]
+
+
+def app_details_stages():
+    return [
+        {
+            '$lookup': {
+                'from': 'applications',
+                'localField': 'app_id',
+                'foreignField': 'app_id',
+                'as': 'app_details'
+            }
+        }, {
+            '$set': {
+                'app_name': {'$first': '$app_details.name'},
+                'business_unit': {'$first': '$app_details.business_unit'}
+            }
+        }, {
+            '$unset': 'app_details'
+        }
+    ]
+
+
+def app_trend_pipeline(match=None):
+    """Rebuild costs_trend_per_app from costs_per_resource."""
+    return [
+        {'$match': match or {}},
+        {
+            '$group': {
+                '_id': {
+                    'app_id': '$app_id',
+                    'granularity': '$granularity',
+                    'period_start': '$period_start'
+                },
+                'total_cost': {'$sum': '$total_cost'},
+                'resource_count': {'$sum': 1}
+            }
+        }, {
+            '$set': {
+                'app_id': '$_id.app_id',
+                'granularity': '$_id.granularity',
+                'period_start': '$_id.period_start'
+            }
+        },
+        *app_details_stages(),
+        {
+            '$merge': {
+                'into': 'costs_trend_per_app',
+                'on': '_id',
+                'whenMatched': 'replace',
+                'whenNotMatched': 'insert'
+            }
+        }
+    ]
+
+
+def app_totals_pipeline(match=None):
+    """Rebuild costs_per_application (total cost per app) from the monthly rollups."""
+    return [
+        {'$match': {'granularity': 'month', **(match or {})}},
+        {
+            '$group': {
+                '_id': '$app_id',
+                'total_cost': {'$sum': '$total_cost'},
+                'first_period_start': {'$min': '$period_start'},
+                'last_period_start': {'$max': '$period_start'}
+            }
+        }, {
+            '$set': {'app_id': '$_id'}
+        },
+        *app_details_stages(),
+        {
+            '$merge': {
+                'into': 'costs_per_application',
+                'on': '_id',
+                'whenMatched': 'replace',
+                'whenNotMatched': 'insert'
+            }
+        }
+    ]
+
+
+def refresh_cost_rollups(full=False, schema_mode=None, db=None):
+    """
+    Bring the rollup collections up to date with cost_data.
+
+    Args:
+        full: Ignore the watermark and recompute every period
+        schema_mode: "flat" or "meta" (default: detected from cost_data)
+        db: Database to use (default: a new client on DATABASE_NAME)
+
+    Returns:
+        Dict with the number of resources and apps refreshed and the new watermark
+    """
+    client = None
+    if db is None:
+        client = MongoClient(MONGO_URI)
+        db = client[DATABASE_NAME]
+    schema_mode = schema_mode or detect_schema_mode(db)
+    state = None if full else db[WATERMARKS_COLLECTION].find_one({'_id': WATERMARK_ID})
+    watermark = state['last_id'] if state else None
+
+    # Points with a later _id are left for the next refresh
+    upper = watermark_upper_bound()
+    ranges = changed_ranges(db, watermark, upper, schema_mode)
+    if not ranges:
+        print("Cost rollups are up to date.")
+        if client is not None:
+            client.close()
+        return {'resources': 0, 'apps': 0, 'watermark': watermark}
+
+    for granularity in GRANULARITIES:
+        match = {} if watermark is None else changed_periods_match(ranges, granularity, schema_mode)
+        db['cost_data'].aggregate(resource_rollup_pipeline(granularity, match, schema_mode), allowDiskUse=True)
+        print(f"Rolled up {granularity} costs for {len(ranges)} resource(s).")
+
+    if watermark is None:
+        app_match = {}
+        apps = db['costs_per_resource'].distinct('app_id')
+    else:
+        apps = db['costs_per_resource'].distinct('app_id', {'resource_id': {'$in': list(ranges)}})
+        earliest = min(period_start(first, granularity)
+                       for first, _ in ranges.values() for granularity in GRANULARITIES)
+        app_match = {'app_id': {'$in': apps}, 'period_start': {'$gte': earliest}}
+    db['costs_per_resource'].aggregate(app_trend_pipeline(app_match))
+    db['costs_per_resource'].aggregate(app_totals_pipeline({'app_id': {'$in': apps}} if watermark is not None else {}))
+    print(f"Refreshed costs_trend_per_app and costs_per_application for {len(apps)} app(s).")
+
+    db[WATERMARKS_COLLECTION].replace_one(
+        {'_id': WATERMARK_ID},
+        {'_id': WATERMARK_ID, 'last_id': upper, 'updated_at': datetime.datetime.now(datetime.timezone.utc)},
+        upsert=True)
+    if client is not None:
+        client.close()
+    return {'resources': len(ranges), 'apps': len(apps), 'watermark': upper}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh the daily/weekly/monthly cost rollups from cost_data")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and recompute everything")
+    args = parser.parse_args()
+
+    refresh_cost_rollups(full=args.full)
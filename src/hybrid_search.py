@@ -12,6 +12,8 @@ from langchain_mongodb.retrievers.hybrid_search import MongoDBAtlasHybridSearchR
 
 from langchain_mongodb import MongoDBAtlasVectorSearch
 
+from search_pipelines import hybrid_search_pipeline
+
 client = pymongo.MongoClient(demo_constants.MONGO_URI)
 db = client[demo_constants.DATABASE_NAME]
 vo = voyageai.Client(api_key=demo_constants.VOYAGEAI_API_KEY)
@@ -54,148 +56,7 @@ def hybrid_search(query):
     vectorWeight = 0.8
     fullTextWeight = 0.2
     
-    documents = db.incidents.aggregate([
-            {
-                '$vectorSearch': {
-                    'index': 'vector_index', 
-                    'path': 'embedding', 
-                    'queryVector': query_embedding, 
-                    'numCandidates': 50, 
-                    'limit': 10
-                }
-            }, {
-                '$group': {
-                    '_id': None, 
-                    'docs': {
-                        '$push': '$$ROOT'
-                    }
-                }
-            }, {
-                '$unwind': {
-                    'path': '$docs', 
-                    'includeArrayIndex': 'rank'
-                }
-            }, {
-                '$addFields': {
-                    'vs_score': {
-                        '$multiply': [
-                            vectorWeight, {
-                                '$divide': [
-                                    1.0, {
-                                        '$add': [
-                                            '$rank', 60
-                                        ]
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                }
-            }, {
-                '$project': {
-                    'vs_score': 1, 
-                    '_id': '$docs._id', 
-                    'description': '$docs.description',
-                }
-            }, {
-                '$unionWith': {
-                    'coll': 'incidents', 
-                    'pipeline': [
-                        {
-                            '$search': {
-                                'index': 'search_index', 
-                                'phrase': {
-                                    'query': query, 
-                                    'path': 'description'
-                                }
-                            }
-                        }, {
-                            '$limit': 10
-                        }, {
-                            '$group': {
-                                '_id': None, 
-                                'docs': {
-                                    '$push': '$$ROOT'
-                                }
-                            }
-                        }, {
-                            '$unwind': {
-                                'path': '$docs', 
-                                'includeArrayIndex': 'rank'
-                            }
-                        }, {
-                            '$addFields': {
-                                'fts_score': {
-                                    '$multiply': [
-                                        fullTextWeight, {
-                                            '$divide': [
-                                                1.0, {
-                                                    '$add': [
-                                                        '$rank', 60
-                                                    ]
-                                                }
-                                            ]
-                                        }
-                                    ]
-                                }
-                            }
-                        }, {
-                            '$project': {
-                                'fts_score': 1, 
-                                '_id': '$docs._id', 
-                                'description': '$docs.description',
-                            }
-                        }
-                    ]
-                }
-            }, {
-                '$group': {
-                    '_id': '$_id', 
-                    'description': {
-                        '$first': '$description'
-                    }, 
-                    'vs_score': {
-                        '$max': '$vs_score'
-                    }, 
-                    'fts_score': {
-                        '$max': '$fts_score'
-                    }
-                }
-            }, {
-                '$project': {
-                    '_id': 1, 
-                    'description': 1, 
-                    'vs_score': {
-                        '$ifNull': [
-                            '$vs_score', 0
-                        ]
-                    }, 
-                    'fts_score': {
-                        '$ifNull': [
-                            '$fts_score', 0
-                        ]
-                    }
-                }
-            }, {
-                '$project': {
-                    'score': {
-                        '$add': [
-                            '$fts_score', '$vs_score'
-                        ]
-                    }, 
-                    '_id': 1, 
-                    'description': 1, 
-                    'vs_score': 1, 
-                    'fts_score': 1
-                }
-            }, {
-                '$sort': {
-                    'score': -1
-                }
-            }, {
-                '$limit': 10
-            }
-        ])
+    documents = db.incidents.aggregate(hybrid_search_pipeline(query, query_embedding, vectorWeight, fullTextWeight))
     
     
     #for doc in documents:
@@ -0,0 +1,343 @@
+"""
+Query-shape-driven index advisor.
+
+Each finops_agent tool is run against a recording stand-in for FinOpsContext,
+so the find() filters, sorts and limits it issues are captured without a
+database. Coroutine tools (the agent's, on PyMongo's async API) are awaited and
+their cursors record the query on to_list(). The leading $match/$sort of the gen_mv_* view pipelines (and of the
+sub-pipelines of their $lookup stages) are read the same way. Every shape is
+turned into a compound index with the Equality, Sort, Range rule:
+
+    equality fields  ->  sort fields (with their direction)  ->  range fields
+
+so the sort is answered by walking the index instead of an in-memory SORT
+stage. Regex, $exists and comparison operators count as range predicates.
+Indexes that are a prefix of another proposed index on the same collection
+are dropped. create_collections.create_indexes builds the result.
+"""
+
+import asyncio
+import inspect
+from collections import namedtuple
+from types import SimpleNamespace
+
+from gen_mv_cloud_waste import cloud_waste_pipeline, incremental_waste_pipeline
+from gen_mv_cost_anomalies import cost_anomaly_pipeline
+from gen_mv_cost_rollups import app_totals_pipeline, app_trend_pipeline
+from timeseries_schema import SCHEMA_FLAT, SCHEMA_MODES
+
+QueryShape = namedtuple("QueryShape", ["source", "collection", "equality", "sort", "range"])
+
+EQUALITY_OPERATORS = {"$eq", "$in"}
+
+
+class _RecordingCursor:
+    """Cursor stand-in: remembers sort/limit and records the shape when iterated or read with to_list()."""
+
+    def __init__(self, recorder, collection_name, filter_query):
+        self.recorder = recorder
+        self.collection_name = collection_name
+        self.filter_query = filter_query or {}
+        self.sort_spec = []
+        self.limit_count = 0
+
+    def sort(self, key_or_list, direction=1):
+        if isinstance(key_or_list, str):
+            self.sort_spec = [(key_or_list, direction)]
+        elif isinstance(key_or_list, dict):
+            self.sort_spec = list(key_or_list.items())
+        else:
+            self.sort_spec = list(key_or_list)
+        return self
+
+    def limit(self, count):
+        self.limit_count = count
+        return self
+
+    def skip(self, count):
+        return self
+
+    def __iter__(self):
+        self.recorder.record(self.collection_name, self.filter_query, self.sort_spec, self.limit_count)
+        return iter(())
+
+    async def to_list(self, length=None):
+        return list(self)
+
+
+class _RecordingCollection:
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def find(self, filter_query=None, *args, **kwargs):
+        return _RecordingCursor(self.recorder, self.name, filter_query)
+
+    def find_one(self, filter_query=None, *args, **kwargs):
+        self.recorder.record(self.name, filter_query or {}, [])
+        return None
+
+
+class ShapeRecorder:
+    """
+    Stand-in for FinOpsContext whose collections record the queries made on them.
+    Tools are called as tool(recorder.run_context(), **kwargs); `queries` keeps the
+    literal find() calls and `shapes` their QueryShape.
+    """
+
+    def __init__(self):
+        self.source = None
+        self.shapes = []
+        self.queries = []
+
+    def get_collection(self, collection_name):
+        return _RecordingCollection(self, collection_name)
+
+    def get_async_collection(self, collection_name):
+        # find() is synchronous on AsyncCollection too; only the cursor's to_list() is awaited
+        return _RecordingCollection(self, collection_name)
+
+    def run_context(self):
+        return SimpleNamespace(deps=self)
+
+    def record(self, collection_name, filter_query, sort_spec, limit=0):
+        self.queries.append({"source": self.source, "collection": collection_name, "filter": filter_query,
+                             "sort": list(sort_spec), "limit": limit})
+        equality, ranges = split_filter(filter_query)
+        self.shapes.append(QueryShape(self.source, collection_name, equality, list(sort_spec), ranges))
+
+
+def split_filter(filter_query):
+    """
+    Split a find() filter into equality and range fields.
+
+    Returns:
+        (equality_fields, range_fields) in filter order
+    """
+    equality, ranges = [], []
+    for field, condition in filter_query.items():
+        if field.startswith("$"):
+            continue
+        if isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+            if set(condition) <= EQUALITY_OPERATORS:
+                equality.append(field)
+            else:
+                ranges.append(field)
+        else:
+            equality.append(field)
+    return equality, ranges
+
+
+def split_expr(expr):
+    """Equality and range fields of a $lookup sub-pipeline's $expr ($and of comparisons)."""
+    equality, ranges = [], []
+    clauses = expr.get("$and", [expr])
+    for clause in clauses:
+        for operator, operands in clause.items():
+            fields = [operand[1:] for operand in operands
+                      if isinstance(operand, str) and operand.startswith("$") and not operand.startswith("$$")]
+            if len(fields) != 1:
+                continue
+            (equality if operator == "$eq" else ranges).append(fields[0])
+    return equality, ranges
+
+
+def pipeline_shapes(source, collection_name, pipeline):
+    """
+    Shapes of an aggregation pipeline: its leading $match/$sort stages, plus those
+    of every $lookup sub-pipeline against the joined collection.
+    """
+    shapes = []
+    equality, ranges, sort_spec = [], [], []
+    leading = True
+    for stage in pipeline:
+        if leading and "$match" in stage:
+            match = dict(stage["$match"])
+            expr = match.pop("$expr", None)
+            eq_fields, range_fields = split_filter(match)
+            if expr is not None:
+                expr_eq, expr_range = split_expr(expr)
+                eq_fields += expr_eq
+                range_fields += expr_range
+            equality += eq_fields
+            ranges += range_fields
+        elif leading and "$sort" in stage:
+            sort_spec = list(stage["$sort"].items())
+            leading = False
+        else:
+            leading = False
+        if "$lookup" in stage and "pipeline" in stage["$lookup"]:
+            shapes.extend(pipeline_shapes(source, stage["$lookup"]["from"], stage["$lookup"]["pipeline"]))
+    if equality or ranges or sort_spec:
+        shapes.insert(0, QueryShape(source, collection_name, equality, sort_spec, ranges))
+    return shapes
+
+
+def tool_calls(agent_module, app_id="app", business_unit="Retail"):
+    """
+    Representative calls of every agent tool: the defaults, and every optional
+    filter set at once.
+
+    Args:
+        agent_module: The finops_agent module
+        app_id, business_unit: Filter values to pass (only matter when the queries are run)
+
+    Returns:
+        List of (tool, kwargs)
+    """
+    m = agent_module
+    return [
+        (m.get_applications, {}),
+        (m.get_applications, {"business_unit": business_unit}),
+        (m.get_cloud_resources, {}),
+        (m.get_cloud_resources, {"app_id": app_id, "environment": m.Environment.PROD, "provider": m.Provider.AWS}),
+        (m.analyze_waste, {}),
+        (m.analyze_waste, {"app_id": app_id, "business_unit": business_unit, "min_waste_percentage": 10.0}),
+        (m.get_cost_trends, {}),
+        (m.get_cost_trends, {"app_id": app_id}),
+        (m.get_cost_forecast, {}),
+        (m.get_cost_forecast, {"app_id": app_id}),
+        (m.get_problems_and_incidents, {}),
+        (m.get_problems_and_incidents, {"app_id": app_id}),
+        (m.get_problems_and_incidents, {"app_id": app_id, "include_resolved": True}),
+        (m.calculate_potential_savings, {}),
+        (m.calculate_potential_savings, {"business_unit": business_unit}),
+        (m.get_top_cost_drivers, {}),
+    ]
+
+
+def record_tool_calls(calls=None):
+    """
+    Run the agent tools against a ShapeRecorder.
+
+    Args:
+        calls: List of (tool, kwargs); defaults to tool_calls(finops_agent)
+
+    Returns:
+        The ShapeRecorder
+    """
+    if calls is None:
+        import finops_agent
+        calls = tool_calls(finops_agent)
+    recorder = ShapeRecorder()
+
+    async def run_calls():
+        for tool, kwargs in calls:
+            recorder.source = tool.__name__
+            result = tool(recorder.run_context(), **kwargs)
+            if inspect.isawaitable(result):
+                await result
+
+    asyncio.run(run_calls())
+    return recorder
+
+
+def record_tool_shapes(calls=None):
+    """Query shapes of the agent tools (see record_tool_calls)."""
+    return record_tool_calls(calls).shapes
+
+
+def view_shapes(schema_mode=SCHEMA_FLAT):
+    """Shapes of the materialized view pipelines for the given schema mode."""
+    # The incremental rollups rebuild the app level for a set of apps from a given period on
+    affected_apps = {"app_id": {"$in": []}, "period_start": {"$gte": None}}
+    return (pipeline_shapes("mv_cloud_waste", "resource_utilization", cloud_waste_pipeline(schema_mode=schema_mode))
+            + pipeline_shapes("mv_cost_anomalies", "cost_data", cost_anomaly_pipeline(schema_mode=schema_mode))
+            + pipeline_shapes("cost_rollups", "costs_per_resource", app_trend_pipeline(affected_apps))
+            + pipeline_shapes("cost_rollups", "costs_per_resource", app_totals_pipeline({"app_id": {"$in": []}}))
+            + pipeline_shapes("mv_cloud_waste:incremental", "cloud_waste_state",
+                              incremental_waste_pipeline(None, schema_mode=schema_mode)))
+
+
+def index_for_shape(shape):
+    """
+    ESR index keys for one shape, or None when the query needs no index.
+
+    Returns:
+        List of (field, direction)
+    """
+    if "_id" in shape.equality:
+        # The _id index already narrows the query to one document
+        return None
+    keys = [(field, 1) for field in shape.equality]
+    seen = set(shape.equality)
+    for field, direction in shape.sort:
+        if field not in seen:
+            keys.append((field, direction))
+            seen.add(field)
+    for field in shape.range:
+        if field not in seen:
+            keys.append((field, 1))
+            seen.add(field)
+    return keys or None
+
+
+def _is_prefix(shorter, longer):
+    if len(shorter) > len(longer):
+        return False
+    head = longer[:len(shorter)]
+    # An index can be walked in either direction
+    return head == shorter or head == [(field, -direction) for field, direction in shorter]
+
+
+def advise_indexes(shapes):
+    """
+    Compound indexes covering the shapes, without redundant prefixes.
+
+    Returns:
+        Dict mapping collection name to a list of {"keys": [(field, direction)], "sources": [...]}
+    """
+    proposals = {}
+    for shape in shapes:
+        keys = index_for_shape(shape)
+        if keys is None:
+            continue
+        for proposal in proposals.setdefault(shape.collection, []):
+            if proposal["keys"] == keys:
+                if shape.source not in proposal["sources"]:
+                    proposal["sources"].append(shape.source)
+                break
+        else:
+            proposals[shape.collection].append({"keys": keys, "sources": [shape.source]})
+
+    advised = {}
+    for collection_name, candidates in proposals.items():
+        kept = []
+        for candidate in sorted(candidates, key=lambda item: -len(item["keys"])):
+            covering = next((other for other in kept if _is_prefix(candidate["keys"], other["keys"])), None)
+            if covering is None:
+                kept.append({"keys": candidate["keys"], "sources": list(candidate["sources"])})
+            else:
+                covering["sources"].extend(s for s in candidate["sources"] if s not in covering["sources"])
+        advised[collection_name] = kept
+    return advised
+
+
+def advise(schema_mode=SCHEMA_FLAT, include_tools=True):
+    """Record the tool and view shapes and propose indexes for them."""
+    shapes = view_shapes(schema_mode)
+    if include_tools:
+        try:
+            shapes = record_tool_shapes() + shapes
+        except ImportError as e:
+            print(f"Skipping agent tool shapes, finops_agent could not be imported: {e}")
+    return advise_indexes(shapes)
+
+
+def format_keys(keys):
+    return ", ".join(f"{field} {'asc' if direction == 1 else 'desc'}" for field, direction in keys)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Propose compound indexes from the agent tool and view query shapes")
+    parser.add_argument("--schema-mode", choices=SCHEMA_MODES, default=SCHEMA_FLAT,
+                        help="metaField layout of cost_data/resource_utilization (default: flat)")
+    parser.add_argument("--views-only", action="store_true", help="Skip the agent tools (no finops_agent import)")
+    args = parser.parse_args()
+
+    for collection_name, proposals in advise(args.schema_mode, include_tools=not args.views_only).items():
+        print(f"{collection_name}:")
+        for proposal in proposals:
+            print(f"  ({format_keys(proposal['keys'])})  <- {', '.join(proposal['sources'])}")
@@ -0,0 +1,207 @@
+"""
+Accelerated-clock live feed for cost_data and resource_utilization.
+
+The populators only backfill history. This simulator keeps writing new hourly
+points with the same vectorized POS/ecommerce generators, driven by a simulated
+clock: --speed 1 writes one simulated hour per wall-clock second, --speed 10 ten
+hours per second and --speed 0.1 one hour every ten seconds. The clock starts
+right after the latest cost_data timestamp, so the feed continues the existing
+series.
+
+--resources picks that many resources from cloud_resources; when the catalog has
+fewer, extra "-sim-NNNN" clones of existing resources (same app, profile and
+location) are added to cloud_resources so the views still resolve them. Every
+report_every simulated hours the feed prints the write throughput and how far
+it is behind the requested speed.
+"""
+
+import argparse
+import datetime
+import time
+
+import numpy as np
+from pymongo import MongoClient
+
+from demo_constants import (MONGO_URI, DATABASE_NAME)
+from vectorized_hourly import HourGrid
+from parallel_loader import PROFILES
+from append_loader import latest_timestamps, resource_location, resource_profile
+from timeseries_schema import META_FIELD, SCHEMA_META, detect_schema_mode, load_metas
+
+DEFAULT_SPEED = 1.0
+DEFAULT_REPORT_EVERY = 24
+
+
+def select_resources(db, count=None):
+    """
+    Resolve the simulated resources, cloning catalog entries when more are requested.
+
+    Returns:
+        List of (resource_id, profile, location)
+    """
+    catalog = []
+    for resource in db["cloud_resources"].find({"resource_id": {"$not": {"$regex": "-sim-\\d+$"}}}, {"_id": 0}):
+        profile, location = resource_profile(resource), resource_location(resource["resource_id"])
+        if profile and location:
+            catalog.append((resource, profile, location))
+    if not catalog:
+        raise ValueError("No POS or ecommerce resources in 'cloud_resources'; run the populators first.")
+    count = count or len(catalog)
+
+    selected, clones = [], []
+    for i in range(count):
+        resource, profile, location = catalog[i % len(catalog)]
+        resource_id = resource["resource_id"]
+        if i >= len(catalog):
+            resource_id = f"{resource_id}-sim-{i // len(catalog):04d}"
+            clones.append(dict(resource, resource_id=resource_id))
+        selected.append((resource_id, profile, location))
+
+    existing = {doc["resource_id"] for doc in db["cloud_resources"].find(
+        {"resource_id": {"$in": [clone["resource_id"] for clone in clones]}}, {"resource_id": 1})}
+    new_clones = [clone for clone in clones if clone["resource_id"] not in existing]
+    if new_clones:
+        db["cloud_resources"].insert_many(new_clones)
+        print(f"Added {len(new_clones)} simulated resources to 'cloud_resources'.")
+    return selected
+
+
+class LiveFeed:
+    """Generates one simulated day of arrays at a time and hands them out hour by hour."""
+
+    def __init__(self, resources, start, seed=None, metas=None):
+        self.clock = start.replace(minute=0, second=0, microsecond=0)
+        self.rng = np.random.default_rng(seed)
+        self.metas = metas
+        self.groups = {}
+        for resource_id, profile, location in resources:
+            group = self.groups.setdefault(profile, ([], []))
+            group[0].append(resource_id)
+            group[1].append(location)
+        self._day = None
+        self._arrays = []
+
+    def _generate_day(self, day):
+        grid_arrays = []
+        for profile, (resource_ids, locations) in self.groups.items():
+            generate_arrays, calendar_table, anomalies = PROFILES[profile]
+            grid = HourGrid(day, day, calendar_table)
+            masks = {location: anomalies.effect_masks(location, grid) for location in set(locations)}
+            load_mask = np.stack([masks[location][0] for location in locations])
+            idle_mask = np.stack([masks[location][1] for location in locations])
+            grid_arrays.append((resource_ids, generate_arrays(grid, len(resource_ids), self.rng,
+                                                              load_mask=load_mask, idle_mask=idle_mask)))
+        self._day, self._arrays = day, grid_arrays
+
+    def next_hour(self):
+        """
+        Documents for the current simulated hour; advances the clock by one hour.
+
+        Returns:
+            (timestamp, {collection_name: documents})
+        """
+        timestamp = self.clock
+        if self._day != timestamp.date():
+            self._generate_day(timestamp.date())
+        batches = {}
+        for resource_ids, arrays in self._arrays:
+            for collection_name, fields in arrays.items():
+                columns = {name: values[:, timestamp.hour].tolist() for name, values in fields.items()}
+                docs = batches.setdefault(collection_name, [])
+                for row, resource_id in enumerate(resource_ids):
+                    if self.metas is not None:
+                        doc = {META_FIELD: self.metas[resource_id], "timestamp": timestamp}
+                    else:
+                        doc = {"resource_id": resource_id, "timestamp": timestamp}
+                    doc.update((name, column[row]) for name, column in columns.items())
+                    docs.append(doc)
+        self.clock += datetime.timedelta(hours=1)
+        return timestamp, batches
+
+
+def run_live_feed(resources=None, speed=DEFAULT_SPEED, hours=None, start=None, seed=None,
+                  report_every=DEFAULT_REPORT_EVERY, mongo_uri=MONGO_URI, database_name=DATABASE_NAME):
+    """
+    Write simulated hours until `hours` have been written or the run is interrupted.
+
+    Args:
+        resources: Number of resources to simulate (default: every catalog resource)
+        speed: Simulated hours per wall-clock second
+        hours: Simulated hours to write (default: run until Ctrl+C)
+        start: First simulated hour (default: the hour after the latest cost_data point)
+        seed: Seed for the numpy RNG
+
+    Returns:
+        Dict with per-collection counts, simulated hours, elapsed seconds and rows_per_second
+    """
+    if speed <= 0:
+        raise ValueError(f"speed must be positive, got {speed:g}")
+    client = MongoClient(mongo_uri)
+    db = client[database_name]
+    selected = select_resources(db, resources)
+    schema_mode = detect_schema_mode(db)
+    metas = load_metas(db, [resource_id for resource_id, _, _ in selected]) if schema_mode == SCHEMA_META else None
+    if start is None:
+        latest = latest_timestamps(db, "cost_data", schema_mode)
+        # Stored timestamps are naive UTC
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        start = max(latest.values()) + datetime.timedelta(hours=1) if latest else now
+    feed = LiveFeed(selected, start, seed, metas)
+    print(f"Simulating {len(selected)} resources from {feed.clock} at {speed:g} simulated hour(s)/s. Ctrl+C to stop.")
+
+    counts = {}
+    written = 0
+    interval = 1.0 / speed
+    started = time.perf_counter()
+    window_start, window_rows = started, 0
+    try:
+        while hours is None or written < hours:
+            timestamp, batches = feed.next_hour()
+            for collection_name, docs in batches.items():
+                db[collection_name].insert_many(docs, ordered=False)
+                counts[collection_name] = counts.get(collection_name, 0) + len(docs)
+                window_rows += len(docs)
+            written += 1
+
+            behind = time.perf_counter() - (started + written * interval)
+            if behind < 0:
+                time.sleep(-behind)
+            if written % report_every == 0:
+                now = time.perf_counter()
+                print(f"[{timestamp}] {window_rows / (now - window_start):,.0f} rows/s, "
+                      f"{max(0.0, behind):.1f}s behind schedule")
+                window_start, window_rows = now, 0
+    except KeyboardInterrupt:
+        print("\nStopping live feed.")
+    finally:
+        client.close()
+
+    elapsed = time.perf_counter() - started
+    rows = sum(counts.values())
+    print(f"Wrote {written} simulated hours, {rows} documents in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s).")
+    return {"counts": counts, "hours": written, "elapsed_seconds": elapsed,
+            "rows_per_second": rows / elapsed if elapsed > 0 else 0.0}
+
+
+def positive_float(value):
+    """argparse type for --speed."""
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError(f"must be positive, got {value}")
+    return speed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continuously write simulated cost and utilization points")
+    parser.add_argument("--speed", type=positive_float, default=DEFAULT_SPEED,
+                        help="Simulated hours per second, > 0 (default: 1)")
+    parser.add_argument("--resources", type=int, default=None, help="Resources to simulate (default: all)")
+    parser.add_argument("--hours", type=int, default=None, help="Stop after this many simulated hours")
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat, default=None,
+                        help="First simulated hour, ISO format (default: after the latest cost_data point)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--report-every", type=int, default=DEFAULT_REPORT_EVERY, help="Report every N simulated hours")
+    args = parser.parse_args()
+
+    run_live_feed(resources=args.resources, speed=args.speed, hours=args.hours, start=args.start,
+                  seed=args.seed, report_every=args.report_every)
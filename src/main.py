@@ -6,8 +6,8 @@ from demo_constants import (YEAR_TO_GENERATE, MONGO_URI, DATABASE_NAME, LOCATION
 
 # Import your collection creation and population scripts
 from create_collections import create_collections
-from populate_collections_pos import store_data_mongodb_hourly, generate_pos_data_for_year
-from populate_collection_ecommerce import store_ecommerce_data_mongodb, generate_ecommerce_data_for_year
+from populate_collections_pos import store_data_mongodb_hourly
+from populate_collection_ecommerce import store_ecommerce_data_mongodb
 from rag_with_memory import q_and_a
 
 def chatbot_interface(question):
@@ -22,14 +22,13 @@ def prepare_database():
     create_collections()
     print("Collections created.\n")
 
+    # Hourly data is generated and inserted in bounded batches; nothing is held for the whole year
     print("Populating POS data...")
-    daily_pos_data_2024 = generate_pos_data_for_year()
-    store_data_mongodb_hourly(daily_pos_data_2024)
+    store_data_mongodb_hourly()
     print("POS data populated.\n")
 
     print("Populating Ecommerce data...")
-    daily_ecommerce_data = generate_ecommerce_data_for_year()
-    store_ecommerce_data_mongodb(daily_ecommerce_data)
+    store_ecommerce_data_mongodb()
     print("Ecommerce data populated.\n")
 
 def main():
@@ -0,0 +1,173 @@
+"""
+Process-wide pooled MongoClient for the agent.
+
+MongoClient is thread-safe and keeps its own connection pool, so one client per
+process (and connection string) serves every tool call. get_client creates it on
+first use with the pool size and timeouts from demo_constants (MONGO_MAX_POOL_SIZE,
+MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS, MONGO_CONNECT_TIMEOUT_MS,
+MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS; the defaults below
+apply when they are not set) and close_clients closes it again. The FinOpsContext of
+the CLI, ConfiguredFinOpsAgent and the FastAPI app all go through it.
+
+get_async_client does the same with PyMongo's AsyncMongoClient for the async agent
+tools. An async client is bound to the event loop it first runs on, so there is one
+per connection string and event loop; close_async_clients closes those of the
+running loop.
+
+A connection pool listener keeps pool metrics (connections created/closed, check-outs,
+failed check-outs, connections in use and their peak); pool_stats returns them.
+"""
+
+import asyncio
+import atexit
+import threading
+
+from pymongo import AsyncMongoClient, MongoClient, monitoring
+
+import demo_constants
+
+POOL_DEFAULTS = {
+    "maxPoolSize": ("MONGO_MAX_POOL_SIZE", 50),
+    "minPoolSize": ("MONGO_MIN_POOL_SIZE", 0),
+    "maxIdleTimeMS": ("MONGO_MAX_IDLE_TIME_MS", 300000),
+    "connectTimeoutMS": ("MONGO_CONNECT_TIMEOUT_MS", 10000),
+    "serverSelectionTimeoutMS": ("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000),
+    "waitQueueTimeoutMS": ("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10000),
+}
+
+_lock = threading.Lock()
+_clients = {}
+_async_clients = {}
+
+
+def pool_options(**overrides):
+    """MongoClient pool and timeout options from demo_constants, with keyword overrides."""
+    options = {option: getattr(demo_constants, name, default) for option, (name, default) in POOL_DEFAULTS.items()}
+    options.update(overrides)
+    return options
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Counts connection pool events across the shared clients."""
+
+    COUNTERS = ["connections_created", "connections_closed", "checkouts", "checkins", "checkout_failures",
+                "pool_clears"]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = dict.fromkeys(self.COUNTERS, 0)
+            self.in_use = 0
+            self.peak_in_use = 0
+
+    def _count(self, name, in_use_delta=0):
+        with self._lock:
+            self.counts[name] += 1
+            self.in_use += in_use_delta
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts, in_use=self.in_use, peak_in_use=self.peak_in_use)
+
+    def connection_created(self, event):
+        self._count("connections_created")
+
+    def connection_closed(self, event):
+        self._count("connections_closed")
+
+    def connection_checked_out(self, event):
+        self._count("checkouts", 1)
+
+    def connection_checked_in(self, event):
+        self._count("checkins", -1)
+
+    def connection_check_out_failed(self, event):
+        self._count("checkout_failures")
+
+    def pool_cleared(self, event):
+        self._count("pool_clears")
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+metrics = PoolMetrics()
+
+
+def get_client(connection_string=None, **overrides):
+    """
+    The shared client for a connection string (default: demo_constants.MONGO_URI).
+    Overrides only apply when the client is created.
+    """
+    connection_string = connection_string or demo_constants.MONGO_URI
+    with _lock:
+        client = _clients.get(connection_string)
+        if client is None:
+            client = MongoClient(connection_string, event_listeners=[metrics], **pool_options(**overrides))
+            _clients[connection_string] = client
+        return client
+
+
+def get_async_client(connection_string=None, **overrides):
+    """
+    The shared AsyncMongoClient of the running event loop for a connection string.
+    Must be called from a coroutine; overrides only apply when the client is created.
+    """
+    connection_string = connection_string or demo_constants.MONGO_URI
+    loop = asyncio.get_running_loop()
+    with _lock:
+        # Clients of loops that have finished (e.g. earlier asyncio.run calls) can no longer be used
+        for key in [key for key in _async_clients if key[1].is_closed()]:
+            del _async_clients[key]
+        client = _async_clients.get((connection_string, loop))
+        if client is None:
+            client = AsyncMongoClient(connection_string, event_listeners=[metrics], **pool_options(**overrides))
+            _async_clients[(connection_string, loop)] = client
+        return client
+
+
+async def close_async_clients():
+    """Close the shared async clients of the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        keys = [key for key in _async_clients if key[1] is loop]
+        clients = [_async_clients.pop(key) for key in keys]
+    for client in clients:
+        await client.close()
+
+
+def close_clients():
+    """Close every shared client; the next get_client call opens a new one."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+def pool_stats():
+    """Pool metrics plus the configured pool options and the number of open shared (async) clients."""
+    with _lock:
+        open_clients = len(_clients)
+        open_async_clients = sum(1 for key in _async_clients if not key[1].is_closed())
+    return {"clients": open_clients, "async_clients": open_async_clients, "options": pool_options(),
+            **metrics.snapshot()}
+
+
+atexit.register(close_clients)
@@ -0,0 +1,273 @@
+"""
+Materialized view framework.
+
+Views are registered in VIEWS with:
+
+- windows: named rolling windows (Window) resolved at refresh time, relative to
+  the current time ("now") or to the latest timestamp of a collection ("latest"),
+  e.g. the latest month of data and the month before it, or its last 7 days
+- depends_on: views that must be refreshed first
+- run: callable doing the refresh with (db, name, windows, schema_mode)
+
+Pipeline views (pipeline_view) aggregate their source into a staging collection
+and rename it over the view, so readers never see a half-built or stale view.
+The view's indexes (e.g. the index_advisor indexes on cloud_waste) are rebuilt on
+the staging collection first, since the rename drops the old collection with them.
+refresh_views runs independent views concurrently on one shared MongoClient,
+starts a view as soon as its dependencies have finished, and records each run
+(duration, row count, windows, status) in mv_refresh_log.
+"""
+
+import datetime
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from pymongo import IndexModel, MongoClient
+
+from demo_constants import (MONGO_URI, DATABASE_NAME)
+from cost_forecast import FORECASTS_COLLECTION, run_forecasts
+from gen_mv_cloud_waste import cloud_waste_pipeline
+from gen_mv_cost_anomalies import cost_anomaly_pipeline, cost_spike_pipeline
+from gen_mv_cost_rollups import next_period, period_start, refresh_cost_rollups
+from timeseries_schema import detect_schema_mode
+
+REFRESH_LOG_COLLECTION = "mv_refresh_log"
+DEFAULT_WORKERS = 4
+
+Window = namedtuple("Window", ["unit", "length", "offset", "anchor", "collection"],
+                    defaults=[1, 0, "latest", "cost_data"])
+Window.__doc__ = """
+`length` whole day/week/month units ending with the unit that contains the anchor,
+shifted back by `offset` units. The anchor is "now" or the latest timestamp in `collection`.
+"""
+ResolvedWindow = namedtuple("ResolvedWindow", ["start", "end"])
+ViewDefinition = namedtuple("ViewDefinition", ["name", "run", "windows", "depends_on", "target"],
+                            defaults=[{}, (), None])
+
+
+def previous_period(start, unit):
+    return period_start(start - datetime.timedelta(days=1), unit)
+
+
+def resolve_window(db, window, now=None):
+    """
+    Concrete [start, end) bounds of a rolling window, as UTC datetimes.
+
+    Returns:
+        ResolvedWindow, or None when an anchor collection has no data
+    """
+    if window.anchor == "now":
+        anchor = now or datetime.datetime.now(datetime.timezone.utc)
+    elif window.anchor == "latest":
+        latest = db[window.collection].find_one({}, {"timestamp": 1}, sort=[("timestamp", -1)])
+        if latest is None:
+            return None
+        anchor = latest["timestamp"]
+    else:
+        raise ValueError(f"Unknown window anchor '{window.anchor}', expected 'now' or 'latest'")
+    period = period_start(anchor, window.unit)
+    for _ in range(window.offset):
+        period = previous_period(period, window.unit)
+    end = next_period(period, window.unit)
+    start = period
+    for _ in range(window.length - 1):
+        start = previous_period(start, window.unit)
+    return ResolvedWindow(start.replace(tzinfo=datetime.timezone.utc), end.replace(tzinfo=datetime.timezone.utc))
+
+
+def copy_indexes(db, source, target):
+    """
+    Create the secondary indexes of `source` on `target`.
+
+    Returns:
+        Names of the indexes created
+    """
+    models = []
+    for name, info in db[source].index_information().items():
+        if name == "_id_":
+            continue
+        options = {key: value for key, value in info.items() if key not in ("key", "v", "ns")}
+        models.append(IndexModel(info["key"], name=name, **options))
+    if models:
+        db[target].create_indexes(models)
+    return [model.document["name"] for model in models]
+
+
+def pipeline_view(name, source, build, windows=None, depends_on=()):
+    """
+    A view built by one aggregation over `source`.
+
+    Args:
+        build: Callable (output_collection, windows, schema_mode) -> pipeline ending in $merge/$out
+    """
+    def run(db, view_name, resolved, schema_mode):
+        staging = f"{view_name}__staging"
+        db[staging].drop()
+        db[source].aggregate(build(staging, resolved, schema_mode), allowDiskUse=True)
+        if db.list_collection_names(filter={"name": staging}):
+            # The rename drops the current view together with its indexes
+            copy_indexes(db, view_name, staging)
+            db[staging].rename(view_name, dropTarget=True)
+        else:
+            db[view_name].delete_many({})
+    return ViewDefinition(name, run, windows or {}, tuple(depends_on))
+
+
+def _inclusive(end):
+    # The waste pipeline's upper bound is inclusive; BSON dates have millisecond precision
+    return end - datetime.timedelta(milliseconds=1)
+
+
+def copy_pipeline(output, windows, schema_mode):
+    return [{"$merge": {"into": output, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}]
+
+
+def cost_rollups_refresh(db, name, windows, schema_mode):
+    refresh_cost_rollups(schema_mode=schema_mode, db=db)
+
+
+def forecasts_refresh(db, name, windows, schema_mode):
+    run_forecasts(db=db, schema_mode=schema_mode)
+
+
+def cloud_waste_build(output, windows, schema_mode):
+    current = windows["current"]
+    return cloud_waste_pipeline(output, schema_mode, start=current.start, end=_inclusive(current.end))
+
+
+def cost_anomalies_build(output, windows, schema_mode):
+    return cost_anomaly_pipeline(output, schema_mode, previous_start=windows["previous"].start,
+                                 current_start=windows["current"].start, end=windows["current"].end)
+
+
+def cost_spikes_build(output, windows, schema_mode):
+    current = windows["current"]
+    return cost_spike_pipeline(output, schema_mode, start=current.start, end=current.end)
+
+
+VIEWS = {view.name: view for view in [
+    ViewDefinition("cost_rollups", cost_rollups_refresh, target="costs_trend_per_app"),
+    ViewDefinition("forecasts", forecasts_refresh, target=FORECASTS_COLLECTION),
+    pipeline_view("mv_cloud_waste", "resource_utilization", cloud_waste_build,
+                  windows={"current": Window("month", collection="resource_utilization")}),
+    pipeline_view("mv_cost_anomalies", "cost_data", cost_anomalies_build,
+                  windows={"previous": Window("month", offset=1), "current": Window("month")}),
+    pipeline_view("mv_cost_spikes", "cost_data", cost_spikes_build, windows={"current": Window("day", length=7)}),
+    # The agent's analyze_waste tool reads cloud_waste
+    pipeline_view("cloud_waste", "mv_cloud_waste", copy_pipeline, depends_on=["mv_cloud_waste"]),
+]}
+
+
+def plan_refresh(names=None, registry=None):
+    """
+    The selected views plus everything they depend on, in a valid refresh order.
+
+    Raises:
+        ValueError on unknown views or dependency cycles
+    """
+    registry = VIEWS if registry is None else registry
+    order, visiting = [], set()
+
+    def visit(name, path=()):
+        if name not in registry:
+            raise ValueError(f"Unknown view '{name}', expected one of {sorted(registry)}")
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependency cycle: {' -> '.join(path + (name,))}")
+        visiting.add(name)
+        for dependency in registry[name].depends_on:
+            visit(dependency, path + (name,))
+        visiting.discard(name)
+        order.append(name)
+
+    for name in names or registry:
+        visit(name)
+    return order
+
+
+def run_view(db, view, schema_mode, now=None):
+    """Refresh one view and return its refresh log record."""
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    record = {"view": view.name, "started_at": started_at, "windows": {}}
+    try:
+        resolved = {key: resolve_window(db, window, now) for key, window in view.windows.items()}
+        record["windows"] = {key: dict(window._asdict()) for key, window in resolved.items() if window is not None}
+        if any(value is None for value in resolved.values()):
+            record["status"] = "skipped"
+            record["error"] = "no data to anchor the window"
+        else:
+            view.run(db, view.name, resolved, schema_mode)
+            record["status"] = "ok"
+    except Exception as e:
+        record["status"] = "failed"
+        record["error"] = str(e)
+    record["duration_seconds"] = (datetime.datetime.now(datetime.timezone.utc) - started_at).total_seconds()
+    record["rows"] = db[view.target or view.name].estimated_document_count()
+    db[REFRESH_LOG_COLLECTION].insert_one(dict(record))
+    return record
+
+
+def refresh_views(names=None, max_workers=DEFAULT_WORKERS, now=None, db=None, registry=None):
+    """
+    Refresh the selected views (default: all) and their dependencies.
+
+    Views whose dependencies are done run concurrently; a view is skipped when
+    one of its dependencies did not refresh successfully.
+
+    Returns:
+        List of refresh log records in completion order
+    """
+    registry = VIEWS if registry is None else registry
+    order = plan_refresh(names, registry)
+    client = None
+    if db is None:
+        client = MongoClient(MONGO_URI)
+        db = client[DATABASE_NAME]
+    schema_mode = detect_schema_mode(db)
+
+    status, records, running = {}, [], {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while len(status) < len(order):
+            for name in order:
+                if name in status or name in running.values():
+                    continue
+                dependencies = registry[name].depends_on
+                if any(status.get(dependency) not in (None, "ok") for dependency in dependencies):
+                    status[name] = "skipped"
+                    records.append({"view": name, "status": "skipped", "error": "dependency not refreshed"})
+                    print(f"{name}: skipped (dependency not refreshed)")
+                elif all(status.get(dependency) == "ok" for dependency in dependencies):
+                    running[executor.submit(run_view, db, registry[name], schema_mode, now)] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                status[running.pop(future)] = record["status"]
+                records.append(record)
+                print(f"{record['view']}: {record['status']} in {record['duration_seconds']:.2f}s, "
+                      f"{record['rows']} rows" + (f" ({record['error']})" if record.get("error") else ""))
+    if client is not None:
+        client.close()
+    return records
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh the registered materialized views")
+    parser.add_argument("views", nargs="*", help=f"Views to refresh with their dependencies (default: all of {list(VIEWS)})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Views refreshed concurrently")
+    parser.add_argument("--list", action="store_true", help="List the registered views and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name in plan_refresh():
+            view = VIEWS[name]
+            windows = ", ".join(f"{key}={window.unit}x{window.length} (offset {window.offset}, {window.anchor})"
+                                for key, window in view.windows.items())
+            print(f"- {name}" + (f" after {', '.join(view.depends_on)}" if view.depends_on else "")
+                  + (f": {windows}" if windows else ""))
+    else:
+        refresh_views(args.views or None, max_workers=args.workers)
@@ -0,0 +1,200 @@
+"""
+Parallel loader for the hourly cost_data and resource_utilization collections.
+
+The work is sharded by (location, month) and spread over a ProcessPoolExecutor.
+Every shard draws from its own RNG stream seeded from (seed, profile, location,
+year, month), so the generated documents are identical no matter how many
+workers run. Each worker process holds its own MongoClient and issues its own
+insert_many calls.
+"""
+
+import calendar
+import datetime
+import random
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from pymongo import MongoClient
+
+from demo_constants import (YEAR_TO_GENERATE, MONGO_URI, DATABASE_NAME, LOCATIONS)
+from vectorized_hourly import iter_hourly_batches, DEFAULT_BATCH_SIZE
+from anomaly_index import AnomalyIndex
+from timeseries_schema import SCHEMA_META, detect_schema_mode, load_metas
+import populate_collections_pos as pos
+import populate_collection_ecommerce as ecommerce
+
+# profile name -> (array generator, calendar feature table, anomaly index)
+PROFILES = {
+    "pos": (pos.generate_pos_hourly_arrays, pos.POS_CALENDAR, pos.POS_ANOMALY_INDEX),
+    "ecommerce": (ecommerce.generate_ecommerce_hourly_arrays, ecommerce.ECOMM_CALENDAR, ecommerce.ECOMM_ANOMALY_INDEX),
+}
+
+_worker_db = None
+
+
+def _init_worker(mongo_uri, database_name):
+    global _worker_db
+    _worker_db = MongoClient(mongo_uri)[database_name]
+
+
+def shard_rng(seed, profile, location, year, month):
+    """Independent, reproducible RNG stream for one (profile, location, month) shard."""
+    entropy = [seed, zlib.crc32(profile.encode()), zlib.crc32(location.encode()), year, month]
+    return np.random.default_rng(entropy)
+
+
+def plan_shards(profile, resource_ids, years, seed=0, anomalies=None, metas=None):
+    """
+    Split a load into (location, month) shards.
+
+    Args:
+        profile: Key of PROFILES selecting the cost/utilization model
+        resource_ids: Mapping of location to a resource id or a list of resource ids
+        years: Iterable of years to generate
+        seed: Base seed shared by all shards
+        anomalies: AnomalyIndex (or anomaly list) to inject; defaults to the profile's demo anomalies
+        metas: Optional {resource_id: metaField subdocument} for the "meta" schema mode
+
+    Returns:
+        List of shard dicts, each small enough to pickle to a worker
+    """
+    anomaly_index = AnomalyIndex.of(anomalies) if anomalies is not None else PROFILES[profile][2]
+    shards = []
+    for location, ids in resource_ids.items():
+        ids = [ids] if isinstance(ids, str) else list(ids)
+        for year in years:
+            for month in range(1, 13):
+                month_end = datetime.date(year, month, calendar.monthrange(year, month)[1])
+                shards.append({
+                    "profile": profile,
+                    "location": location,
+                    "resource_ids": ids,
+                    "year": year,
+                    "month": month,
+                    "seed": seed,
+                    # Only this shard's anomaly records travel to the worker
+                    "anomalies": anomaly_index.records(location, datetime.date(year, month, 1), month_end),
+                    "metas": {resource_id: metas[resource_id] for resource_id in ids} if metas else None,
+                })
+    return shards
+
+
+def generate_shard_batches(shard, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield (collection_name, documents) batches for one shard."""
+    generate_arrays, calendar_table, _ = PROFILES[shard["profile"]]
+    year, month = shard["year"], shard["month"]
+    rng = shard_rng(shard["seed"], shard["profile"], shard["location"], year, month)
+    yield from iter_hourly_batches(generate_arrays, shard["resource_ids"],
+                                   datetime.date(year, month, 1),
+                                   datetime.date(year, month, calendar.monthrange(year, month)[1]),
+                                   calendar_table, rng, batch_size,
+                                   anomalies=AnomalyIndex(shard.get("anomalies", ())),
+                                   locations=[shard["location"]] * len(shard["resource_ids"]),
+                                   metas=shard.get("metas"))
+
+
+def load_shard(shard, batch_size=DEFAULT_BATCH_SIZE):
+    """Worker entry point: generate one shard and insert it with the worker's own client."""
+    counts = {}
+    for collection_name, docs in generate_shard_batches(shard, batch_size):
+        _worker_db[collection_name].insert_many(docs, ordered=False)
+        counts[collection_name] = counts.get(collection_name, 0) + len(docs)
+    return counts
+
+
+def store_hourly_data_parallel(shards, max_workers=None, mongo_uri=MONGO_URI, database_name=DATABASE_NAME):
+    """
+    Generate and insert shards across a process pool.
+
+    Returns:
+        Dict of documents inserted per collection
+    """
+    totals = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(mongo_uri, database_name)) as executor:
+        for done, counts in enumerate(executor.map(load_shard, shards), start=1):
+            for collection_name, count in counts.items():
+                totals[collection_name] = totals.get(collection_name, 0) + count
+            print(f"\rShards loaded: {done}/{len(shards)}", end="", flush=True)
+    elapsed = time.perf_counter() - start
+    rows = sum(totals.values())
+    print(f"\nInserted {rows} hourly documents in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s).")
+    return totals
+
+
+def generate_catalog():
+    """
+    Generate the POS and ecommerce applications and one resource per location for each.
+
+    Returns:
+        (applications, resources, resource_ids) where resource_ids is {profile: {location: resource_id}}
+    """
+    applications = [pos.generate_application_data(YEAR_TO_GENERATE), ecommerce.generate_application_data()]
+    resource_ids = {"pos": {}, "ecommerce": {}}
+    resources = []
+    for location in LOCATIONS:
+        for profile, module in (("pos", pos), ("ecommerce", ecommerce)):
+            resource_data = module.generate_cloud_resource_data(location)
+            resources.append(resource_data)
+            resource_ids[profile][location] = resource_data["resource_id"]
+    return applications, resources, resource_ids
+
+
+def store_catalog(db):
+    """
+    Insert the POS and ecommerce applications and one resource per location for each.
+
+    Returns:
+        {profile: {location: resource_id}}
+    """
+    applications, resources, resource_ids = generate_catalog()
+    db["applications"].insert_many(applications)
+    print(f"Application data stored in 'applications' collection.")
+    db["cloud_resources"].insert_many(resources)
+    print(f"Cloud resource data stored in 'cloud_resources' collection.")
+    return resource_ids
+
+
+def store_incidents(db, resource_ids, years, trusted_load=False, writer=None):
+    for year in years:
+        pos.store_incidents_and_problems(db, resource_ids["pos"], pos.POS_ANOMALY_INDEX, year,
+                                         trusted_load=trusted_load, writer=writer)
+        ecommerce.store_ecommerce_incidents_and_problems(db, resource_ids["ecommerce"], ecommerce.ECOMM_ANOMALY_INDEX, year,
+                                                         trusted_load=trusted_load, writer=writer)
+
+
+def reseed_parallel(seed=0, max_workers=None, years=(YEAR_TO_GENERATE,), trusted_load=False):
+    """
+    Full POS + ecommerce reseed with the hourly series loaded in parallel.
+    Expects the collections to exist (see create_collections.py).
+    """
+    random.seed(seed)
+    client = MongoClient(MONGO_URI)
+    db = client[DATABASE_NAME]
+
+    resource_ids = store_catalog(db)
+    metas = load_metas(db) if detect_schema_mode(db) == SCHEMA_META else None
+    shards = []
+    for profile, ids in resource_ids.items():
+        shards.extend(plan_shards(profile, ids, years, seed, metas=metas))
+    store_hourly_data_parallel(shards, max_workers=max_workers)
+    store_incidents(db, resource_ids, years, trusted_load)
+
+    client.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reseed the FinOps demo dataset using a process pool")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed for the per-shard RNG streams")
+    parser.add_argument("--trusted-load", action="store_true",
+                        help="Bypass the $jsonSchema validators when inserting incidents and problems")
+    args = parser.parse_args()
+
+    reseed_parallel(seed=args.seed, max_workers=args.workers, trusted_load=args.trusted_load)
+    print("\nCMDB-like data generation and storage complete.")
@@ -1,13 +1,20 @@
 import datetime
 import random
 import uuid 
+import numpy as np
 from pymongo import MongoClient
 from demo_constants import (YEAR_TO_GENERATE, MONGO_URI, DATABASE_NAME, LOCATIONS)
+from vectorized_hourly import iter_hourly_batches
+from calendar_features import CalendarTable, ECOMM_HOLIDAYS
+from bulk_writer import BufferedInserter, DEFAULT_BATCH_SIZE as BULK_BATCH_SIZE
+from anomaly_index import AnomalyIndex
+from timeseries_schema import SCHEMA_META, detect_schema_mode, load_metas
 
 # --- Configuration ---
 ECOMM_APPLICATION_NAME = "ECommercePlatform"
 ECOMM_BUSINESS_UNIT = "Online Sales"
 ECOMM_OWNER = "Digital Commerce Team"
+DAILY_BATCH_SIZE = 1000
 
 
 ECOMM_ANOMALIES = [
@@ -39,47 +46,29 @@ ECOMM_ANOMALIES = [
     # New Anomaly: Flash Sale Gone Wrong (huge traffic surge, then rapid decline due to stock/site issues)
     {"date": "2025-10-20", "location": "Austin", "type": "Flash Sale Gone Wrong", "start_hour": 9, "end_hour": 11},
 ]
+ECOMM_ANOMALY_INDEX = AnomalyIndex(ECOMM_ANOMALIES)
 
 # --- Helper Functions ---
+def ecommerce_seasonal_multiplier(date):
+    """Daily transaction multiplier for the shopping seasons (holidays are weighted separately)."""
+    if date.month == 11 and date.day > 15:  # Pre-holiday shopping
+        return 1.5
+    elif date.month == 12 and date.day < 26:  # Christmas shopping
+        return 1.7
+    elif date.month == 1:  # Post-holiday sales
+        return 1.3
+    return 1.0
+
+ECOMM_CALENDAR = CalendarTable(ECOMM_HOLIDAYS, seasonality=ecommerce_seasonal_multiplier)
+
 def is_weekend(date):
-    return date.weekday() >= 5
+    return ECOMM_CALENDAR.is_weekend(date)
 
 def is_holiday_ecommerce(date):
-    holidays = [
-        datetime.date(2024, 1, 1),  # New Year's Day
-        datetime.date(2024, 2, 14), # Valentine's Day
-        datetime.date(2024, 5, 12), # Mother's Day
-        datetime.date(2024, 5, 27), # Memorial Day
-        datetime.date(2024, 6, 16), # Father's Day
-        datetime.date(2024, 7, 4),  # Independence Day
-        datetime.date(2024, 9, 2),  # Labor Day
-        datetime.date(2024, 11, 28),# Thanksgiving
-        datetime.date(2024, 11, 29),# Black Friday
-        datetime.date(2024, 12, 2),  # Cyber Monday
-        datetime.date(2024, 12, 25),# Christmas Day
-        datetime.date(2025, 1, 1),   # New Year's Day
-        datetime.date(2025, 2, 14),  # Valentine's Day
-        datetime.date(2025, 2, 17),  # Presidents' Day
-        datetime.date(2025, 5, 11),  # Mother's Day (2nd Sunday in May)
-        datetime.date(2025, 5, 26),  # Memorial Day
-        datetime.date(2025, 6, 15),  # Father's Day (3rd Sunday in June)
-        datetime.date(2025, 7, 4),   # Independence Day
-        datetime.date(2025, 9, 1),   # Labor Day
-        datetime.date(2025, 11, 27), # Thanksgiving Day
-        datetime.date(2025, 11, 28), # Black Friday (Day after Thanksgiving)
-        datetime.date(2025, 12, 1),  # Cyber Monday (First Monday after Thanksgiving)
-        datetime.date(2025, 12, 25), # Christmas Day
-    ]
-    return date in holidays
+    return ECOMM_CALENDAR.is_holiday(date)
 
 def get_weekly_pattern(date):
-    weekday = date.weekday()  # Monday is 0, Sunday is 6
-    if weekday < 4:  # Monday to Thursday
-        return "Lower"
-    elif weekday == 4:  # Friday
-        return "Normal"
-    else:  # Saturday and Sunday
-        return "Peak"
+    return ECOMM_CALENDAR.get_weekly_pattern(date)
 
 def generate_resource_id(location):
     return f"{location.lower().replace(' ', '_')}-ecommerce-site"
@@ -220,60 +209,106 @@ def generate_hourly_resource_utilization(date, hour, resource_id):
         "memory_utilization": memory_utilization
     }
 
-def generate_ecommerce_data_for_year():
+# --- Vectorized equivalents of the hourly generators above ---
+def generate_hourly_cost_arrays(grid, n_resources, rng):
+    base_cost = np.full(len(grid), 0.02)
+    base_cost[grid.peak_hours(10, 22)] *= 1.3  # Peak online shopping hours
+    base_cost[grid.weekend] *= 1.1
+    base_cost[grid.holiday] *= 1.5
+    costs = rng.uniform(base_cost * 0.9, base_cost * 1.1, size=(n_resources, len(grid)))
+    return np.round(costs, 4)
+
+def generate_hourly_utilization_arrays(grid, n_resources, rng):
+    base_utilization = np.full(len(grid), 0.1)
+    base_utilization[grid.peak_hours(10, 22)] += 0.2
+    base_utilization[grid.weekend] += 0.1
+    base_utilization[grid.holiday] += 0.3
+    size = (n_resources, len(grid))
+    cpu = rng.uniform(np.maximum(0.05, base_utilization - 0.15), np.minimum(0.95, base_utilization + 0.15), size=size)
+    memory = rng.uniform(np.maximum(0.1, base_utilization - 0.1), np.minimum(0.9, base_utilization + 0.1), size=size)
+    return np.round(cpu, 2), np.round(memory, 2)
+
+def generate_ecommerce_hourly_arrays(grid, n_resources, rng=None, load_mask=None, idle_mask=None):
+    """
+    Generate cost and utilization samples for every resource and every hour of the grid.
+
+    Args:
+        load_mask: Optional boolean array (n_resources, len(grid)); during load anomalies
+            autoscaling and mitigation raise utilization and cost
+        idle_mask: Optional boolean array (n_resources, len(grid)); during shutdowns and
+            outages utilization drops to idle while the resources are still billed
+
+    Returns:
+        Dict with "cost_data" and "resource_utilization" field arrays shaped (n_resources, len(grid))
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    cpu, memory = generate_hourly_utilization_arrays(grid, n_resources, rng)
+    cost = generate_hourly_cost_arrays(grid, n_resources, rng)
+    if load_mask is not None:
+        cost = np.where(load_mask, np.round(cost * 1.8, 4), cost)
+        cpu = np.where(load_mask, np.round(np.minimum(0.95, cpu + 0.3), 2), cpu)
+        memory = np.where(load_mask, np.round(np.minimum(0.9, memory + 0.2), 2), memory)
+    if idle_mask is not None:
+        cpu = np.where(idle_mask, 0.05, cpu)
+        memory = np.where(idle_mask, 0.1, memory)
+    return {
+        "cost_data": {"cost": cost},
+        "resource_utilization": {"cpu_utilization": cpu, "memory_utilization": memory},
+    }
+
+def iter_ecommerce_data_for_year(batch_size=DAILY_BATCH_SIZE):
+    """
+    Stream daily ecommerce summaries for every location of YEAR_TO_GENERATE.
+
+    Yields:
+        Lists of at most batch_size daily summaries, so callers can insert them
+        as they are produced instead of holding the whole year in memory.
+    """
     year = YEAR_TO_GENERATE
-    locations = LOCATIONS
-    anomalies = ECOMM_ANOMALIES
+    anomalies = ECOMM_ANOMALY_INDEX
     start_date = datetime.date(year, 1, 1)
     end_date = datetime.date(year, 12, 31)
     delta = datetime.timedelta(days=1)
-    all_daily_data = {}
-    anomaly_config = {}
-    if anomalies:
-        for anomaly in anomalies:
-            date_obj = datetime.date.fromisoformat(anomaly['date'])
-            if date_obj not in anomaly_config:
-                anomaly_config[date_obj] = {}
-            # Fix 9: Use dict with "types" and "hour" keys for anomaly_config
-            if anomaly['location'] not in anomaly_config[date_obj]:
-                anomaly_config[date_obj][anomaly['location']] = {"types": [], "hour": anomaly.get("hour")}
-            anomaly_config[date_obj][anomaly['location']]["types"].append(anomaly['type'])
-            if "hour" in anomaly:
-                anomaly_config[date_obj][anomaly['location']]["hour"] = anomaly["hour"]
-
-    for location in locations:
-        all_daily_data[location] = []
+    anomaly_index = AnomalyIndex.of(anomalies)
+
+    batch = []
+    for location in LOCATIONS:
         current_date = start_date
         while current_date <= end_date:
-            daily_data = generate_daily_ecommerce_data(current_date, location, anomaly_config)
-            all_daily_data[location].append(daily_data)
+            batch.append(generate_daily_ecommerce_data(current_date, location, anomaly_index))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
             current_date += delta
+    if batch:
+        yield batch
+
+def generate_ecommerce_data_for_year():
+    all_daily_data = {location: [] for location in LOCATIONS}
+    for batch in iter_ecommerce_data_for_year():
+        for daily_data in batch:
+            all_daily_data[daily_data["location"]].append(daily_data)
     return all_daily_data
 
-def generate_daily_ecommerce_data(date, location, anomaly_config=None):
+def generate_daily_ecommerce_data(date, location, anomaly_index=None):
     transactions_base = 100
-    weekly_pattern = get_weekly_pattern(date)
+    features = ECOMM_CALENDAR.features(date)
 
-    if is_weekend(date):
+    if features.weekend:
         transactions_base *= 1.8
-    elif weekly_pattern == "Normal":
+    elif features.weekly_pattern == "Normal":
         transactions_base *= 1.2
 
-    if is_holiday_ecommerce(date):
+    if features.holiday:
         transactions_base *= 2.5
-    elif date.month == 11 and date.day > 15:  # Pre-holiday shopping
-        transactions_base *= 1.5
-    elif date.month == 12 and date.day < 26:  # Christmas shopping
-        transactions_base *= 1.7
-    elif date.month == 1:  # Post-holiday sales
-        transactions_base *= 1.3
+    else:
+        transactions_base *= features.seasonal_multiplier
 
     transactions = max(0, int(random.gauss(transactions_base, transactions_base * 0.25)))
 
     anomaly_types = []
-    # Fix 9: Use new anomaly_config structure
-    if anomaly_config and date in anomaly_config and location in anomaly_config[date]:
-        anomaly_types = anomaly_config[date][location].get("types", [])
+    if anomaly_index:
+        anomaly_types = anomaly_index.types_on(location, date)
         for anomaly_type in anomaly_types:
             if anomaly_type == "Website Outage":
                 transactions = 0
@@ -289,7 +324,44 @@ def generate_daily_ecommerce_data(date, location, anomaly_config=None):
         "anomaly_types": anomaly_types
     }
 
-def store_ecommerce_data_mongodb(daily_data):
+def store_ecommerce_incidents_and_problems(db, resource_ids, anomalies, year, batch_size=BULK_BATCH_SIZE, trusted_load=False,
+                                           writer=None):
+    """
+    Write the incidents and problems raised by the anomalies of one year.
+
+    Args:
+        writer: Optional sink with BufferedInserter's add/close interface (e.g. a Parquet
+            writer); defaults to a BufferedInserter on db
+    """
+    anomaly_index = AnomalyIndex.of(anomalies)
+
+    start_date = datetime.date(year, 1, 1)
+    end_date = datetime.date(year, 12, 31)
+    delta = datetime.timedelta(days=1)
+    current_date = start_date
+    writer = writer or BufferedInserter(db, batch_size=batch_size, trusted_load=trusted_load)
+    while current_date <= end_date:
+        for location, res_id in resource_ids.items():
+            for anomaly in anomaly_index.on(location, current_date):
+                anomaly_type = anomaly.type
+                # An explicit hour/start_hour-end_hour window bounds the hourly incidents
+                window = range(anomaly.start_hour, anomaly.end_hour) if anomaly.has_window else None
+                if anomaly_type == "Website Outage":
+                    for hour in window or range(24):
+                        writer.add("incidents", generate_incident_data(current_date, hour, location, anomaly_type, res_id))
+                    writer.add("problems", generate_problem_data(current_date, 12, location, anomaly_type))
+                elif anomaly_type == "Payment Processing Issues":
+                    for hour in window or range(8, 22):
+                        writer.add("incidents", generate_incident_data(current_date, hour, location, anomaly_type, res_id))
+                elif anomaly_type == "Unexpected Traffic Surge":
+                    writer.add("incidents", generate_incident_data(current_date, anomaly_index.incident_hour(anomaly),
+                                                                   location, anomaly_type, res_id))
+        current_date += delta
+    writer.close()
+    print(f"Incident data stored in 'incidents' collection ({writer.inserted.get('incidents', 0)} documents).")
+    print(f"Problem data stored in 'problems' collection ({writer.inserted.get('problems', 0)} documents).")
+
+def store_ecommerce_data_mongodb(daily_data=None, seed=None, trusted_load=False):
     client = MongoClient(MONGO_URI)
     db = client[DATABASE_NAME]
 
@@ -309,92 +381,27 @@ def store_ecommerce_data_mongodb(daily_data):
         resource_ids[location] = resource_data['resource_id']
     print(f"Cloud resource data stored in 'cloud_resources' collection.")
 
-    # Cost Data Collection (hourly) - Fix 2: Use bulk insert
-    cost_data_collection = db["cost_data"]
-    start_date = datetime.date(YEAR_TO_GENERATE, 1, 1)
-    end_date = datetime.date(YEAR_TO_GENERATE, 12, 31)
-    delta = datetime.timedelta(days=1)
-    current_date = start_date
-    while current_date <= end_date:
-        cost_docs = []
-        for location, res_id in resource_ids.items():
-            for hour in range(24):
-                cost_data = generate_hourly_cost_data(current_date, hour, res_id)
-                cost_docs.append(cost_data)
-        if cost_docs:
-            cost_data_collection.insert_many(cost_docs)
-        current_date += delta
-    print(f"Hourly cost data stored in 'cost_data' collection.")
+    # In the "meta" schema mode every hourly point carries the resource/app metaField subdocument
+    metas = load_metas(db, resource_ids.values()) if detect_schema_mode(db) == SCHEMA_META else None
+
+    # Cost Data and Resource Utilization (hourly) - streamed month by month, bulk insert
+    counts = {}
+    hourly_batches = iter_hourly_batches(generate_ecommerce_hourly_arrays, resource_ids.values(),
+                                         datetime.date(YEAR_TO_GENERATE, 1, 1), datetime.date(YEAR_TO_GENERATE, 12, 31),
+                                         ECOMM_CALENDAR, np.random.default_rng(seed),
+                                         anomalies=ECOMM_ANOMALY_INDEX, locations=resource_ids.keys(), metas=metas)
+    for collection_name, docs in hourly_batches:
+        db[collection_name].insert_many(docs)
+        counts[collection_name] = counts.get(collection_name, 0) + len(docs)
+    print(f"Hourly cost data stored in 'cost_data' collection ({counts.get('cost_data', 0)} documents).")
+    print(f"Resource utilization data stored in 'resource_utilization' collection ({counts.get('resource_utilization', 0)} documents).")
 
     # Incident and Problem Collections
-    incident_collection = db["incidents"]
-    problem_collection = db["problems"]
-    anomaly_config = {}
-    if ECOMM_ANOMALIES:
-        for anomaly in ECOMM_ANOMALIES:
-            date_obj = datetime.date.fromisoformat(anomaly['date'])
-            if date_obj not in anomaly_config:
-                anomaly_config[date_obj] = {}
-            # Fix 9: Use dict with "types" and "hour" keys for anomaly_config
-            if anomaly['location'] not in anomaly_config[date_obj]:
-                anomaly_config[date_obj][anomaly['location']] = {"types": [], "hour": anomaly.get("hour")}
-            anomaly_config[date_obj][anomaly['location']]["types"].append(anomaly['type'])
-            if "hour" in anomaly:
-                anomaly_config[date_obj][anomaly['location']]["hour"] = anomaly["hour"]
-
-    start_date = datetime.date(YEAR_TO_GENERATE, 1, 1)
-    end_date = datetime.date(YEAR_TO_GENERATE, 12, 31)
-    delta = datetime.timedelta(days=1)
-    current_date = start_date
-    while current_date <= end_date:
-        for location, res_id in resource_ids.items():
-            if current_date in anomaly_config and location in anomaly_config[current_date]:
-                anomaly_types = anomaly_config[current_date][location].get("types", [])
-                anomaly_hour = anomaly_config[current_date][location].get("hour")
-                if anomaly_hour is None:
-                    anomaly_hour = 12  # Default to noon if hour is missing or None
-                for anomaly_type in anomaly_types:
-                    if anomaly_type == "Website Outage":
-                        for hour in range(24):
-                            incident_data = generate_incident_data(current_date, hour, location, anomaly_type, res_id)
-                            incident_collection.insert_one(incident_data)
-                        problem_data = generate_problem_data(current_date, 12, location, anomaly_type)
-                        problem_collection.insert_one(problem_data)
-                        print(f"Incident and Problem created for {location} on {current_date} due to {anomaly_type}.")
-                    elif anomaly_type == "Payment Processing Issues":
-                        for hour in range(8, 22):
-                            incident_data = generate_incident_data(current_date, hour, location, anomaly_type, res_id)
-                            incident_collection.insert_one(incident_data)
-                        print(f"Incident(s) created for {location} on {current_date} due to {anomaly_type}.")
-                    elif anomaly_type == "Unexpected Traffic Surge":
-                        incident_data = generate_incident_data(current_date, anomaly_hour, location, anomaly_type, res_id)
-                        incident_collection.insert_one(incident_data)
-                        print(f"Incident created for {location} on {current_date} due to {anomaly_type}.")
-        current_date += delta
-    print(f"Incident data stored in 'incidents' collection.")
-    print(f"Problem data stored in 'problems' collection.")
-
-    # Resource Utilization Collection (hourly) - Fix 2: Use bulk insert
-    resource_utilization_collection = db["resource_utilization"]
-    start_date = datetime.date(YEAR_TO_GENERATE, 1, 1)
-    end_date = datetime.date(YEAR_TO_GENERATE, 12, 31)
-    delta = datetime.timedelta(days=1)
-    current_date = start_date
-    while current_date <= end_date:
-        util_docs = []
-        for location, res_id in resource_ids.items():
-            for hour in range(24):
-                utilization_data = generate_hourly_resource_utilization(current_date, hour, res_id)
-                util_docs.append(utilization_data)
-        if util_docs:
-            resource_utilization_collection.insert_many(util_docs)
-        current_date += delta
-    print(f"Resource utilization data stored in 'resource_utilization' collection.")
+    store_ecommerce_incidents_and_problems(db, resource_ids, ECOMM_ANOMALY_INDEX, YEAR_TO_GENERATE, trusted_load=trusted_load)
 
     client.close()
 
 # Fix for Issue 1 (Option A): Call the correct function name
 if __name__ == "__main__":
-    daily_pos_data_2024 = generate_ecommerce_data_for_year()
-    store_ecommerce_data_mongodb(daily_pos_data_2024)
+    store_ecommerce_data_mongodb()
     print("\nCMDB-like data generation and storage complete.")
\ No newline at end of file
@@ -1,12 +1,19 @@
 import datetime
 import random
 import uuid
+import numpy as np
 from pymongo import MongoClient  # Removed unused import 'json'
 from demo_constants import (YEAR_TO_GENERATE, MONGO_URI, DATABASE_NAME, LOCATIONS)
+from vectorized_hourly import iter_hourly_batches
+from calendar_features import CalendarTable, POS_HOLIDAYS
+from bulk_writer import BufferedInserter, DEFAULT_BATCH_SIZE as BULK_BATCH_SIZE
+from anomaly_index import AnomalyIndex
+from timeseries_schema import SCHEMA_META, detect_schema_mode, load_metas
 
 POS_APPLICATION_NAME = "RetailPOS"
 POS_BUSINESS_UNIT = "Retail Operations"
 POS_OWNER = "IT Retail Team"
+DAILY_BATCH_SIZE = 1000
 
 
 POS_ANOMALIES = [
@@ -51,30 +58,27 @@ POS_ANOMALIES = [
     {"date": "2025-11-27", "location": "Dallas-Fort Worth", "type": "Peak Event Impact", "hour": 10}, # Black Friday
     {"date": "2025-12-24", "location": "Houston", "type": "Peak Event Impact", "hour": 12}, # Christmas Eve
 ]
+POS_ANOMALY_INDEX = AnomalyIndex(POS_ANOMALIES)
 
 # --- Helper Functions ---
+def pos_seasonal_multiplier(date):
+    """Peak-hour transaction multiplier for the holiday season and the summer lull."""
+    if date.month in [11, 12]:
+        return 1.4
+    elif date.month in [6, 7, 8]:
+        return 0.8
+    return 1.0
+
+POS_CALENDAR = CalendarTable(POS_HOLIDAYS, seasonality=pos_seasonal_multiplier)
+
 def is_weekend(date):
-    return date.weekday() >= 5
+    return POS_CALENDAR.is_weekend(date)
 
 def is_holiday(date):
-    holidays = [
-        datetime.date(2024, 1, 1), datetime.date(2024, 2, 14), datetime.date(2024, 5, 12),
-        datetime.date(2024, 5, 27), datetime.date(2024, 6, 16),
-        datetime.date(2024, 7, 4), datetime.date(2024, 9, 2), datetime.date(2024, 10, 31),
-        datetime.date(2024, 11, 28), datetime.date(2024, 11, 29), datetime.date(2024, 12, 25),
-        datetime.date(2025, 1, 1), datetime.date(2025, 2, 14), 
-        datetime.date(2025, 2, 17), datetime.date(2025, 5, 11),
-        datetime.date(2025, 5, 26), datetime.date(2025, 6, 15),
-        datetime.date(2025, 7, 4), datetime.date(2025, 9, 1), datetime.date(2025, 10, 31),
-        datetime.date(2025, 11, 27), datetime.date(2025, 11, 28), datetime.date(2025, 12, 25)
-    ]
-    return date in holidays
+    return POS_CALENDAR.is_holiday(date)
 
 def get_weekly_pattern(date):
-    weekday = date.weekday()
-    if weekday < 4: return "Lower"
-    elif weekday == 4: return "Normal"
-    else: return "Peak"
+    return POS_CALENDAR.get_weekly_pattern(date)
 
 def generate_resource_id(location):
     return f"{location.lower().replace(' ', '_')}-pos-terminal-{random.randint(100, 999)}"
@@ -279,41 +283,83 @@ def generate_hourly_resource_utilization(date, hour, resource_id):
         "memory_utilization": memory_utilization
     }
 
-def generate_hourly_pos_data(date, hour, location, anomaly_config=None):
+# --- Vectorized equivalents of the hourly generators above ---
+def generate_hourly_cost_arrays(grid, n_resources, rng):
+    base_cost = np.full(len(grid), 0.01)
+    base_cost[grid.peak_hours(10, 20)] *= 1.5
+    base_cost[grid.weekend] *= 1.2
+    costs = rng.uniform(base_cost * 0.8, base_cost * 1.2, size=(n_resources, len(grid)))
+    return np.round(costs, 4)
+
+def generate_hourly_utilization_arrays(grid, n_resources, rng):
+    base_utilization = np.full(len(grid), 0.2)
+    base_utilization[grid.peak_hours(10, 20)] += 0.3
+    base_utilization[grid.weekend] += 0.15
+    size = (n_resources, len(grid))
+    cpu = rng.uniform(np.maximum(0.05, base_utilization - 0.2), np.minimum(0.95, base_utilization + 0.2), size=size)
+    memory = rng.uniform(np.maximum(0.1, base_utilization - 0.15), np.minimum(0.9, base_utilization + 0.15), size=size)
+    return np.round(cpu, 2), np.round(memory, 2)
+
+def generate_pos_hourly_arrays(grid, n_resources, rng=None, load_mask=None, idle_mask=None):
+    """
+    Generate cost and utilization samples for every resource and every hour of the grid.
+
+    Args:
+        load_mask: Optional boolean array (n_resources, len(grid)); during load anomalies
+            retries and troubleshooting raise utilization and cost
+        idle_mask: Optional boolean array (n_resources, len(grid)); during shutdowns and
+            outages utilization drops to idle while the resources are still billed
+
+    Returns:
+        Dict with "cost_data" and "resource_utilization" field arrays shaped (n_resources, len(grid))
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    cpu, memory = generate_hourly_utilization_arrays(grid, n_resources, rng)
+    cost = generate_hourly_cost_arrays(grid, n_resources, rng)
+    if load_mask is not None:
+        cost = np.where(load_mask, np.round(cost * 1.5, 4), cost)
+        cpu = np.where(load_mask, np.round(np.minimum(0.95, cpu + 0.25), 2), cpu)
+        memory = np.where(load_mask, np.round(np.minimum(0.9, memory + 0.2), 2), memory)
+    if idle_mask is not None:
+        cpu = np.where(idle_mask, 0.05, cpu)
+        memory = np.where(idle_mask, 0.1, memory)
+    return {
+        "cost_data": {"cost": cost},
+        "resource_utilization": {"cpu_utilization": cpu, "memory_utilization": memory},
+    }
+
+def generate_hourly_pos_data(date, hour, location, anomaly_index=None):
     transactions_base = 5
     time_base = 30
     error_base = 0
 
-    weekly_pattern = get_weekly_pattern(date)
+    features = POS_CALENDAR.features(date)
     is_peak_time = 10 <= hour < 20
 
-    if is_weekend(date) and is_peak_time:
+    if features.weekend and is_peak_time:
         transactions_base *= 2
         time_base *= 1.1
-    elif is_weekend(date):
+    elif features.weekend:
         transactions_base *= 1.5
-    elif is_peak_time and weekly_pattern == "Normal":
+    elif is_peak_time and features.weekly_pattern == "Normal":
         transactions_base *= 1.3
     elif is_peak_time:
         transactions_base *= 1.1
 
-    if is_holiday(date):
+    if features.holiday:
         transactions_base *= 2.5
         time_base *= 1.2
 
-    month = date.month
-    if month in [11, 12] and is_peak_time:
-        transactions_base *= 1.4
-    elif month in [6, 7, 8] and is_peak_time:
-        transactions_base *= 0.8
+    if is_peak_time:
+        transactions_base *= features.seasonal_multiplier
 
     transactions = max(0, int(random.gauss(transactions_base, transactions_base * 0.3)))
     avg_transaction_time = max(10, int(random.gauss(time_base, time_base * 0.2)))
     error_count = max(0, int(random.expovariate(0.05))) # Higher rate for hourly
 
     anomaly_types = []
-    if anomaly_config and date in anomaly_config and location in anomaly_config[date] and anomaly_config[date][location].get("hour") == hour:
-        anomaly_types = anomaly_config[date][location].get("types", [])
+    if anomaly_index:
+        anomaly_types = [anomaly.type for anomaly in anomaly_index.active(location, date, hour)]
         for anomaly_type in anomaly_types:
             if anomaly_type == "System Malfunction":
                 transactions = 0
@@ -340,7 +386,7 @@ def generate_hourly_pos_data(date, hour, location, anomaly_config=None):
     }
 
 # Fix for Issue 2 (Option B): Use generate_hourly_pos_data instead of missing generate_daily_pos_data
-def generate_daily_pos_data(date, location, anomaly_config=None):
+def generate_daily_pos_data(date, location, anomaly_index=None):
     # Aggregate hourly data for the day
     daily_summary = {
         "location": location,
@@ -352,7 +398,7 @@ def generate_daily_pos_data(date, location, anomaly_config=None):
     }
     total_transaction_time = 0
     for hour in range(24):
-        hourly = generate_hourly_pos_data(date, hour, location, anomaly_config)
+        hourly = generate_hourly_pos_data(date, hour, location, anomaly_index)
         daily_summary["transactions_processed"] += hourly["transactions_processed"]
         total_transaction_time += hourly["average_transaction_time"]
         daily_summary["error_count"] += hourly["error_count"]
@@ -361,79 +407,75 @@ def generate_daily_pos_data(date, location, anomaly_config=None):
     daily_summary["anomaly_types"] = list(set(daily_summary["anomaly_types"]))
     return daily_summary
 
-def generate_pos_data_for_year(anomalies=None):
+def iter_pos_data_for_year(anomalies=None, batch_size=DAILY_BATCH_SIZE):
+    """
+    Stream daily POS summaries for every location of YEAR_TO_GENERATE.
+
+    Yields:
+        Lists of at most batch_size daily summaries, so callers can insert them
+        as they are produced instead of holding the whole year in memory.
+    """
     year = YEAR_TO_GENERATE
-    locations = LOCATIONS
     start_date = datetime.date(year, 1, 1)
     end_date = datetime.date(year, 12, 31)
     delta = datetime.timedelta(days=1)
-    all_daily_data = {}
-    anomaly_config = {}
-    if anomalies:
-        for anomaly in anomalies:
-            date_obj = datetime.date.fromisoformat(anomaly['date'])
-            if date_obj not in anomaly_config:
-                anomaly_config[date_obj] = {}
-            if anomaly['location'] not in anomaly_config[date_obj]:
-                anomaly_config[date_obj][anomaly['location']] = {"types": [], "hour": anomaly.get("hour")}
-            anomaly_config[date_obj][anomaly['location']]["types"].append(anomaly['type'])
-            if "hour" in anomaly:
-                anomaly_config[date_obj][anomaly['location']]["hour"] = anomaly["hour"]
-
-    for location in locations:
-        all_daily_data[location] = []
+    anomaly_index = AnomalyIndex.of(anomalies)
+
+    batch = []
+    for location in LOCATIONS:
         current_date = start_date
         while current_date <= end_date:
-            daily_data = generate_daily_pos_data(current_date, location, anomaly_config)
-            all_daily_data[location].append(daily_data)
+            batch.append(generate_daily_pos_data(current_date, location, anomaly_index))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
             current_date += delta
+    if batch:
+        yield batch
+
+def generate_pos_data_for_year(anomalies=None):
+    all_daily_data = {location: [] for location in LOCATIONS}
+    for batch in iter_pos_data_for_year(anomalies):
+        for daily_data in batch:
+            all_daily_data[daily_data["location"]].append(daily_data)
     return all_daily_data
 
 
-def store_incidents_and_problems(db, resource_ids, anomalies, year):
-    incident_collection = db["incidents"]
-    problem_collection = db["problems"]
-    anomaly_config = {}
-    if anomalies:
-        for anomaly in anomalies:
-            date_obj = datetime.date.fromisoformat(anomaly['date'])
-            if date_obj not in anomaly_config:
-                anomaly_config[date_obj] = {}
-            if anomaly['location'] not in anomaly_config[date_obj]:
-                anomaly_config[date_obj][anomaly['location']] = {"types": [], "hour": anomaly.get("hour")}
-            anomaly_config[date_obj][anomaly['location']]["types"].append(anomaly['type'])
-            if "hour" in anomaly:
-                anomaly_config[date_obj][anomaly['location']]["hour"] = anomaly["hour"]
+def store_incidents_and_problems(db, resource_ids, anomalies, year, batch_size=BULK_BATCH_SIZE, trusted_load=False,
+                                 writer=None):
+    """
+    Write the incidents and problems raised by the anomalies of one year.
+
+    Args:
+        writer: Optional sink with BufferedInserter's add/close interface (e.g. a Parquet
+            writer); defaults to a BufferedInserter on db
+    """
+    anomaly_index = AnomalyIndex.of(anomalies)
 
     start_date = datetime.date(year, 1, 1)
     end_date = datetime.date(year, 12, 31)
     delta = datetime.timedelta(days=1)
     current_date = start_date
 
+    writer = writer or BufferedInserter(db, batch_size=batch_size, trusted_load=trusted_load)
     while current_date <= end_date:
         for location, res_id in resource_ids.items():
-            if current_date in anomaly_config and location in anomaly_config[current_date]:
-                anomaly_types = anomaly_config[current_date][location]["types"]
-                anomaly_hour = anomaly_config[current_date][location].get("hour")
-                if anomaly_hour is None:
-                    anomaly_hour = 12  # Default to noon if hour is missing
-                for anomaly_type in anomaly_types:
-                    if anomaly_type in ["System Malfunction", "Significant Technical Problem", "Unauthorized Shutdown"]:
-                        incident_data = generate_incident_data(current_date, anomaly_hour, location, anomaly_type, res_id)
-                        incident_collection.insert_one(incident_data)
-                        print(f"Incident created for {location} on {current_date} due to {anomaly_type}.")
-                    if anomaly_type in ["Significant Technical Problem"]:
-                        problem_data = generate_problem_data(current_date, anomaly_hour, location, anomaly_type)
-                        problem_collection.insert_one(problem_data)
-                        print(f"Problem created for {location} on {current_date} due to {anomaly_type}.")
+            for anomaly in anomaly_index.on(location, current_date):
+                # Incidents open when the anomaly window starts (noon for all-day anomalies)
+                anomaly_hour = anomaly_index.incident_hour(anomaly)
+                if anomaly.type in ["System Malfunction", "Significant Technical Problem", "Unauthorized Shutdown"]:
+                    writer.add("incidents", generate_incident_data(current_date, anomaly_hour, location, anomaly.type, res_id))
+                if anomaly.type in ["Significant Technical Problem"]:
+                    writer.add("problems", generate_problem_data(current_date, anomaly_hour, location, anomaly.type))
         current_date += delta
-    print(f"Incident data stored in 'incidents' collection.")
-    print(f"Problem data stored in 'problems' collection.")
+    writer.close()
+    print(f"Incident data stored in 'incidents' collection ({writer.inserted.get('incidents', 0)} documents).")
+    print(f"Problem data stored in 'problems' collection ({writer.inserted.get('problems', 0)} documents).")
 
 
 
-def store_data_mongodb_hourly():
-    anomalies=POS_ANOMALIES
+def store_data_mongodb_hourly(seed=None, trusted_load=False):
+    anomalies = POS_ANOMALY_INDEX
     client = MongoClient(MONGO_URI)
     db = client[DATABASE_NAME]
     year = YEAR_TO_GENERATE
@@ -454,48 +496,28 @@ def store_data_mongodb_hourly():
         resource_ids[location] = resource_data['resource_id']
     print(f"Cloud resource data stored in 'cloud_resources' collection.")
 
-    # Cost Data Collection (hourly) - BULK INSERT
-    cost_data_collection = db["cost_data"]
-    start_date = datetime.date(year, 1, 1)
-    end_date = datetime.date(year, 12, 31)
-    delta = datetime.timedelta(days=1)
-    current_date = start_date
-    while current_date <= end_date:
-        cost_docs = []
-        for location, res_id in resource_ids.items():
-            for hour in range(24):
-                cost_data = generate_hourly_cost_data(current_date, hour, res_id)
-                cost_docs.append(cost_data)
-        if cost_docs:
-            cost_data_collection.insert_many(cost_docs)
-        current_date += delta
-    print(f"Hourly cost data stored in 'cost_data' collection.")
+    # In the "meta" schema mode every hourly point carries the resource/app metaField subdocument
+    metas = load_metas(db, resource_ids.values()) if detect_schema_mode(db) == SCHEMA_META else None
+
+    # Cost Data and Resource Utilization (hourly) - streamed month by month, BULK INSERT
+    counts = {}
+    hourly_batches = iter_hourly_batches(generate_pos_hourly_arrays, resource_ids.values(),
+                                         datetime.date(year, 1, 1), datetime.date(year, 12, 31),
+                                         POS_CALENDAR, np.random.default_rng(seed),
+                                         anomalies=anomalies, locations=resource_ids.keys(), metas=metas)
+    for collection_name, docs in hourly_batches:
+        db[collection_name].insert_many(docs)
+        counts[collection_name] = counts.get(collection_name, 0) + len(docs)
+    print(f"Hourly cost data stored in 'cost_data' collection ({counts.get('cost_data', 0)} documents).")
+    print(f"Resource utilization data stored in 'resource_utilization' collection ({counts.get('resource_utilization', 0)} documents).")
 
     # --- NEW: Incidents and Problems ---
-    store_incidents_and_problems(db, resource_ids, anomalies, year)
-
-    # Resource Utilization Collection - BULK INSERT
-    resource_utilization_collection = db["resource_utilization"]
-    start_date = datetime.date(year, 1, 1)
-    end_date = datetime.date(year, 12, 31)
-    delta = datetime.timedelta(days=1)
-    current_date = start_date
-    while current_date <= end_date:
-        util_docs = []
-        for location, res_id in resource_ids.items():
-            for hour in range(24):
-                utilization_data = generate_hourly_resource_utilization(current_date, hour, res_id)
-                util_docs.append(utilization_data)
-        if util_docs:
-            resource_utilization_collection.insert_many(util_docs)
-        current_date += delta
-    print(f"Resource utilization data stored in 'resource_utilization' collection.")
+    store_incidents_and_problems(db, resource_ids, anomalies, year, trusted_load=trusted_load)
 
     client.close()
 
 # Fix for Issue 1 (Option A): Call the correct function name
 if __name__ == "__main__":
-    daily_pos_data = generate_pos_data_for_year()
     store_data_mongodb_hourly()
     
     print("\nCMDB-like data generation and storage complete.")
@@ -0,0 +1,211 @@
+"""
+Scale-factor dataset generator.
+
+The default populators create one resource per location for each of the two
+applications, which is only a few hundred thousand hourly rows a year. This
+script grows the dataset in the spirit of the TPC "SF" knob so agent tools and
+materialized views can be benchmarked at production-like sizes:
+
+    SF=1  -> 2 applications, 2 resources per location, 1 year (today's dataset size)
+    SF=k  -> 2k applications, 2k resources per location
+
+Resources are spread round-robin over the applications and over the aws/azure/gcp
+providers the agent's Provider model accepts. Applications alternate between the
+POS and ecommerce cost/utilization profiles. The hourly series are loaded with the
+sharded parallel loader and the run reports rows per second. --anomalies adds
+that many random anomaly windows on top of the demo anomaly calendar; they are
+compiled into one AnomalyIndex per profile and drive both the hourly cost and
+utilization spikes and the incidents.
+"""
+
+import datetime
+import random
+import time
+
+from pymongo import MongoClient
+
+from demo_constants import (YEAR_TO_GENERATE, MONGO_URI, DATABASE_NAME, LOCATIONS)
+from parallel_loader import plan_shards, generate_shard_batches, store_hourly_data_parallel
+from anomaly_index import AnomalyIndex
+from timeseries_schema import SCHEMA_FLAT, SCHEMA_META, build_metas, detect_schema_mode
+import populate_collections_pos as pos
+import populate_collection_ecommerce as ecommerce
+
+# Must stay within finops_agent.Provider
+PROVIDERS = ["aws", "azure", "gcp"]
+PROVIDER_REGIONS = {"aws": "us-east-1", "azure": "centralus", "gcp": "us-central1"}
+PROFILE_MODULES = {"pos": pos, "ecommerce": ecommerce}
+PROFILE_ANOMALIES = {"pos": pos.POS_ANOMALIES, "ecommerce": ecommerce.ECOMM_ANOMALIES}
+
+
+def scale_config(scale_factor=1, resources_per_location=None, applications=None, years=None, anomalies=0):
+    """Resolve a scale factor into explicit sizes; explicit values win over the SF defaults."""
+    return {
+        "resources_per_location": resources_per_location or 2 * scale_factor,
+        "applications": applications or 2 * scale_factor,
+        "years": years or 1,
+        "anomalies": anomalies,
+    }
+
+
+def generate_scaled_applications(count):
+    """Alternate POS/ecommerce apps; the first app of each profile keeps the demo app_id."""
+    apps = []
+    for i in range(count):
+        profile = "pos" if i % 2 == 0 else "ecommerce"
+        number = i // 2 + 1
+        app = PROFILE_MODULES[profile].generate_application_data()
+        app["app_id"] = f"{app['name'].lower()}-app-{number:02d}"
+        if number > 1:
+            app["name"] = f"{app['name']} {number:02d}"
+        apps.append((profile, app))
+    return apps
+
+
+def generate_scaled_anomalies(count, years):
+    """
+    Compile the demo anomalies plus count random ones per profile into AnomalyIndex objects.
+
+    Random anomalies reuse each profile's demo anomaly types and last 1-6 hours.
+
+    Returns:
+        {profile: AnomalyIndex}
+    """
+    indexes = {}
+    first_day = datetime.date(min(years), 1, 1)
+    n_days = (datetime.date(max(years), 12, 31) - first_day).days + 1
+    for profile, demo_anomalies in PROFILE_ANOMALIES.items():
+        types = sorted({anomaly["type"] for anomaly in demo_anomalies})
+        anomalies = list(demo_anomalies)
+        for _ in range(count):
+            start_hour = random.randrange(24)
+            anomalies.append({
+                "date": first_day + datetime.timedelta(days=random.randrange(n_days)),
+                "location": random.choice(LOCATIONS),
+                "type": random.choice(types),
+                "start_hour": start_hour,
+                "end_hour": min(24, start_hour + random.randint(1, 6)),
+            })
+        indexes[profile] = AnomalyIndex(anomalies)
+    return indexes
+
+
+def generate_scaled_resources(apps, resources_per_location):
+    """
+    resources_per_location resources in every location. Applications are assigned
+    round-robin, continuing from one location to the next, so that with fewer
+    resources per location than applications every app still gets resources (in
+    different locations). When the app count divides resources_per_location, as with
+    the SF defaults, every location gets the same apps. Providers are assigned per app
+    and shift with every round of apps, so each app runs on every provider.
+
+    Returns:
+        (resources, resource_ids) where resource_ids is {profile: {location: [resource_id, ...]}}
+    """
+    resources = []
+    resource_ids = {profile: {} for profile in PROFILE_MODULES}
+    for location_number, location in enumerate(LOCATIONS):
+        location_slug = location.lower().replace(' ', '_')
+        for i in range(resources_per_location):
+            round_number, app_number = divmod(location_number * resources_per_location + i, len(apps))
+            profile, app = apps[app_number]
+            # Shift the providers by one per round of apps, so every app cycles through all of them
+            provider = PROVIDERS[(app_number + round_number) % len(PROVIDERS)]
+            resource = PROFILE_MODULES[profile].generate_cloud_resource_data(location)
+            resource.update({
+                "resource_id": f"{location_slug}-{provider}-{app['app_id']}-{i:04d}",
+                "app_id": app["app_id"],
+                "provider": provider,
+                "region": PROVIDER_REGIONS[provider],
+                "environment": random.choice(["prod", "prod", "test", "dev"]),
+            })
+            resources.append(resource)
+            resource_ids[profile].setdefault(location, []).append(resource["resource_id"])
+    return resources, resource_ids
+
+
+def generate_scaled_dataset(config, seed=0, max_workers=None, generate_only=False, trusted_load=False,
+                            schema_mode=None):
+    """
+    Generate (and unless generate_only, insert) a scaled dataset.
+
+    Args:
+        config: Output of scale_config
+        seed: Base seed; the dataset is reproducible for a given seed and config
+        max_workers: Process pool size for the hourly load
+        generate_only: Only time generation in-process, without touching MongoDB
+        trusted_load: Bypass document validation for incidents and problems
+        schema_mode: "flat" or "meta" hourly documents; defaults to the mode of the target
+            collections (flat with generate_only)
+
+    Returns:
+        Dict with per-collection row counts, elapsed seconds and rows_per_second
+    """
+    random.seed(seed)
+    years = range(YEAR_TO_GENERATE, YEAR_TO_GENERATE + config["years"])
+    apps = generate_scaled_applications(config["applications"])
+    resources, resource_ids = generate_scaled_resources(apps, config["resources_per_location"])
+    anomalies = generate_scaled_anomalies(config.get("anomalies", 0), years)
+
+    client = None if generate_only else MongoClient(MONGO_URI)
+    if schema_mode is None:
+        schema_mode = SCHEMA_FLAT if generate_only else detect_schema_mode(client[DATABASE_NAME])
+    metas = build_metas(resources, [app for _, app in apps]) if schema_mode == SCHEMA_META else None
+
+    shards = []
+    for profile, ids in resource_ids.items():
+        shards.extend(plan_shards(profile, ids, years, seed, anomalies[profile], metas))
+
+    start = time.perf_counter()
+    if generate_only:
+        counts = {}
+        for shard in shards:
+            for collection_name, docs in generate_shard_batches(shard):
+                counts[collection_name] = counts.get(collection_name, 0) + len(docs)
+    else:
+        db = client[DATABASE_NAME]
+        db["applications"].insert_many([app for _, app in apps])
+        db["cloud_resources"].insert_many(resources, ordered=False)
+        counts = store_hourly_data_parallel(shards, max_workers=max_workers)
+        # Incidents/problems follow the anomaly calendar on the first resource of each location
+        for profile, ids in resource_ids.items():
+            first_ids = {location: location_ids[0] for location, location_ids in ids.items()}
+            for year in years:
+                if profile == "pos":
+                    pos.store_incidents_and_problems(db, first_ids, anomalies[profile], year,
+                                                     trusted_load=trusted_load)
+                else:
+                    ecommerce.store_ecommerce_incidents_and_problems(db, first_ids, anomalies[profile], year,
+                                                                     trusted_load=trusted_load)
+        client.close()
+    elapsed = time.perf_counter() - start
+
+    counts["applications"] = len(apps)
+    counts["cloud_resources"] = len(resources)
+    rows = sum(counts.values())
+    return {"counts": counts, "rows": rows, "elapsed_seconds": elapsed,
+            "rows_per_second": rows / elapsed if elapsed > 0 else 0.0}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a scaled FinOps dataset")
+    parser.add_argument("--sf", type=int, default=1, help="Scale factor (default: 1)")
+    parser.add_argument("--resources-per-location", type=int, default=None)
+    parser.add_argument("--applications", type=int, default=None)
+    parser.add_argument("--years", type=int, default=None)
+    parser.add_argument("--anomalies", type=int, default=0, help="Random anomalies to add per profile")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--generate-only", action="store_true", help="Measure generation only, no MongoDB writes")
+    parser.add_argument("--trusted-load", action="store_true", help="Bypass validators for incidents and problems")
+    args = parser.parse_args()
+
+    config = scale_config(args.sf, args.resources_per_location, args.applications, args.years, args.anomalies)
+    print(f"Scale config: {config} ({len(LOCATIONS)} locations)")
+    report = generate_scaled_dataset(config, seed=args.seed, max_workers=args.workers,
+                                     generate_only=args.generate_only, trusted_load=args.trusted_load)
+    for collection_name, count in report["counts"].items():
+        print(f"- {collection_name}: {count}")
+    print(f"{report['rows']} rows in {report['elapsed_seconds']:.1f}s ({report['rows_per_second']:,.0f} rows/s)")
@@ -0,0 +1,184 @@
+"""
+Aggregation pipelines of the incident search (semantic_search.py, hybrid_search.py).
+
+Kept apart from the search modules, which create the embedding and LLM clients
+at import time, so that other scripts (e.g. explain_harness.py) can build the
+same pipelines without API keys.
+"""
+
+
+def vector_search_pipeline(query_embedding, limit=5, num_candidates=50):
+    """$vectorSearch over incident embeddings, as used by semantic_search."""
+    return [
+        {
+            "$vectorSearch": {
+                "index": "vector_index",
+                "queryVector": query_embedding,
+                "path": "embedding",
+                "limit": limit,  # number of nearest neighbors to return
+                "numCandidates": num_candidates,  # number of HNSW entry points to explore
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "title": 1,
+                "description": 1,
+                "resource_id": 1,
+                "estimated_cost": 1,
+                "metrics": "metrics",
+                "score": { '$meta': "vectorSearchScore" }            }
+        },
+    ]
+
+
+def hybrid_search_pipeline(query, query_embedding, vector_weight=0.8, full_text_weight=0.2):
+    """
+    Reciprocal-rank fusion of $vectorSearch and the $search phrase query on incidents.
+    Args:
+        query (str): Query string for the full-text side
+        query_embedding (list): Query vector for the vector side
+    """
+    return [
+        {
+            '$vectorSearch': {
+                'index': 'vector_index', 
+                'path': 'embedding', 
+                'queryVector': query_embedding, 
+                'numCandidates': 50, 
+                'limit': 10
+            }
+        }, {
+            '$group': {
+                '_id': None, 
+                'docs': {
+                    '$push': '$$ROOT'
+                }
+            }
+        }, {
+            '$unwind': {
+                'path': '$docs', 
+                'includeArrayIndex': 'rank'
+            }
+        }, {
+            '$addFields': {
+                'vs_score': {
+                    '$multiply': [
+                        vector_weight, {
+                            '$divide': [
+                                1.0, {
+                                    '$add': [
+                                        '$rank', 60
+                                    ]
+                                }
+                            ]
+                        }
+                    ]
+                }
+            }
+        }, {
+            '$project': {
+                'vs_score': 1, 
+                '_id': '$docs._id', 
+                'description': '$docs.description',
+            }
+        }, {
+            '$unionWith': {
+                'coll': 'incidents', 
+                'pipeline': [
+                    {
+                        '$search': {
+                            'index': 'search_index', 
+                            'phrase': {
+                                'query': query, 
+                                'path': 'description'
+                            }
+                        }
+                    }, {
+                        '$limit': 10
+                    }, {
+                        '$group': {
+                            '_id': None, 
+                            'docs': {
+                                '$push': '$$ROOT'
+                            }
+                        }
+                    }, {
+                        '$unwind': {
+                            'path': '$docs', 
+                            'includeArrayIndex': 'rank'
+                        }
+                    }, {
+                        '$addFields': {
+                            'fts_score': {
+                                '$multiply': [
+                                    full_text_weight, {
+                                        '$divide': [
+                                            1.0, {
+                                                '$add': [
+                                                    '$rank', 60
+                                                ]
+                                            }
+                                        ]
+                                    }
+                                ]
+                            }
+                        }
+                    }, {
+                        '$project': {
+                            'fts_score': 1, 
+                            '_id': '$docs._id', 
+                            'description': '$docs.description',
+                        }
+                    }
+                ]
+            }
+        }, {
+            '$group': {
+                '_id': '$_id', 
+                'description': {
+                    '$first': '$description'
+                }, 
+                'vs_score': {
+                    '$max': '$vs_score'
+                }, 
+                'fts_score': {
+                    '$max': '$fts_score'
+                }
+            }
+        }, {
+            '$project': {
+                '_id': 1, 
+                'description': 1, 
+                'vs_score': {
+                    '$ifNull': [
+                        '$vs_score', 0
+                    ]
+                }, 
+                'fts_score': {
+                    '$ifNull': [
+                        '$fts_score', 0
+                    ]
+                }
+            }
+        }, {
+            '$project': {
+                'score': {
+                    '$add': [
+                        '$fts_score', '$vs_score'
+                    ]
+                }, 
+                '_id': 1, 
+                'description': 1, 
+                'vs_score': 1, 
+                'fts_score': 1
+            }
+        }, {
+            '$sort': {
+                'score': -1
+            }
+        }, {
+            '$limit': 10
+        }
+
+    ]
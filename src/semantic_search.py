@@ -7,6 +7,8 @@ from langchain.prompts import PromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
+from search_pipelines import vector_search_pipeline
+
 client = pymongo.MongoClient(demo_constants.MONGO_URI)
 db = client[demo_constants.DATABASE_NAME]
 vo = voyageai.Client(api_key=demo_constants.VOYAGEAI_API_KEY)
@@ -24,27 +26,7 @@ def semantic_search(query):
 
     query_embedding = vo.embed([query], model=demo_constants.VOYAGEAI_EMBEDDINDG_MODEL, input_type="query").embeddings[0]
 
-    pipeline = [
-        {
-            "$vectorSearch": {
-                "index": "vector_index",
-                "queryVector": query_embedding,
-                "path": "embedding",
-                "limit": 5,  # number of nearest neighbors to return
-                "numCandidates": 50,  # number of HNSW entry points to explore
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "title": 1,
-                "description": 1,
-                "resource_id": 1,
-                "estimated_cost": 1,
-                "metrics": "metrics",
-                "score": { '$meta': "vectorSearchScore" }            }
-        },
-    ]
+    pipeline = vector_search_pipeline(query_embedding)
 
     results = coll.aggregate(pipeline)
     
@@ -0,0 +1,364 @@
+"""
+Local columnar cache of the hourly cost and utilization series.
+
+Ad-hoc analysis keeps reading the same hourly ranges of cost_data and
+resource_utilization. SeriesCache keeps them on local disk as NumPy arrays, one
+directory per month:
+
+    <cache_dir>/catalog.json                 resource_id -> app_id, app_name, business_unit,
+                                             environment, provider, resource_type
+    <cache_dir>/state.json                   schema mode and latest cached timestamp per collection
+    <cache_dir>/2024-12/resources.json       resource_id of every array row
+    <cache_dir>/2024-12/cost.npy             float64 (resources x hours of the month), NaN = no point
+    <cache_dir>/2024-12/cpu_utilization.npy
+    <cache_dir>/2024-12/memory_utilization.npy
+
+The arrays are opened memory-mapped, so a resource's month is one row slice and
+only the pages that are read leave the disk. refresh() reads the points from the
+latest cached hour on (that hour again, so points it was missing are picked up)
+one month range at a time, and writes each month into its (resource, hour)
+cells before reading the next, so memory is bounded by one month of points
+rather than the whole backlog; rewriting a cell is harmless,
+so refreshes can overlap. Points inserted later for older hours need a --full
+refresh.
+
+waste(), anomalies() and cost_trend() compute the mv_cloud_waste,
+mv_cost_anomalies and cost trend figures from the arrays, and take the same
+app_id/environment/provider filters as the agent's get_cloud_resources.
+"""
+
+import calendar
+import datetime
+import json
+import os
+import shutil
+
+import numpy as np
+from pymongo import MongoClient
+
+from demo_constants import (MONGO_URI, DATABASE_NAME)
+from timeseries_schema import detect_schema_mode, document_resource_id, load_metas, resource_id_path
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".series_cache")
+SERIES_FIELDS = {
+    "cost_data": ["cost"],
+    "resource_utilization": ["cpu_utilization", "memory_utilization"],
+}
+FIELDS = [field for fields in SERIES_FIELDS.values() for field in fields]
+ANOMALY_THRESHOLD = 20.0
+
+
+def month_key(timestamp):
+    return f"{timestamp.year:04d}-{timestamp.month:02d}"
+
+
+def month_start(key):
+    return datetime.datetime.strptime(key, "%Y-%m")
+
+
+def next_month_start(start):
+    return (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def hours_in_month(key):
+    start = month_start(key)
+    return calendar.monthrange(start.year, start.month)[1] * 24
+
+
+class CachedMonth:
+    """The arrays of one month; rows follow `resource_ids`."""
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+        self.key = os.path.basename(path)
+        with open(os.path.join(path, "resources.json")) as f:
+            self.resource_ids = json.load(f)
+        self.rows = {resource_id: row for row, resource_id in enumerate(self.resource_ids)}
+        self.arrays = {field: np.load(os.path.join(path, f"{field}.npy"), mmap_mode=mode) for field in FIELDS}
+
+    @classmethod
+    def create(cls, path, resource_ids, previous=None):
+        """
+        Write empty (NaN) arrays for resource_ids, copying the rows of `previous`
+        (a CachedMonth of the same month with fewer resources).
+        """
+        staging = f"{path}.staging"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        hours = hours_in_month(os.path.basename(path))
+        for field in FIELDS:
+            array = np.lib.format.open_memmap(os.path.join(staging, f"{field}.npy"), mode="w+",
+                                              dtype=np.float64, shape=(len(resource_ids), hours))
+            array[:] = np.nan
+            if previous is not None:
+                array[:len(previous.resource_ids)] = previous.arrays[field]
+            array.flush()
+            del array
+        with open(os.path.join(staging, "resources.json"), "w") as f:
+            json.dump(list(resource_ids), f)
+        if previous is not None:
+            previous.arrays.clear()
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(staging, path)
+        return cls(path, mode="r+")
+
+    def rows_of(self, resource_ids):
+        """Array rows of the resource_ids this month has (ids without data are skipped)."""
+        return [(resource_id, self.rows[resource_id]) for resource_id in resource_ids if resource_id in self.rows]
+
+
+class SeriesCache:
+    """Memory-mapped hourly series per resource and month."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.catalog = self._read_json("catalog.json", {})
+        self.state = self._read_json("state.json", {"latest": {}})
+
+    def _read_json(self, name, default):
+        path = os.path.join(self.cache_dir, name)
+        if not os.path.exists(path):
+            return default
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_json(self, name, value):
+        path = os.path.join(self.cache_dir, name)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(value, f, default=str)
+        os.replace(f"{path}.tmp", path)
+
+    def months(self):
+        """Cached months as sorted "YYYY-MM" keys."""
+        return sorted(name for name in os.listdir(self.cache_dir)
+                      if os.path.exists(os.path.join(self.cache_dir, name, "resources.json")))
+
+    def month(self, key, mode="r"):
+        return CachedMonth(os.path.join(self.cache_dir, key), mode)
+
+    def resources(self, app_id=None, environment=None, provider=None):
+        """Cached resource ids matching the get_cloud_resources filters."""
+        filters = {"app_id": app_id, "environment": environment, "provider": provider}
+        return sorted(resource_id for resource_id, resource in self.catalog.items()
+                      if all(value is None or resource.get(field) == value for field, value in filters.items()))
+
+    def refresh(self, db=None, full=False, schema_mode=None):
+        """
+        Bring the cache up to date with MongoDB.
+
+        Args:
+            db: Database to read (default: a new client on DATABASE_NAME)
+            full: Drop the cache and read every point again
+            schema_mode: "flat" or "meta" (default: detected from cost_data)
+
+        Returns:
+            Dict of points written per collection
+        """
+        client = None
+        if db is None:
+            client = MongoClient(MONGO_URI)
+            db = client[DATABASE_NAME]
+        if full:
+            for key in self.months():
+                shutil.rmtree(os.path.join(self.cache_dir, key))
+            self.state = {"latest": {}}
+        schema_mode = schema_mode or detect_schema_mode(db)
+        self.catalog = {resource_id: {field: meta.get(field) for field in
+                                      ("app_id", "app_name", "business_unit", "environment", "provider",
+                                       "resource_type")}
+                        for resource_id, meta in load_metas(db).items()}
+        self._write_json("catalog.json", self.catalog)
+
+        resource_path = resource_id_path(schema_mode)
+        counts = {}
+        for collection_name, fields in SERIES_FIELDS.items():
+            latest = self.state["latest"].get(collection_name)
+            latest = datetime.datetime.fromisoformat(latest) if latest else None
+            since = latest
+            query = {"timestamp": {"$gte": since}} if since else {}
+            first = db[collection_name].find_one(query, {"timestamp": 1}, sort=[("timestamp", 1)])
+            last = db[collection_name].find_one(query, {"timestamp": 1}, sort=[("timestamp", -1)])
+            projection = {"_id": 0, resource_path: 1, "timestamp": 1, **{field: 1 for field in fields}}
+            counts[collection_name] = 0
+            start = month_start(month_key(first["timestamp"])) if first else None
+            # One month range per query; each month is written before the next one is read
+            while start is not None and start <= last["timestamp"]:
+                end = next_month_start(start)
+                month_query = {"timestamp": {"$gte": max(start, since) if since else start, "$lt": end}}
+                resource_ids, hours, values = [], [], {field: [] for field in fields}
+                for doc in db[collection_name].find(month_query, projection, batch_size=10000):
+                    timestamp = doc["timestamp"]
+                    resource_ids.append(document_resource_id(doc))
+                    hours.append((timestamp.day - 1) * 24 + timestamp.hour)
+                    for field in fields:
+                        value = doc.get(field)
+                        values[field].append(np.nan if value is None else value)
+                    if latest is None or timestamp > latest:
+                        latest = timestamp
+                if resource_ids:
+                    self._write_points(month_key(start), resource_ids, hours, values)
+                counts[collection_name] += len(resource_ids)
+                start = end
+            self.state["latest"][collection_name] = latest.isoformat() if latest else None
+        self.state["schema_mode"] = schema_mode
+        self._write_json("state.json", self.state)
+        if client is not None:
+            client.close()
+        return counts
+
+    def _write_points(self, key, resource_ids, hours, values):
+        path = os.path.join(self.cache_dir, key)
+        month = CachedMonth(path, mode="r+") if os.path.exists(os.path.join(path, "resources.json")) else None
+        new_ids = sorted(set(resource_ids) - set(month.resource_ids if month else ()))
+        if new_ids:
+            known = month.resource_ids if month else []
+            month = CachedMonth.create(path, known + new_ids, previous=month)
+        rows = np.fromiter((month.rows[resource_id] for resource_id in resource_ids), dtype=np.intp,
+                           count=len(resource_ids))
+        hours = np.asarray(hours, dtype=np.intp)
+        for field, field_values in values.items():
+            month.arrays[field][rows, hours] = np.asarray(field_values, dtype=np.float64)
+            month.arrays[field].flush()
+
+    def series(self, field, key, resource_ids=None):
+        """
+        One field of one month.
+
+        Returns:
+            (resource_ids, array of shape (resources, hours)), memory-mapped when unfiltered
+        """
+        month = self.month(key)
+        if resource_ids is None:
+            return month.resource_ids, month.arrays[field]
+        selected = month.rows_of(resource_ids)
+        return [resource_id for resource_id, _ in selected], month.arrays[field][[row for _, row in selected]]
+
+    def waste(self, key=None, app_id=None, environment=None, provider=None):
+        """
+        mv_cloud_waste figures for one month (default: the latest), sorted by waste_percentage.
+
+        Returns:
+            List of dicts with resource_id, app_id, average_utilization and waste_percentage
+            (percent), monthly_cost and estimated_waste_cost
+        """
+        key = key or self.months()[-1]
+        resource_ids = self.resources(app_id, environment, provider)
+        ids, cpu = self.series("cpu_utilization", key, resource_ids)
+        _, memory = self.series("memory_utilization", key, resource_ids)
+        _, cost = self.series("cost", key, resource_ids)
+        with np.errstate(invalid="ignore"):
+            averages = np.stack([_nanmean_rows(cpu), _nanmean_rows(memory)])
+            average = _nanmean_rows(averages.T)
+        costs = np.nansum(cost, axis=1)
+        results = []
+        for i, resource_id in enumerate(ids):
+            if np.isnan(average[i]):
+                continue
+            waste_percentage = (1 - average[i]) * 100
+            results.append({"resource_id": resource_id, "app_id": self.catalog.get(resource_id, {}).get("app_id"),
+                            "average_utilization": float(average[i] * 100),
+                            "waste_percentage": float(waste_percentage),
+                            "monthly_cost": float(costs[i]),
+                            "estimated_waste_cost": float(costs[i] * waste_percentage / 100)})
+        return sorted(results, key=lambda row: row["waste_percentage"], reverse=True)
+
+    def anomalies(self, current=None, previous=None, threshold=ANOMALY_THRESHOLD, app_id=None, environment=None,
+                  provider=None):
+        """
+        mv_cost_anomalies figures: daily average cost of `current` (default: the latest month)
+        vs. `previous` (default: the month before), for increases of at least threshold percent.
+        """
+        current = current or self.months()[-1]
+        if previous is None:
+            start = month_start(current)
+            previous = month_key(start - datetime.timedelta(days=1))
+        if previous not in self.months():
+            return []
+        resource_ids = self.resources(app_id, environment, provider)
+        daily = {}
+        for key in (previous, current):
+            ids, cost = self.series("cost", key, resource_ids)
+            days = cost.reshape(len(ids), -1, 24)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                daily[key] = dict(zip(ids, np.nansum(cost, axis=1) / (~np.isnan(days)).any(axis=2).sum(axis=1)))
+        results = []
+        for resource_id, current_avg in daily[current].items():
+            previous_avg = daily[previous].get(resource_id)
+            if previous_avg is None or not previous_avg > 0 or np.isnan(current_avg):
+                continue
+            increase = (current_avg - previous_avg) / previous_avg * 100
+            if increase >= threshold:
+                results.append({"resource_id": resource_id, "app_id": self.catalog.get(resource_id, {}).get("app_id"),
+                                "previous_month_daily_avg": float(previous_avg),
+                                "current_month_daily_avg": float(current_avg),
+                                "percentage_increase": float(increase)})
+        return sorted(results, key=lambda row: row["percentage_increase"], reverse=True)
+
+    def cost_trend(self, start, end, unit="day", group_by="app_id", app_id=None, environment=None, provider=None):
+        """
+        Cost summed per day (or hour) and per catalog field (app_id, business_unit, ...) over [start, end).
+
+        Returns:
+            {group: {period_start: cost}}
+        """
+        resource_ids = self.resources(app_id, environment, provider)
+        hours_per_period = {"hour": 1, "day": 24}[unit]
+        trend = {}
+        for key in self.months():
+            month = month_start(key)
+            first = max(0, int((start - month).total_seconds() // 3600))
+            last = min(hours_in_month(key), int((end - month).total_seconds() // 3600))
+            if first >= last:
+                continue
+            ids, cost = self.series("cost", key, resource_ids)
+            groups = {}
+            for row, resource_id in enumerate(ids):
+                groups.setdefault(self.catalog.get(resource_id, {}).get(group_by), []).append(row)
+            periods = (last - first) // hours_per_period
+            for group, rows in groups.items():
+                window = cost[rows, first:first + periods * hours_per_period].reshape(len(rows), periods, -1)
+                sums = np.nansum(window, axis=(0, 2))
+                seen = (~np.isnan(window)).any(axis=(0, 2))
+                series = trend.setdefault(group, {})
+                for period in np.flatnonzero(seen):
+                    period_start = month + datetime.timedelta(hours=first + int(period) * hours_per_period)
+                    series[period_start] = float(sums[period])
+        return trend
+
+
+def _nanmean_rows(array):
+    counts = (~np.isnan(array)).sum(axis=1)
+    sums = np.nansum(array, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh and query the local series cache")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--full", action="store_true", help="Rebuild the cache from scratch")
+    parser.add_argument("--report", choices=["waste", "anomalies"], default=None,
+                        help="After refreshing, print the top waste or anomaly rows from the cache")
+    parser.add_argument("--month", default=None, help="Month to report, YYYY-MM (default: latest)")
+    parser.add_argument("--app-id", default=None)
+    parser.add_argument("--environment", choices=["prod", "test", "dev"], default=None)
+    parser.add_argument("--provider", choices=["aws", "azure", "gcp"], default=None)
+    parser.add_argument("--no-refresh", action="store_true", help="Report from the cache as it is")
+    args = parser.parse_args()
+
+    cache = SeriesCache(args.cache_dir)
+    if not args.no_refresh:
+        counts = cache.refresh(full=args.full)
+        print(f"Cached {sum(counts.values())} new or updated points ({counts}) in {args.cache_dir}; "
+              f"months: {', '.join(cache.months())}")
+    filters = {"app_id": args.app_id, "environment": args.environment, "provider": args.provider}
+    if args.report == "waste":
+        for row in cache.waste(args.month, **filters)[:10]:
+            print(f"{row['resource_id']:45} waste {row['waste_percentage']:5.1f}%  cost {row['monthly_cost']:10.2f}")
+    elif args.report == "anomalies":
+        for row in cache.anomalies(args.month, **filters)[:10]:
+            print(f"{row['resource_id']:45} +{row['percentage_increase']:.1f}%  "
+                  f"({row['previous_month_daily_avg']:.2f} -> {row['current_month_daily_avg']:.2f} per day)")
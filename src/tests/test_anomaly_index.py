@@ -0,0 +1,50 @@
+"""
+Tests for the compiled anomaly interval index
+"""
+import datetime
+
+import numpy as np
+from anomaly_index import AnomalyIndex
+from populate_collections_pos import generate_pos_hourly_arrays
+from vectorized_hourly import HourGrid
+
+ANOMALIES = [
+    {"date": "2024-01-01", "location": "Austin", "type": "Network Connectivity Loss", "start_hour": 10, "end_hour": 13},
+    {"date": "2024-01-01", "location": "Austin", "type": "Hardware Failure", "hour": 12},
+    {"date": "2024-01-02", "location": "Austin", "type": "System Malfunction"},
+]
+
+def test_active_honours_hour_windows():
+    """start_hour/end_hour windows are half-open, hourless anomalies cover the whole day"""
+    index = AnomalyIndex(ANOMALIES)
+    day = datetime.date(2024, 1, 1)
+    assert [a.type for a in index.active("Austin", day, 9)] == []
+    assert [a.type for a in index.active("Austin", day, 12)] == ["Network Connectivity Loss", "Hardware Failure"]
+    assert [a.type for a in index.active("Austin", day, 13)] == []
+    assert len(index.active("Austin", datetime.date(2024, 1, 2), 23)) == 1
+    assert index.active("Plano", day, 12) == []
+    assert [index.incident_hour(a) for a in index.on("Austin", datetime.date(2024, 1, 2))] == [12]
+
+def test_hour_mask_matches_active():
+    """The vectorized mask marks exactly the hours where an anomaly is active"""
+    index = AnomalyIndex(ANOMALIES)
+    grid = HourGrid(datetime.date(2023, 12, 31), datetime.date(2024, 1, 3))
+    mask = index.hour_mask("Austin", grid)
+    expected = [bool(index.active("Austin", ts.date(), ts.hour)) for ts in grid.datetimes()]
+    assert list(mask) == expected
+    assert mask.sum() == 3 + 24
+
+def test_only_load_anomalies_raise_cost():
+    """Load anomalies raise cost and utilization; shutdown/outage hours go idle at the normal cost"""
+    index = AnomalyIndex(ANOMALIES + [{"date": "2024-01-03", "location": "Austin", "type": "Peak Event Impact",
+                                       "hour": 15}])
+    grid = HourGrid(datetime.date(2024, 1, 1), datetime.date(2024, 1, 3))
+    load, idle = index.effect_masks("Austin", grid)
+    assert load.sum() == 1 and idle.sum() == 3 + 24
+    base = generate_pos_hourly_arrays(grid, 2, np.random.default_rng(4))
+    arrays = generate_pos_hourly_arrays(grid, 2, np.random.default_rng(4), load_mask=np.stack([load, load]),
+                                        idle_mask=np.stack([idle, idle]))
+    cost, base_cost = arrays["cost_data"]["cost"], base["cost_data"]["cost"]
+    assert (cost[:, idle] == base_cost[:, idle]).all()
+    assert (cost[:, load] > base_cost[:, load]).all()
+    assert (arrays["resource_utilization"]["cpu_utilization"][:, idle] == 0.05).all()
@@ -0,0 +1,40 @@
+"""
+Tests for the incremental append mode
+"""
+import datetime
+from append_loader import plan_append, resource_location
+
+class FakeCollection:
+    def __init__(self, rows=(), docs=()):
+        self.rows = list(rows)
+        self.docs = list(docs)
+
+    def aggregate(self, pipeline):
+        return iter(self.rows)
+
+    def find(self, query=None, projection=None):
+        return iter(self.docs)
+
+def test_resource_location_prefers_longest_slug():
+    assert resource_location("dallas-fort_worth-pos-terminal-123") == "Dallas-Fort Worth"
+    assert resource_location("the_woodlands-aws-ecommerceplatform-app-01-0003") == "The Woodlands"
+    assert resource_location("unknown-site") is None
+
+def test_plan_append_resumes_after_latest_hour():
+    """Resources are grouped by the hour they resume after; up-to-date resources are skipped"""
+    last = datetime.datetime(2024, 12, 31, 23)
+    db = {
+        "cost_data": FakeCollection([{"_id": "austin-pos-terminal-100", "latest": last},
+                                     {"_id": "plano-ecommerce-site", "latest": datetime.datetime(2025, 1, 2)}]),
+        "resource_utilization": FakeCollection([{"_id": "austin-pos-terminal-100", "latest": last}]),
+        "cloud_resources": FakeCollection(docs=[
+            {"resource_id": "austin-pos-terminal-100", "app_id": "retailpos-app-01"},
+            {"resource_id": "plano-ecommerce-site", "app_id": "ecommerceplatform-app-01"},
+            {"resource_id": "frisco-ecommerce-site", "app_id": "ecommerceplatform-app-01"},
+        ]),
+    }
+    groups, latest = plan_append(db, until=datetime.datetime(2025, 1, 1, 5))
+    assert groups[("pos", last)] == [("austin-pos-terminal-100", "Austin")]
+    # No utilization rows yet for Plano, so it starts from the beginning like Frisco
+    start = datetime.datetime(2023, 12, 31, 23)
+    assert groups[("ecommerce", start)] == [("plano-ecommerce-site", "Plano"), ("frisco-ecommerce-site", "Frisco")]
@@ -0,0 +1,35 @@
+"""
+Tests for the overlapped async loader
+"""
+import asyncio
+from async_loader import AdaptiveBatchSizer, insert_batches_async
+
+class SlowCollection:
+    def __init__(self, state):
+        self.state = state
+
+    async def insert_many(self, docs, ordered=True):
+        self.state["in_flight"] += 1
+        self.state["peak"] = max(self.state["peak"], self.state["in_flight"])
+        await asyncio.sleep(0.01)
+        self.state["in_flight"] -= 1
+        self.state["docs"] += len(docs)
+
+def test_insert_batches_async_bounds_in_flight():
+    """All documents are inserted and concurrency never exceeds max_in_flight"""
+    state = {"in_flight": 0, "peak": 0, "docs": 0}
+    db = {"cost_data": SlowCollection(state)}
+    batches = (("cost_data", [{"n": i}] * 100) for i in range(50))
+    sizer = AdaptiveBatchSizer(initial=200, minimum=100, maximum=200)
+    counts = asyncio.run(insert_batches_async(batches, db, max_in_flight=3, sizer=sizer))
+    assert counts == {"cost_data": 5000}
+    assert state["docs"] == 5000
+    assert 1 < state["peak"] <= 3
+
+def test_adaptive_batch_sizer():
+    """Batch size grows on fast writes and shrinks on slow ones, within bounds"""
+    sizer = AdaptiveBatchSizer(initial=1000, minimum=500, maximum=4000, target_latency=1.0)
+    sizer.record(0.1)
+    assert sizer.batch_size == 1500
+    sizer.record(3.0)
+    assert sizer.batch_size == 500
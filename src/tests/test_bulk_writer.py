@@ -0,0 +1,24 @@
+"""
+Tests for the buffered bulk inserter
+"""
+from types import SimpleNamespace
+from bulk_writer import BufferedInserter
+
+class RecordingCollection:
+    def __init__(self):
+        self.calls = []
+
+    def insert_many(self, docs, ordered=True, bypass_document_validation=False):
+        self.calls.append((len(docs), ordered, bypass_document_validation))
+        return SimpleNamespace(inserted_ids=list(range(len(docs))))
+
+def test_buffered_inserter_flushes_unordered_batches():
+    """Documents are flushed in unordered batches of batch_size, with the remainder on close"""
+    db = {"incidents": RecordingCollection(), "problems": RecordingCollection()}
+    with BufferedInserter(db, batch_size=4, trusted_load=True, show_progress=False) as writer:
+        for i in range(10):
+            writer.add("incidents", {"n": i})
+        writer.add("problems", {"n": 0})
+    assert db["incidents"].calls == [(4, False, True), (4, False, True), (2, False, True)]
+    assert db["problems"].calls == [(1, False, True)]
+    assert writer.inserted == {"incidents": 10, "problems": 1}
@@ -0,0 +1,26 @@
+"""
+Tests for the shared calendar feature table
+"""
+import datetime
+from calendar_features import CalendarTable, POS_HOLIDAYS
+
+def test_calendar_features_match_date_helpers():
+    """Precomputed features agree with the date arithmetic they replace"""
+    calendar = CalendarTable(POS_HOLIDAYS, seasonality=lambda day: 2.0 if day.month == 12 else 1.0)
+    day = datetime.date(2024, 1, 1)
+    while day <= datetime.date(2025, 12, 31):
+        features = calendar.features(day)
+        assert features.weekday == day.weekday()
+        assert features.weekend == (day.weekday() >= 5)
+        assert features.holiday == (day in POS_HOLIDAYS)
+        assert features.seasonal_multiplier == (2.0 if day.month == 12 else 1.0)
+        day += datetime.timedelta(days=1)
+    assert calendar.get_weekly_pattern(datetime.date(2024, 12, 27)) == "Normal"  # Friday
+
+def test_calendar_extends_to_new_years():
+    """Lookups outside the initial range extend the table instead of failing"""
+    calendar = CalendarTable(POS_HOLIDAYS)
+    assert calendar.is_weekend(datetime.date(2030, 6, 1))
+    assert calendar.start_year == 2024 and calendar.end_year == 2030
+    day_slice = calendar.day_slice(datetime.date(2023, 12, 31), datetime.date(2024, 1, 1))
+    assert list(calendar.holiday[day_slice]) == [False, True]
@@ -0,0 +1,37 @@
+"""
+Tests for the batched seasonal cost forecasts
+"""
+import datetime
+import numpy as np
+from cost_forecast import aggregate_series, forecast_documents, hour_grid
+
+START = datetime.datetime(2024, 11, 4)
+
+def generator_like(hours, base, start=START):
+    """Hourly cost with the generators' peak-hour and weekend factors"""
+    grid = hour_grid(start, hours)
+    hour = grid.astype("datetime64[h]").astype(np.int64) % 24
+    weekday = (grid.astype("datetime64[D]").astype(np.int64) + 3) % 7
+    cost = np.full(hours, base)
+    cost[(hour >= 10) & (hour < 20)] *= 1.5
+    cost[weekday >= 5] *= 1.2
+    return cost
+
+def test_all_series_are_fitted_in_one_pass():
+    """Peak hours and weekends carry into the forecast; gaps and short series are handled"""
+    matrix = np.stack([generator_like(28 * 24, 0.01), generator_like(28 * 24, 0.02), np.full(28 * 24, np.nan)])
+    matrix[0, 100:130] = np.nan
+    matrix[2, :48] = 0.05
+    docs = forecast_documents("resource", ["a", "b", "c"], matrix, START, 7, START, app_of={"a": "pos"})
+    assert [doc["_id"] for doc in docs] == ["resource:a", "resource:b"]
+    expected = generator_like(7 * 24, 0.01, START + datetime.timedelta(days=28)).reshape(7, 24).sum(axis=1)
+    forecast = np.array([day["cost"] for day in docs[0]["daily"]])
+    assert np.allclose(forecast, expected, rtol=1e-3)
+    assert docs[0]["daily"][5]["date"] == datetime.datetime(2024, 12, 7) and forecast[5] > forecast[4]
+    assert docs[0]["app_id"] == "pos" and docs[0]["rmse"] < 1e-9
+
+def test_apps_sum_their_resources():
+    matrix = np.array([[1.0, np.nan], [2.0, np.nan], [4.0, 5.0]])
+    apps, app_matrix = aggregate_series(["a", "b", "c"], matrix, {"a": "pos", "b": "pos", "c": "shop"})
+    assert apps == ["pos", "shop"]
+    assert np.array_equal(app_matrix, np.array([[3.0, np.nan], [4.0, 5.0]]), equal_nan=True)
@@ -0,0 +1,46 @@
+"""
+Tests for the offline Parquet export and its BSON-encoded load batches
+"""
+import datetime
+import bson
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from dataset_export import ParquetDatasetWriter, iter_dataset_files, iter_encoded_batches
+from parallel_loader import plan_shards
+
+def test_shard_export_round_trips_to_bson(tmp_path):
+    """Hourly shards land in year/month partitions and decode back to the generated documents"""
+    writer = ParquetDatasetWriter(str(tmp_path))
+    writer.write_shard(plan_shards("pos", {"Austin": "austin-pos-terminal-100"}, [2024], seed=5)[1])
+    files = list(iter_dataset_files(str(tmp_path), ["cost_data"]))
+    assert [path.split("cost_data")[1] for _, path in files] == ["/year=2024/month=02/pos-austin.parquet"]
+    docs = [bson.decode(raw.raw) for batch in iter_encoded_batches(files[0][1], batch_size=100) for raw in batch]
+    assert len(docs) == writer.inserted["cost_data"] == 29 * 24
+    assert docs[0]["timestamp"] == datetime.datetime(2024, 2, 1)
+    assert set(docs[0]) == {"resource_id", "timestamp", "cost"}
+
+def test_buffered_documents_drop_nulls_on_load(tmp_path):
+    """Absent nested fields come back absent rather than null"""
+    with ParquetDatasetWriter(str(tmp_path), batch_size=2) as writer:
+        writer.add("incidents", {"incident_id": "a", "state_history": [{"state": "New"}]})
+        writer.add("incidents", {"incident_id": "b", "state_history": [{"state": "On Hold", "reason": "x"}]})
+        writer.add("incidents", {"incident_id": "c", "resolution_time": None, "state_history": []})
+    files = [path for _, path in iter_dataset_files(str(tmp_path), ["incidents"])]
+    assert len(files) == 2
+    docs = [bson.decode(raw.raw) for path in files for batch in iter_encoded_batches(path) for raw in batch]
+    assert docs[0] == {"incident_id": "a", "state_history": [{"state": "New"}]}
+    assert docs[2] == {"incident_id": "c", "state_history": []}
+
+def test_heterogeneous_documents_keep_every_field(tmp_path):
+    """Fields missing from the first buffered document are still exported and loaded"""
+    with ParquetDatasetWriter(str(tmp_path)) as writer:
+        writer.add("incidents", {"incident_id": "pos-1", "location": "Austin"})
+        writer.add("incidents", {"incident_id": "ecom-1", "anomaly_type": "latency",
+                                 "metrics": {"p99_ms": 900.0}, "state_history": [{"state": "New"}]})
+    path = next(path for _, path in iter_dataset_files(str(tmp_path), ["incidents"]))
+    docs = [bson.decode(raw.raw) for batch in iter_encoded_batches(path) for raw in batch]
+    assert docs == [{"incident_id": "pos-1", "location": "Austin"},
+                    {"incident_id": "ecom-1", "anomaly_type": "latency", "metrics": {"p99_ms": 900.0},
+                     "state_history": [{"state": "New"}]}]
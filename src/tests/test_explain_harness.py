@@ -0,0 +1,39 @@
+"""
+Tests for the explain-plan regression harness
+"""
+from explain_harness import compare_to_baseline, summarize_explain
+
+FIND_COLLSCAN = {
+    "command": {"find": "problems", "sort": {"priority": 1}},
+    "queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}, "rejectedPlans": []},
+    "executionStats": {"nReturned": 3, "executionTimeMillis": 4, "totalKeysExamined": 0, "totalDocsExamined": 500,
+                       "executionStages": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}},
+}
+AGGREGATE_IXSCAN = {
+    "stages": [
+        {"$cursor": {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}},
+                                      "rejectedPlans": [{"stage": "COLLSCAN"}]},
+                     "executionStats": {"nReturned": 40, "executionTimeMillis": 2,
+                                        "totalKeysExamined": 40, "totalDocsExamined": 40}},
+         "nReturned": 40, "executionTimeMillisEstimate": 2},
+        {"$group": {}, "nReturned": 5, "executionTimeMillisEstimate": 3},
+    ],
+}
+
+def test_summarize_find_and_aggregate_plans():
+    """COLLSCAN/SORT come from the winning plan only; returned is the last stage's output"""
+    find = summarize_explain(FIND_COLLSCAN)
+    assert (find["docs_examined"], find["returned"], find["collscan"], find["blocking_sort"]) == (500, 3, True, True)
+    aggregate = summarize_explain(AGGREGATE_IXSCAN)
+    assert (aggregate["docs_examined"], aggregate["keys_examined"], aggregate["returned"]) == (40, 40, 5)
+    assert not aggregate["collscan"] and not aggregate["blocking_sort"]
+    assert aggregate["execution_ms"] == 3
+
+def test_regressions_against_baseline():
+    """Losing the index is reported; small noise and queries new to the report are not"""
+    baseline = {"queries": {"q": summarize_explain(AGGREGATE_IXSCAN), "search": {"error": "not on Atlas"}}}
+    noisy = dict(summarize_explain(AGGREGATE_IXSCAN), docs_examined=60, execution_ms=20)
+    assert compare_to_baseline({"queries": {"q": noisy, "search": {"error": "not on Atlas"}, "new": {}}}, baseline) == []
+    regressed = compare_to_baseline({"queries": {"q": summarize_explain(FIND_COLLSCAN)}}, baseline)
+    assert len(regressed) == 3
+    assert regressed[0] == "q: now uses a COLLSCAN"
@@ -16,3 +16,53 @@ async def test_agent_basic_query():
     context = FinOpsContext()
     # Add more specific tests based on your requirements
     pass
+
+class FakeAsyncCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.sorts = []
+
+    def sort(self, key, direction):
+        self.sorts.append((key, direction))
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs
+
+class FakeAsyncCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.filters = []
+
+    def find(self, filter_query=None):
+        self.filters.append(filter_query)
+        return FakeAsyncCursor(self.docs)
+
+class FakeDeps:
+    def __init__(self, collections):
+        self.collections = collections
+
+    def get_async_collection(self, name):
+        return self.collections[name]
+
+def test_async_tools_run_concurrently_with_the_recorded_queries():
+    """Tools run concurrently on async collections and issue the queries index_advisor records"""
+    import asyncio
+    from types import SimpleNamespace
+    from finops_agent import calculate_potential_savings, get_applications
+    from index_advisor import record_tool_calls
+
+    waste = FakeAsyncCollection([{"_id": "r1", "app_id": "a1", "app_name": "App", "business_unit": "Retail",
+                                  "resource_type": "vm", "environment": "prod", "waste_percentage": 60.0,
+                                  "average_utilization": 20.0, "monthly_cost": 100.0, "estimated_waste_cost": 60.0}])
+    apps = FakeAsyncCollection([])
+    ctx = SimpleNamespace(deps=FakeDeps({"cloud_waste": waste, "applications": apps}))
+
+    async def run_both():
+        return await asyncio.gather(calculate_potential_savings(ctx, business_unit="Retail"), get_applications(ctx))
+
+    savings, applications = asyncio.run(run_both())
+    assert savings["potential_annual_savings"] == 720.0
+    assert applications == []
+    recorded = record_tool_calls([(calculate_potential_savings, {"business_unit": "Retail"})]).queries
+    assert waste.filters == [recorded[0]["filter"]]
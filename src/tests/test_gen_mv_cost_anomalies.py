@@ -0,0 +1,22 @@
+"""
+Tests for the cost anomaly pipelines
+"""
+import datetime
+from gen_mv_cost_anomalies import cost_anomaly_pipeline, cost_spike_pipeline
+
+UTC = datetime.timezone.utc
+
+def test_daily_average_counts_calendar_days():
+    """Days are counted as dates, not day-of-month numbers that repeat every month"""
+    group = next(stage["$group"] for stage in cost_anomaly_pipeline() if "$group" in stage)
+    assert group["days_count"] == {"$addToSet": {"$dateTrunc": {"date": "$timestamp", "unit": "day"}}}
+
+def test_spikes_use_a_trailing_window_per_resource():
+    start = datetime.datetime(2024, 12, 1, tzinfo=UTC)
+    pipeline = cost_spike_pipeline(schema_mode="meta", start=start, window_hours=48, threshold=2.5)
+    assert pipeline[0]["$match"]["timestamp"] == {"$gte": datetime.datetime(2024, 11, 29, tzinfo=UTC)}
+    window = pipeline[1]["$setWindowFields"]
+    assert window["partitionBy"] == "$meta.resource_id"
+    assert window["output"]["rolling_std"]["window"] == {"range": [-48, -1], "unit": "hour"}
+    assert {"$match": {"z_score": {"$gte": 2.5}}} in pipeline
+    assert not any("$lookup" in stage for stage in pipeline)
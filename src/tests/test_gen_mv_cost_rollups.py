@@ -0,0 +1,51 @@
+"""
+Tests for the incremental cost rollups
+"""
+import datetime
+from bson import ObjectId
+from gen_mv_cost_rollups import (changed_periods_match, changed_ranges, next_period, period_start,
+                                 resource_rollup_pipeline, watermark_upper_bound)
+
+def test_periods_match_date_trunc():
+    """Weeks start on Monday and months roll over the year end"""
+    ts = datetime.datetime(2024, 12, 31, 17)
+    assert period_start(ts, "day") == datetime.datetime(2024, 12, 31)
+    assert period_start(ts, "week") == datetime.datetime(2024, 12, 30)
+    assert period_start(ts, "month") == datetime.datetime(2024, 12, 1)
+    assert next_period(period_start(ts, "month"), "month") == datetime.datetime(2025, 1, 1)
+
+def test_changed_periods_are_recomputed_whole():
+    """New points mid-month select the full months they touch, grouped by range"""
+    ranges = {
+        "a": (datetime.datetime(2025, 1, 10, 3), datetime.datetime(2025, 1, 10, 5)),
+        "b": (datetime.datetime(2025, 1, 12), datetime.datetime(2025, 2, 2)),
+        "c": (datetime.datetime(2025, 1, 20), datetime.datetime(2025, 1, 21)),
+    }
+    match = changed_periods_match(ranges, "month", "meta")
+    assert match["$or"] == [
+        {"meta.resource_id": {"$in": ["a", "c"]},
+         "timestamp": {"$gte": datetime.datetime(2025, 1, 1), "$lt": datetime.datetime(2025, 2, 1)}},
+        {"meta.resource_id": {"$in": ["b"]},
+         "timestamp": {"$gte": datetime.datetime(2025, 1, 1), "$lt": datetime.datetime(2025, 3, 1)}},
+    ]
+    lookups = [stage for stage in resource_rollup_pipeline("week", match, "meta") if "$lookup" in stage]
+    assert lookups == []
+
+class RecordingCollection:
+    def __init__(self):
+        self.pipelines = []
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        self.pipelines.append(pipeline)
+        return iter([{"_id": "r1", "first": datetime.datetime(2025, 1, 1), "last": datetime.datetime(2025, 1, 2)}])
+
+def test_changed_ranges_stop_at_the_run_upper_bound():
+    """The _id range is bounded above by a bound lagging the clock, not by the largest _id seen"""
+    now = datetime.datetime(2025, 1, 2, 12, tzinfo=datetime.timezone.utc)
+    upper = watermark_upper_bound(now, grace=datetime.timedelta(minutes=1))
+    assert upper.generation_time == now - datetime.timedelta(minutes=1)
+    watermark = ObjectId.from_datetime(now - datetime.timedelta(hours=1))
+    cost_data = RecordingCollection()
+    ranges = changed_ranges({"cost_data": cost_data}, watermark, upper, "flat")
+    assert ranges == {"r1": (datetime.datetime(2025, 1, 1), datetime.datetime(2025, 1, 2))}
+    assert cost_data.pipelines[0][0] == {"$match": {"_id": {"$gt": watermark, "$lte": upper}}}
@@ -0,0 +1,43 @@
+"""
+Tests for the query-shape index advisor
+"""
+from index_advisor import advise_indexes, record_tool_shapes, view_shapes
+
+def waste_tool(ctx, app_id=None, min_waste_percentage=0.0):
+    """Same query shape as finops_agent.analyze_waste"""
+    filter_query = {}
+    if app_id:
+        filter_query["app_id"] = app_id
+    if min_waste_percentage > 0:
+        filter_query["waste_percentage"] = {"$gte": min_waste_percentage}
+    return list(ctx.deps.get_collection("cloud_waste").find(filter_query).sort("waste_percentage", -1))
+
+async def async_waste_tool(ctx, app_id=None, min_waste_percentage=0.0):
+    """Same query on the async API, like the agent's tools"""
+    filter_query = {"app_id": app_id} if app_id else {}
+    if min_waste_percentage > 0:
+        filter_query["waste_percentage"] = {"$gte": min_waste_percentage}
+    return await ctx.deps.get_async_collection("cloud_waste").find(filter_query).sort("waste_percentage", -1).to_list()
+
+def test_async_tools_record_the_same_shapes():
+    """Coroutine tools are awaited and record their query on to_list()"""
+    calls = [{}, {"app_id": "a", "min_waste_percentage": 10.0}]
+    assert (record_tool_shapes([(async_waste_tool, kwargs) for kwargs in calls])
+            == [shape._replace(source="async_waste_tool")
+                for shape in record_tool_shapes([(waste_tool, kwargs) for kwargs in calls])])
+
+def test_tool_shapes_follow_equality_sort_range():
+    """Equality fields lead, the sort follows, and prefixes of longer indexes are dropped"""
+    shapes = record_tool_shapes([(waste_tool, {}), (waste_tool, {"app_id": "a", "min_waste_percentage": 10.0}),
+                                 (waste_tool, {"min_waste_percentage": 10.0})])
+    assert [shape.range for shape in shapes] == [[], ["waste_percentage"], ["waste_percentage"]]
+    advised = advise_indexes(shapes)
+    assert [proposal["keys"] for proposal in advised["cloud_waste"]] == [
+        [("app_id", 1), ("waste_percentage", -1)], [("waste_percentage", -1)]]
+
+def test_view_lookup_uses_resource_and_timestamp():
+    """The waste view's correlated cost_data lookup gets a (resource id, timestamp) index"""
+    flat = advise_indexes(view_shapes("flat"))
+    meta = advise_indexes(view_shapes("meta"))
+    assert [("resource_id", 1), ("timestamp", 1)] in [proposal["keys"] for proposal in flat["cost_data"]]
+    assert [("meta.resource_id", 1), ("timestamp", 1)] in [proposal["keys"] for proposal in meta["cost_data"]]
@@ -0,0 +1,28 @@
+"""
+Tests for the accelerated-clock live feed
+"""
+import datetime
+from live_feed_simulator import LiveFeed
+
+def test_live_feed_emits_one_point_per_resource_and_hour():
+    """Each tick yields one document per resource for the current simulated hour, across midnight"""
+    resources = [("austin-pos-terminal-100", "pos", "Austin"), ("plano-ecommerce-site", "ecommerce", "Plano")]
+    feed = LiveFeed(resources, datetime.datetime(2024, 12, 31, 22, 30), seed=1)
+    hours = [feed.next_hour() for _ in range(3)]
+    assert [timestamp.hour for timestamp, _ in hours] == [22, 23, 0]
+    timestamp, batches = hours[2]
+    assert timestamp == datetime.datetime(2025, 1, 1)
+    assert [doc["resource_id"] for doc in batches["cost_data"]] == ["austin-pos-terminal-100", "plano-ecommerce-site"]
+    assert set(batches["resource_utilization"][0]) == {"resource_id", "timestamp", "cpu_utilization", "memory_utilization"}
+
+def test_speed_must_be_positive():
+    """--speed 0 or below is rejected before connecting instead of dividing by zero or sleeping negatively"""
+    import argparse
+    import pytest
+    from live_feed_simulator import positive_float, run_live_feed
+    assert positive_float("0.5") == 0.5
+    for speed in ("0", "-2"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            positive_float(speed)
+    with pytest.raises(ValueError):
+        run_live_feed(speed=0, mongo_uri="mongodb://localhost:1/?serverSelectionTimeoutMS=1")
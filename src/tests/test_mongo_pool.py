@@ -0,0 +1,40 @@
+"""
+Tests for the shared agent MongoClient pool
+"""
+import asyncio
+
+import mongo_pool
+
+URI = "mongodb://localhost:27017/?connect=false"
+
+def test_client_is_shared_until_closed():
+    try:
+        client = mongo_pool.get_client(URI, maxPoolSize=7)
+        assert mongo_pool.get_client(URI) is client
+        assert client.options.pool_options.max_pool_size == 7
+        assert mongo_pool.pool_stats()["clients"] == 1
+    finally:
+        mongo_pool.close_clients()
+    assert mongo_pool.pool_stats()["clients"] == 0
+    assert mongo_pool.get_client(URI) is not client
+    mongo_pool.close_clients()
+
+def test_metrics_track_checkouts():
+    metrics = mongo_pool.PoolMetrics()
+    for _ in range(3):
+        metrics.connection_checked_out(None)
+    metrics.connection_checked_in(None)
+    metrics.connection_check_out_failed(None)
+    stats = metrics.snapshot()
+    assert (stats["checkouts"], stats["checkins"], stats["checkout_failures"]) == (3, 1, 1)
+    assert (stats["in_use"], stats["peak_in_use"]) == (2, 3)
+
+def test_async_client_is_shared_per_event_loop():
+    async def shared():
+        client = mongo_pool.get_async_client(URI)
+        assert mongo_pool.get_async_client(URI) is client
+        assert mongo_pool.pool_stats()["async_clients"] == 1
+        await mongo_pool.close_async_clients()
+        assert mongo_pool.pool_stats()["async_clients"] == 0
+        return client
+    assert asyncio.run(shared()) is not asyncio.run(shared())
@@ -0,0 +1,103 @@
+"""
+Tests for the materialized view framework
+"""
+import datetime
+from mv_registry import ViewDefinition, Window, pipeline_view, plan_refresh, refresh_views, resolve_window
+
+UTC = datetime.timezone.utc
+
+class FakeCollection:
+    def __init__(self, latest=None, indexes=None):
+        self.latest = latest
+        self.inserted = []
+        self.indexes = dict(indexes or {}, _id_={"v": 2, "key": [("_id", 1)]})
+
+    def find_one(self, query=None, projection=None, sort=None):
+        return {"timestamp": self.latest} if self.latest else None
+
+    def estimated_document_count(self):
+        return 7
+
+    def insert_one(self, doc):
+        self.inserted.append(doc)
+
+    def index_information(self):
+        return dict(self.indexes)
+
+    def create_indexes(self, models):
+        for model in models:
+            document = dict(model.document)
+            name, key = document.pop("name"), document.pop("key")
+            self.indexes[name] = dict(document, key=list(key.items()), v=2)
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+    def list_collections(self, filter=None):
+        return iter(())
+
+    def list_collection_names(self, filter=None):
+        return [name for name in self if name == filter["name"]]
+
+class StagingDatabase(FakeDatabase):
+    """Just enough of a database for a pipeline_view refresh: $merge output, drop and rename"""
+    def __missing__(self, name):
+        collection = self[name] = FakeCollection()
+        collection.drop = lambda: self.pop(name, None)
+        collection.aggregate = lambda pipeline, allowDiskUse=False: (
+            self[pipeline[-1]["$merge"]["into"]].inserted.append({"_id": "r1"}))
+
+        def rename(new_name, dropTarget=False):
+            self[new_name] = self.pop(name)
+        collection.rename = rename
+        return collection
+
+    def list_collections(self, filter=None):
+        return iter(())
+
+def test_windows_roll_with_the_latest_data():
+    db = FakeDatabase(cost_data=FakeCollection(datetime.datetime(2024, 12, 31, 23)))
+    assert resolve_window(db, Window("month")) == (datetime.datetime(2024, 12, 1, tzinfo=UTC),
+                                                   datetime.datetime(2025, 1, 1, tzinfo=UTC))
+    assert resolve_window(db, Window("month", offset=1)).start == datetime.datetime(2024, 11, 1, tzinfo=UTC)
+    weeks = resolve_window(db, Window("week", length=2, anchor="now"), now=datetime.datetime(2025, 3, 5, 8))
+    assert weeks == (datetime.datetime(2025, 2, 24, tzinfo=UTC), datetime.datetime(2025, 3, 10, tzinfo=UTC))
+    assert resolve_window(FakeDatabase(), Window("day")) is None
+
+def test_refresh_follows_dependencies_and_logs_runs():
+    """Dependencies run first, a failed view skips its dependents, every run is logged"""
+    ran = []
+
+    def run(db, name, windows, schema_mode):
+        if name == "broken":
+            raise RuntimeError("boom")
+        ran.append(name)
+
+    registry = {
+        "base": ViewDefinition("base", run),
+        "top": ViewDefinition("top", run, depends_on=("base",)),
+        "broken": ViewDefinition("broken", run),
+        "after_broken": ViewDefinition("after_broken", run, depends_on=("broken",)),
+    }
+    assert plan_refresh(["top"], registry) == ["base", "top"]
+    db = FakeDatabase()
+    records = {record["view"]: record for record in refresh_views(db=db, registry=registry, max_workers=2)}
+    assert ran.index("base") < ran.index("top")
+    assert records["broken"]["status"] == "failed"
+    assert records["after_broken"]["status"] == "skipped"
+    assert [doc["view"] for doc in db["mv_refresh_log"].inserted].count("top") == 1
+    assert records["top"]["rows"] == 7
+
+def test_pipeline_view_refresh_keeps_the_view_indexes():
+    """The staging collection gets the view's indexes before it replaces the view"""
+    advisor_index = {"v": 2, "key": [("waste_percentage", -1), ("business_unit", 1)]}
+    db = StagingDatabase()
+    db["cloud_waste"].indexes["waste_percentage_-1_business_unit_1"] = advisor_index
+    view = pipeline_view("cloud_waste", "mv_cloud_waste",
+                         lambda output, windows, schema_mode: [{"$merge": {"into": output}}])
+    view.run(db, "cloud_waste", {}, "flat")
+    assert db["cloud_waste"].inserted == [{"_id": "r1"}]
+    assert db["cloud_waste"].index_information()["waste_percentage_-1_business_unit_1"] == advisor_index
+    assert "cloud_waste__staging" not in db
@@ -0,0 +1,18 @@
+"""
+Tests for the sharded parallel loader
+"""
+from parallel_loader import plan_shards, generate_shard_batches
+
+def test_plan_shards_by_location_and_month():
+    """One shard per location and month"""
+    shards = plan_shards("pos", {"Austin": "austin-pos-terminal-100", "Plano": ["p1", "p2"]}, [2024], seed=7)
+    assert len(shards) == 24
+    assert shards[12]["resource_ids"] == ["p1", "p2"]
+
+def test_shard_output_is_deterministic():
+    """A shard produces the same documents regardless of when or where it runs"""
+    shard = plan_shards("ecommerce", {"Austin": "austin-ecommerce-site"}, [2024], seed=3)[1]
+    first = list(generate_shard_batches(shard))
+    second = list(generate_shard_batches(shard))
+    assert first == second
+    assert sum(len(docs) for name, docs in first if name == "cost_data") == 29 * 24
@@ -0,0 +1,42 @@
+"""
+Tests for the scale-factor dataset generator
+"""
+import random
+from demo_constants import LOCATIONS
+from scale_dataset import PROVIDERS, generate_scaled_applications, generate_scaled_resources, scale_config
+
+def test_resources_per_location_and_profiles():
+    """Every location gets its resources, ids are unique and each lands under its app's profile"""
+    random.seed(1)
+    config = scale_config(scale_factor=2)
+    apps = generate_scaled_applications(config["applications"])
+    assert [profile for profile, _ in apps] == ["pos", "ecommerce", "pos", "ecommerce"]
+    resources, resource_ids = generate_scaled_resources(apps, config["resources_per_location"])
+    assert len(resources) == len(LOCATIONS) * 4
+    assert len({resource["resource_id"] for resource in resources}) == len(resources)
+    profile_of = {app["app_id"]: profile for profile, app in apps}
+    for number, location in enumerate(LOCATIONS):
+        # Generated location by location; the id starts with the location
+        in_location = resources[number * 4:(number + 1) * 4]
+        assert all(resource["resource_id"].startswith(location.lower().replace(" ", "_")) for resource in in_location)
+        for profile in ("pos", "ecommerce"):
+            assert resource_ids[profile][location] == [resource["resource_id"] for resource in in_location
+                                                       if profile_of[resource["app_id"]] == profile]
+
+def test_few_resources_per_location_still_cover_every_app():
+    """With fewer resources per location than apps, the apps rotate across locations"""
+    random.seed(2)
+    apps = generate_scaled_applications(6)
+    resources, _ = generate_scaled_resources(apps, 2)
+    assert len(resources) == len(LOCATIONS) * 2
+    assert {resource["app_id"] for resource in resources} == {app["app_id"] for _, app in apps}
+
+def test_every_app_spans_every_provider():
+    """Providers rotate independently of the apps, also at SF=1 and with an app count divisible by three"""
+    for scale_factor, applications in ((1, None), (1, 3), (2, 6)):
+        random.seed(3)
+        config = scale_config(scale_factor=scale_factor, applications=applications)
+        apps = generate_scaled_applications(config["applications"])
+        resources, _ = generate_scaled_resources(apps, config["resources_per_location"])
+        for _, app in apps:
+            assert {resource["provider"] for resource in resources if resource["app_id"] == app["app_id"]} == set(PROVIDERS)
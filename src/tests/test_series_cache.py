@@ -0,0 +1,67 @@
+"""
+Tests for the local series cache
+"""
+import datetime
+from series_cache import SeriesCache
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query=None, projection=None, batch_size=None):
+        bounds = (query or {}).get("timestamp", {})
+        self.queries.append(bounds)
+        since, until = bounds.get("$gte"), bounds.get("$lt")
+        return iter([doc for doc in self.docs if (since is None or doc.get("timestamp", since) >= since)
+                     and (until is None or doc.get("timestamp", since) < until)])
+
+    def find_one(self, query, projection=None, sort=None):
+        docs = sorted(self.find(query), key=lambda doc: doc["timestamp"], reverse=sort[0][1] < 0)
+        return docs[0] if docs else None
+
+def hourly(resource_id, start, hours, **fields):
+    return [{"resource_id": resource_id, "timestamp": start + datetime.timedelta(hours=h),
+             **{name: value(h) if callable(value) else value for name, value in fields.items()}}
+            for h in range(hours)]
+
+def fake_db():
+    nov, dec = datetime.datetime(2024, 11, 1), datetime.datetime(2024, 12, 1)
+    return {
+        "cloud_resources": FakeCollection([
+            {"resource_id": "a", "app_id": "pos", "environment": "prod", "provider": "aws"},
+            {"resource_id": "b", "app_id": "shop", "environment": "dev", "provider": "gcp"},
+        ]),
+        "applications": FakeCollection([{"app_id": "pos", "business_unit": "Retail"}]),
+        "cost_data": FakeCollection(hourly("a", nov, 48, cost=1.0) + hourly("a", dec, 48, cost=2.0)
+                                    + hourly("b", dec, 24, cost=3.0)),
+        "resource_utilization": FakeCollection(hourly("a", dec, 48, cpu_utilization=0.2, memory_utilization=0.4)),
+    }
+
+def test_cache_computes_views_from_memory_mapped_months(tmp_path):
+    cache = SeriesCache(str(tmp_path))
+    db = fake_db()
+    assert cache.refresh(db, schema_mode="flat") == {"cost_data": 120, "resource_utilization": 48}
+    assert cache.months() == ["2024-11", "2024-12"]
+    # Read one month range at a time
+    assert [bounds for bounds in db["cost_data"].queries if "$lt" in bounds] == [
+        {"$gte": datetime.datetime(2024, 11, 1), "$lt": datetime.datetime(2024, 12, 1)},
+        {"$gte": datetime.datetime(2024, 12, 1), "$lt": datetime.datetime(2025, 1, 1)}]
+    assert cache.resources(environment="prod") == ["a"]
+    [waste] = cache.waste("2024-12", app_id="pos")
+    assert waste["resource_id"] == "a" and round(waste["waste_percentage"], 6) == 70.0 and waste["monthly_cost"] == 96
+    [anomaly] = cache.anomalies("2024-12")
+    assert anomaly["resource_id"] == "a" and anomaly["percentage_increase"] == 100.0
+    trend = cache.cost_trend(datetime.datetime(2024, 12, 1), datetime.datetime(2025, 1, 1))
+    assert trend["shop"] == {datetime.datetime(2024, 12, 1): 72.0}
+
+def test_refresh_is_incremental_and_adds_new_resources(tmp_path):
+    cache = SeriesCache(str(tmp_path))
+    db = fake_db()
+    cache.refresh(db, schema_mode="flat")
+    db["cost_data"].docs += hourly("c", datetime.datetime(2024, 12, 3), 2, cost=5.0)
+    counts = SeriesCache(str(tmp_path)).refresh(db, schema_mode="flat")
+    # Only the latest cached hour is read again, plus the new points
+    assert counts["cost_data"] == 3
+    ids, cost = SeriesCache(str(tmp_path)).series("cost", "2024-12", ["a", "c"])
+    assert ids == ["a", "c"] and cost[0, 47] == 2.0 and list(cost[1, 48:50]) == [5.0, 5.0]
@@ -0,0 +1,42 @@
+"""
+Tests for the flat/meta time-series schema modes
+"""
+import datetime
+import numpy as np
+import pytest
+from timeseries_schema import build_metas, storage_options, timeseries_options
+from vectorized_hourly import HourGrid, iter_hourly_documents
+from gen_mv_cost_anomalies import cost_anomaly_pipeline
+from gen_mv_cloud_waste import cloud_waste_pipeline
+
+def test_meta_documents_carry_resource_and_app_details():
+    """In meta mode each hourly point embeds the metaField subdocument instead of resource_id"""
+    resources = [{"resource_id": "austin-ecommerce-site", "app_id": "ecommerceplatform-app-01",
+                  "environment": "prod", "provider": "aws", "resource_type": "E-commerce Website"}]
+    apps = [{"app_id": "ecommerceplatform-app-01", "name": "ECommercePlatform", "business_unit": "Online Sales"}]
+    metas = build_metas(resources, apps)
+    grid = HourGrid(datetime.date(2024, 1, 1), datetime.date(2024, 1, 1))
+    docs = next(iter_hourly_documents(["austin-ecommerce-site"], grid, {"cost": np.zeros((1, 24))},
+                                      metas=[metas["austin-ecommerce-site"]]))
+    assert set(docs[0]) == {"meta", "timestamp", "cost"}
+    assert docs[0]["meta"]["business_unit"] == "Online Sales"
+    assert timeseries_options("meta")["metaField"] == "meta"
+
+def test_meta_views_need_no_lookups():
+    """The views only join cloud_resources/applications with the flat schema"""
+    def lookups(pipeline):
+        return [stage["$lookup"]["from"] for stage in pipeline if "$lookup" in stage]
+    assert lookups(cost_anomaly_pipeline(schema_mode="flat")) == ["cloud_resources", "applications", "cloud_resources"]
+    assert lookups(cost_anomaly_pipeline(schema_mode="meta")) == []
+    assert lookups(cloud_waste_pipeline(schema_mode="meta")) == ["cost_data"]
+
+def test_bucketing_and_compression_options():
+    """A custom bucket span replaces the granularity; the compressor goes into the WiredTiger config"""
+    options = timeseries_options("flat", bucket_span_seconds=86400)
+    assert "granularity" not in options
+    assert options["bucketMaxSpanSeconds"] == options["bucketRoundingSeconds"] == 86400
+    assert timeseries_options("meta", granularity="minutes")["granularity"] == "minutes"
+    assert storage_options("zstd") == {"storageEngine": {"wiredTiger": {"configString": "block_compressor=zstd"}}}
+    assert storage_options() == {}
+    with pytest.raises(ValueError):
+        timeseries_options("flat", granularity="days")
@@ -0,0 +1,43 @@
+"""
+Tests for the vectorized hourly generation helpers
+"""
+import datetime
+from vectorized_hourly import HourGrid, iter_hourly_documents
+from calendar_features import CalendarTable
+import numpy as np
+
+def test_hour_grid_calendar_masks():
+    """Grid masks match the per-date helpers used by the populators"""
+    holidays = [datetime.date(2024, 12, 25)]
+    grid = HourGrid(datetime.date(2024, 12, 23), datetime.date(2024, 12, 29), CalendarTable(holidays))
+    assert len(grid) == 7 * 24
+    for i, timestamp in enumerate(grid.datetimes()):
+        assert grid.hour[i] == timestamp.hour
+        assert grid.weekday[i] == timestamp.weekday()
+        assert grid.month[i] == timestamp.month
+        assert grid.holiday[i] == (timestamp.date() in holidays)
+
+def test_iter_hourly_documents_batches():
+    """Documents are produced per resource and hour in bounded batches"""
+    grid = HourGrid(datetime.date(2024, 1, 1), datetime.date(2024, 1, 1))
+    costs = np.arange(48, dtype=float).reshape(2, 24)
+    batches = list(iter_hourly_documents(["r1", "r2"], grid, {"cost": costs}, batch_size=10))
+    docs = [doc for batch in batches for doc in batch]
+    assert max(len(batch) for batch in batches) == 10
+    assert len(docs) == 48
+    assert docs[25] == {"resource_id": "r2", "timestamp": datetime.datetime(2024, 1, 1, 1), "cost": 25.0}
+
+def test_iter_hourly_batches_streams_by_month():
+    """Streaming covers every resource/hour once, one month grid at a time"""
+    from vectorized_hourly import iter_month_grids, iter_hourly_batches
+    grids = list(iter_month_grids(datetime.date(2024, 1, 15), datetime.date(2024, 3, 10)))
+    assert [len(grid) // 24 for grid in grids] == [17, 29, 10]
+
+    def generate_arrays(grid, n_resources, rng):
+        return {"cost_data": {"cost": rng.uniform(size=(n_resources, len(grid)))}}
+
+    batches = list(iter_hourly_batches(generate_arrays, ["a", "b", "c"], datetime.date(2024, 1, 1),
+                                       datetime.date(2024, 2, 29), rng=np.random.default_rng(0),
+                                       batch_size=500, resources_per_chunk=2))
+    assert all(name == "cost_data" and len(docs) <= 500 for name, docs in batches)
+    assert sum(len(docs) for _, docs in batches) == 3 * 60 * 24
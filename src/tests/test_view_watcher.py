@@ -0,0 +1,89 @@
+"""
+Tests for the change-driven view watcher
+"""
+import datetime
+
+from bson import ObjectId
+from pymongo import DeleteMany, ReplaceOne
+from view_watcher import ViewWatcher, anomaly_delta_ops, open_change_stream, wait_for_changes
+
+UTC = datetime.timezone.utc
+
+class FakeDatabase:
+    def __init__(self, timeseries=()):
+        self.timeseries = timeseries
+        self.watched = None
+
+    def list_collections(self, filter=None):
+        return iter([{"name": name, "type": "timeseries"} for name in self.timeseries])
+
+    def watch(self, pipeline, max_await_time_ms=None):
+        self.watched = pipeline
+        return "stream"
+
+class FakeStream:
+    def __init__(self, events):
+        self.events = list(events)
+
+    def try_next(self):
+        return self.events.pop(0) if self.events else None
+
+class PointCollection:
+    """Points by _id; aggregate records what the fold selects and answers the watcher's $group"""
+    def __init__(self):
+        self.points = []
+        self.folded = []
+        self.docs = {}
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        id_range = pipeline[0]["$match"]["_id"]
+        points = [point for point in self.points
+                  if ("$gt" not in id_range or point["_id"] > id_range["$gt"]) and point["_id"] <= id_range["$lte"]]
+        if "$merge" in pipeline[-1]:
+            self.folded += [point["_id"] for point in points]
+            return iter(())
+        rows = {}
+        for point in points:
+            row = rows.setdefault(point["resource_id"], {"_id": point["resource_id"], "months": [],
+                                                         "first_id": point["_id"]})
+            row["months"].append(point["timestamp"].replace(day=1, hour=0))
+            row["first_id"] = min(row["first_id"], point["_id"])
+        return iter(rows.values())
+
+    def find_one(self, query, projection=None, sort=None):
+        return self.docs.get(query.get("_id"))
+
+    def replace_one(self, query, doc, upsert=False):
+        self.docs[query["_id"]] = doc
+
+def test_tick_picks_up_points_still_in_flight_at_the_bound():
+    """A point whose _id was generated before a tick but inserted after it is handled by the next tick"""
+    db = {name: PointCollection() for name in ("cost_data", "resource_utilization", "rollup_watermarks",
+                                               "cloud_waste_state")}
+    watcher = ViewWatcher(db, schema_mode="flat", grace_seconds=5)
+    tick_at = datetime.datetime(2025, 1, 2, 12, tzinfo=UTC)
+    in_flight = ObjectId.from_datetime(tick_at - datetime.timedelta(seconds=2))
+    db["cost_data"].points.append({"_id": ObjectId.from_datetime(tick_at - datetime.timedelta(minutes=1)),
+                                   "resource_id": "r1", "timestamp": tick_at})
+    assert watcher.tick(tick_at)["resources"]["cost_data"] == 1
+    db["cost_data"].points.append({"_id": in_flight, "resource_id": "r2", "timestamp": tick_at})
+    stats = watcher.tick(tick_at + datetime.timedelta(seconds=10))
+    assert stats["resources"]["cost_data"] == 1
+    assert db["cost_data"].folded[-1] == in_flight
+    assert stats["lag_seconds"] == 12
+
+def test_time_series_sources_fall_back_to_polling():
+    assert open_change_stream(FakeDatabase(timeseries=["cost_data"])) is None
+    db = FakeDatabase()
+    assert open_change_stream(db) == "stream"
+    assert db.watched[0]["$match"]["ns.coll"] == {"$in": ["cost_data", "resource_utilization"]}
+
+def test_micro_batch_collects_a_burst_of_events():
+    assert wait_for_changes(FakeStream([{"a": 1}, {"a": 2}, {"a": 3}]), timeout=1.0, batch_window=0.05) == 3
+
+def test_anomaly_delta_replaces_and_clears_rows():
+    """Recomputed resources that are no longer anomalous are removed from the view"""
+    rows = [{"_id": "r1", "percentage_increase": 35.0}]
+    ops = anomaly_delta_ops(["r1", "r2"], rows)
+    assert ops == [ReplaceOne({"_id": "r1"}, rows[0], upsert=True), DeleteMany({"_id": {"$in": ["r2"]}})]
+    assert anomaly_delta_ops(["r1"], rows) == ops[:1]
@@ -0,0 +1,156 @@
+"""
+Storage benchmark for the time-series bucketing and compression settings.
+
+For each setting the benchmark recreates the collections in a scratch database
+(<DATABASE_NAME>_tsbench) with create_collections, loads the same generated dataset
+with the parallel loader, and reports:
+
+- on-disk size (storageSize + totalIndexSize) and bucket count of cost_data and
+  resource_utilization
+- hourly insert throughput
+- the runtime of the mv_cloud_waste and mv_cost_anomalies pipelines
+
+Settings combine a granularity or a custom bucketMaxSpanSeconds with a WiredTiger
+block compressor (see timeseries_schema.timeseries_options/storage_options). The
+scratch database is dropped afterwards unless --keep is given.
+"""
+
+import json
+import random
+import time
+
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure
+
+from demo_constants import (YEAR_TO_GENERATE, MONGO_URI, DATABASE_NAME)
+from create_collections import create_collections
+from gen_mv_cloud_waste import cloud_waste_pipeline
+from gen_mv_cost_anomalies import cost_anomaly_pipeline
+from parallel_loader import generate_catalog, plan_shards, store_hourly_data_parallel
+from timeseries_schema import SCHEMA_FLAT, SCHEMA_META, SCHEMA_MODES, HOURLY_COLLECTIONS, build_metas
+
+BENCH_DATABASE = f"{DATABASE_NAME}_tsbench"
+SETTINGS = {
+    "hours-snappy": {"granularity": "hours", "block_compressor": "snappy"},
+    "hours-zlib": {"granularity": "hours", "block_compressor": "zlib"},
+    "hours-zstd": {"granularity": "hours", "block_compressor": "zstd"},
+    "minutes-zstd": {"granularity": "minutes", "block_compressor": "zstd"},
+    "span-1d-zstd": {"bucket_span_seconds": 86400, "block_compressor": "zstd"},
+    "span-7d-zstd": {"bucket_span_seconds": 7 * 86400, "block_compressor": "zstd"},
+}
+
+
+def storage_stats(db, collection_name):
+    """On-disk size and bucket count of one time-series collection."""
+    stats = db.command("collStats", collection_name)
+    return {
+        "storage_bytes": stats.get("storageSize", 0),
+        "index_bytes": stats.get("totalIndexSize", 0),
+        "buckets": stats.get("timeseries", {}).get("bucketCount"),
+    }
+
+
+def timed_aggregate(collection, pipeline):
+    start = time.perf_counter()
+    list(collection.aggregate(pipeline, allowDiskUse=True))
+    return time.perf_counter() - start
+
+
+def run_setting(setting, seed=0, max_workers=None, years=(YEAR_TO_GENERATE,), schema_mode=SCHEMA_FLAT,
+                database_name=BENCH_DATABASE, keep=False):
+    """
+    Load the dataset under one setting and measure it.
+
+    Args:
+        setting: Keyword arguments for create_collections (granularity, bucket_span_seconds, block_compressor)
+
+    Returns:
+        Dict with rows, rows_per_second, per-collection storage stats and view runtimes in seconds
+    """
+    client = MongoClient(MONGO_URI)
+    client.drop_database(database_name)
+    db = client[database_name]
+    create_collections(schema_mode, database_name=database_name, **setting)
+
+    random.seed(seed)
+    applications, resources, resource_ids = generate_catalog()
+    db["applications"].insert_many(applications)
+    db["cloud_resources"].insert_many(resources)
+    metas = build_metas(resources, applications) if schema_mode == SCHEMA_META else None
+    shards = []
+    for profile, ids in resource_ids.items():
+        shards.extend(plan_shards(profile, ids, years, seed, metas=metas))
+
+    start = time.perf_counter()
+    counts = store_hourly_data_parallel(shards, max_workers=max_workers, database_name=database_name)
+    elapsed = time.perf_counter() - start
+    try:
+        # Flush so storageSize reflects the compressed pages
+        client.admin.command("fsync")
+    except OperationFailure:
+        pass
+
+    rows = sum(counts.values())
+    result = {
+        "rows": rows,
+        "rows_per_second": rows / elapsed if elapsed > 0 else 0.0,
+        "storage": {name: storage_stats(db, name) for name in HOURLY_COLLECTIONS},
+        "mv_cloud_waste_seconds": timed_aggregate(db["resource_utilization"],
+                                                  cloud_waste_pipeline(schema_mode=schema_mode)),
+        "mv_cost_anomalies_seconds": timed_aggregate(db["cost_data"], cost_anomaly_pipeline(schema_mode=schema_mode)),
+    }
+    if not keep:
+        client.drop_database(database_name)
+    client.close()
+    return result
+
+
+def run_benchmark(names=None, seed=0, max_workers=None, years=(YEAR_TO_GENERATE,), schema_mode=SCHEMA_FLAT,
+                  keep=False):
+    """Run every selected setting on the same dataset; returns {name: result}."""
+    results = {}
+    for name in names or SETTINGS:
+        print(f"\n=== {name}: {SETTINGS[name]} ===")
+        try:
+            results[name] = run_setting(SETTINGS[name], seed, max_workers, years, schema_mode, keep=keep)
+        except OperationFailure as e:
+            # e.g. bucketMaxSpanSeconds before MongoDB 6.3
+            print(f"Setting {name} not supported by this server: {e}")
+            results[name] = {"error": str(e)}
+    return results
+
+
+def print_results(results):
+    print(f"\n{'setting':16} {'cost_data MB':>13} {'util MB':>9} {'buckets':>9} {'rows/s':>10} "
+          f"{'waste s':>8} {'anomaly s':>9}")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:16} error: {result['error']}")
+            continue
+        storage = result["storage"]
+        sizes = [(s["storage_bytes"] + s["index_bytes"]) / 2**20 for s in storage.values()]
+        buckets = sum(s["buckets"] or 0 for s in storage.values())
+        print(f"{name:16} {sizes[0]:>13.1f} {sizes[1]:>9.1f} {buckets:>9} {result['rows_per_second']:>10,.0f} "
+              f"{result['mv_cloud_waste_seconds']:>8.2f} {result['mv_cost_anomalies_seconds']:>9.2f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare time-series bucketing/compression settings")
+    parser.add_argument("--settings", nargs="+", choices=list(SETTINGS), default=None,
+                        help="Settings to compare (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--years", type=int, nargs="+", default=[YEAR_TO_GENERATE])
+    parser.add_argument("--schema-mode", choices=SCHEMA_MODES, default=SCHEMA_FLAT)
+    parser.add_argument("--keep", action="store_true", help=f"Keep the last setting's data in {BENCH_DATABASE}")
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.settings, seed=args.seed, max_workers=args.workers, years=args.years,
+                            schema_mode=args.schema_mode, keep=args.keep)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
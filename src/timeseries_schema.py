@@ -0,0 +1,103 @@
+"""
+Time-series schema modes for cost_data and resource_utilization.
+
+"flat" (the original layout) uses the bare resource_id string as metaField, so
+every view has to $lookup cloud_resources and applications to group by app or
+business unit. "meta" stores a per-resource subdocument as metaField instead:
+
+    {"meta": {"resource_id", "app_id", "app_name", "business_unit",
+              "environment", "provider", "resource_type"},
+     "timestamp": ..., "cost": ...}
+
+MongoDB buckets measurements by metaField value, so grouping on meta.app_id or
+meta.business_unit becomes a bucket-level operation with no joins. The mode of
+an existing database is read back from the collection options, so loaders and
+views follow whatever create_collections set up.
+"""
+
+SCHEMA_FLAT = "flat"
+SCHEMA_META = "meta"
+SCHEMA_MODES = [SCHEMA_FLAT, SCHEMA_META]
+META_FIELD = "meta"
+HOURLY_COLLECTIONS = ["cost_data", "resource_utilization"]
+GRANULARITIES = ["seconds", "minutes", "hours"]
+DEFAULT_GRANULARITY = "hours"
+BLOCK_COMPRESSORS = ["snappy", "zlib", "zstd", "none"]
+
+META_RESOURCE_FIELDS = ["resource_id", "app_id", "environment", "provider", "resource_type"]
+META_APPLICATION_FIELDS = {"app_name": "name", "business_unit": "business_unit"}
+
+
+def timeseries_options(schema_mode=SCHEMA_FLAT, granularity=DEFAULT_GRANULARITY, bucket_span_seconds=None,
+                       bucket_rounding_seconds=None):
+    """
+    The timeseries= options create_collections uses for the hourly collections.
+
+    Args:
+        schema_mode: "flat" or "meta" metaField layout
+        granularity: "seconds", "minutes" or "hours"; ignored when bucket_span_seconds is set
+        bucket_span_seconds: Custom bucketMaxSpanSeconds (MongoDB 6.3+) instead of a granularity
+        bucket_rounding_seconds: bucketRoundingSeconds (defaults to the span; the server requires them equal)
+    """
+    if schema_mode not in SCHEMA_MODES:
+        raise ValueError(f"Unknown schema mode '{schema_mode}', expected one of {SCHEMA_MODES}")
+    options = {
+        "timeField": "timestamp",
+        "metaField": META_FIELD if schema_mode == SCHEMA_META else "resource_id",
+    }
+    if bucket_span_seconds:
+        options["bucketMaxSpanSeconds"] = bucket_span_seconds
+        options["bucketRoundingSeconds"] = bucket_rounding_seconds or bucket_span_seconds
+    elif granularity in GRANULARITIES:
+        options["granularity"] = granularity
+    else:
+        raise ValueError(f"Unknown granularity '{granularity}', expected one of {GRANULARITIES}")
+    return options
+
+
+def storage_options(block_compressor=None):
+    """create_collection keyword arguments selecting the WiredTiger block compressor."""
+    if block_compressor is None:
+        return {}
+    if block_compressor not in BLOCK_COMPRESSORS:
+        raise ValueError(f"Unknown block compressor '{block_compressor}', expected one of {BLOCK_COMPRESSORS}")
+    return {"storageEngine": {"wiredTiger": {"configString": f"block_compressor={block_compressor}"}}}
+
+
+def detect_schema_mode(db, collection_name="cost_data"):
+    """Schema mode of an existing hourly collection (flat when it does not exist)."""
+    for info in db.list_collections(filter={"name": collection_name}):
+        if info.get("options", {}).get("timeseries", {}).get("metaField") == META_FIELD:
+            return SCHEMA_META
+    return SCHEMA_FLAT
+
+
+def resource_meta(resource, application=None):
+    """Build the metaField subdocument for a cloud_resources document and its application."""
+    meta = {field: resource.get(field) for field in META_RESOURCE_FIELDS}
+    application = application or {}
+    meta.update({field: application.get(source) for field, source in META_APPLICATION_FIELDS.items()})
+    return meta
+
+
+def build_metas(resources, applications):
+    """{resource_id: meta} for lists of resource and application documents."""
+    apps_by_id = {app["app_id"]: app for app in applications}
+    return {resource["resource_id"]: resource_meta(resource, apps_by_id.get(resource["app_id"]))
+            for resource in resources}
+
+
+def load_metas(db, resource_ids=None):
+    """{resource_id: meta} read from cloud_resources and applications."""
+    query = {"resource_id": {"$in": list(resource_ids)}} if resource_ids is not None else {}
+    return build_metas(db["cloud_resources"].find(query), db["applications"].find())
+
+
+def resource_id_path(schema_mode):
+    """Aggregation field path of the resource id in the hourly collections."""
+    return f"{META_FIELD}.resource_id" if schema_mode == SCHEMA_META else "resource_id"
+
+
+def document_resource_id(doc):
+    """Resource id of an hourly document in either schema mode."""
+    return doc[META_FIELD]["resource_id"] if META_FIELD in doc else doc["resource_id"]
@@ -0,0 +1,144 @@
+"""
+Vectorized hourly data generation helpers.
+
+The populators used to build one datetime and one dict per (day, location, hour)
+with random.uniform. This module lays out a whole date range as a flat grid of
+hours so that cost and utilization samples for every resource can be drawn with
+NumPy in a single pass. Documents are only materialized when they are handed to
+insert_many, one bounded batch at a time.
+"""
+
+import datetime
+import numpy as np
+
+from calendar_features import CalendarTable
+from timeseries_schema import META_FIELD
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_RESOURCES_PER_CHUNK = 256
+
+
+class HourGrid:
+    """Every hour between start_date and end_date (inclusive) with calendar masks."""
+
+    def __init__(self, start_date, end_date, calendar=None):
+        calendar = calendar if calendar is not None else CalendarTable()
+        days = np.arange(np.datetime64(start_date, "D"),
+                         np.datetime64(end_date, "D") + 1,
+                         dtype="datetime64[D]")
+        self.days = days
+        self.timestamps = (days[:, None] + np.arange(24).astype("timedelta64[h]")).ravel()
+        self.hour = np.tile(np.arange(24), len(days))
+        # Day-level features come from the shared calendar table and are repeated per hour
+        day_slice = calendar.day_slice(start_date, end_date)
+        self.weekday = np.repeat(calendar.weekday[day_slice], 24)
+        self.month = np.repeat(calendar.month[day_slice], 24)
+        self.holiday = np.repeat(calendar.holiday[day_slice], 24)
+        self.weekly_pattern = np.repeat(calendar.weekly_pattern[day_slice], 24)
+        self.seasonal_multiplier = np.repeat(calendar.seasonal_multiplier[day_slice], 24)
+        self._datetimes = None
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def weekend(self):
+        return self.weekday >= 5
+
+    def peak_hours(self, start_hour, end_hour):
+        return (self.hour >= start_hour) & (self.hour < end_hour)
+
+    def datetimes(self):
+        """Timestamps as datetime.datetime objects, converted once per grid."""
+        if self._datetimes is None:
+            self._datetimes = self.timestamps.astype("datetime64[us]").tolist()
+        return self._datetimes
+
+
+def iter_hourly_documents(resource_ids, grid, fields, batch_size=DEFAULT_BATCH_SIZE, metas=None):
+    """
+    Turn (resources x hours) arrays into insert_many batches.
+
+    Args:
+        resource_ids: Resource identifiers, one per row of the field arrays
+        grid: HourGrid the arrays were generated on
+        fields: Mapping of document field name to an array shaped (len(resource_ids), len(grid))
+        batch_size: Maximum number of documents per yielded batch
+        metas: Optional metaField subdocuments, one per resource, for the "meta" schema mode
+
+    Yields:
+        Lists of {"resource_id", "timestamp", <fields>} documents, or
+        {"meta", "timestamp", <fields>} when metas is given
+    """
+    timestamps = grid.datetimes()
+    names = list(fields)
+    batch = []
+    for row, resource_id in enumerate(resource_ids):
+        columns = [fields[name][row].tolist() for name in names]
+        key, value = (META_FIELD, metas[row]) if metas is not None else ("resource_id", resource_id)
+        for timestamp, *values in zip(timestamps, *columns):
+            doc = {key: value, "timestamp": timestamp}
+            doc.update(zip(names, values))
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def year_grid(year, calendar=None):
+    return HourGrid(datetime.date(year, 1, 1), datetime.date(year, 12, 31), calendar)
+
+
+def iter_month_grids(start_date, end_date, calendar=None):
+    """Split [start_date, end_date] into one HourGrid per calendar month."""
+    month_start = start_date
+    while month_start <= end_date:
+        next_month = (month_start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+        yield HourGrid(month_start, min(end_date, next_month - datetime.timedelta(days=1)), calendar)
+        month_start = next_month
+
+
+def iter_hourly_batches(generate_arrays, resource_ids, start_date, end_date, calendar=None, rng=None,
+                        batch_size=DEFAULT_BATCH_SIZE, resources_per_chunk=DEFAULT_RESOURCES_PER_CHUNK,
+                        anomalies=None, locations=None, metas=None):
+    """
+    Stream (collection_name, documents) batches for a date range.
+
+    Arrays are generated one calendar month and one chunk of resources at a time, so
+    peak memory depends on batch_size/resources_per_chunk, not on the number of years
+    or resources being loaded.
+
+    Args:
+        generate_arrays: Callable (grid, n_resources, rng) -> {collection_name: {field: array}}
+        resource_ids: Resource identifiers to generate series for
+        start_date, end_date: Inclusive date range
+        calendar: CalendarTable providing the day-level masks
+        rng: numpy Generator (a fresh unseeded one if omitted)
+        batch_size: Maximum documents per yielded batch
+        resources_per_chunk: Resources generated together in one array pass
+        anomalies: Optional AnomalyIndex; when given, generate_arrays also receives a
+            load_mask and an idle_mask of shape (n_resources, len(grid)) marking the hours
+            of load and shutdown/outage anomalies (AnomalyIndex.effect_masks)
+        locations: Location of each resource id, required with anomalies
+        metas: Optional {resource_id: metaField subdocument} for the "meta" schema mode
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    resource_ids = list(resource_ids)
+    locations = list(locations) if locations is not None else None
+    for grid in iter_month_grids(start_date, end_date, calendar):
+        location_masks = {}
+        for offset in range(0, len(resource_ids), resources_per_chunk):
+            chunk = resource_ids[offset:offset + resources_per_chunk]
+            kwargs = {}
+            if anomalies is not None:
+                chunk_locations = locations[offset:offset + resources_per_chunk]
+                for location in set(chunk_locations) - location_masks.keys():
+                    location_masks[location] = anomalies.effect_masks(location, grid)
+                kwargs["load_mask"] = np.stack([location_masks[location][0] for location in chunk_locations])
+                kwargs["idle_mask"] = np.stack([location_masks[location][1] for location in chunk_locations])
+            chunk_metas = [metas[resource_id] for resource_id in chunk] if metas is not None else None
+            for collection_name, fields in generate_arrays(grid, len(chunk), rng, **kwargs).items():
+                for docs in iter_hourly_documents(chunk, grid, fields, batch_size, chunk_metas):
+                    yield collection_name, docs
@@ -0,0 +1,290 @@
+"""
+Watcher that keeps mv_cloud_waste and mv_cost_anomalies current while data arrives.
+
+Instead of rebuilding the views by hand, the watcher runs micro-batches: each one
+takes the points inserted into cost_data and resource_utilization since the last
+batch (an _id range, as in gen_mv_cloud_waste.py --incremental) and updates only
+the affected resources:
+
+- mv_cloud_waste: the new points are folded into cloud_waste_state and the view
+  rows of the resources they touched are rebuilt from it. Like --incremental, the
+  view reports every resource of the latest month; when a new month starts the
+  whole view moves to it.
+- mv_cost_anomalies: the anomaly pipeline runs for the touched resources only;
+  their rows are replaced, or deleted when they no longer show an increase. When
+  the latest month changes, the view is rebuilt with mv_registry.
+
+A change stream wakes the watcher up as soon as a write arrives; events are then
+drained for --batch-window seconds to form the micro-batch. Change streams need a
+replica set (a single-node one is enough locally, e.g. mongod --replSet rs0 and
+rs.initiate()) and MongoDB does not report writes to time-series collections in
+change streams, so with the default time-series collections the watcher polls
+every --interval seconds instead. Either way detection lags ingest by seconds.
+
+Writers generate _ids on the client, so a point whose _id was generated just before
+a tick may only be inserted after the tick has read the collections. Each tick
+therefore only takes points with an _id older than --grace-seconds (default 5) and
+leaves younger ones for a later tick; detection lags ingest by at least the grace.
+Raise it when writers batch inserts for longer than that.
+
+The watcher shares its watermarks with gen_mv_cloud_waste.py --incremental; do
+not run both at the same time.
+
+    python src/view_watcher.py --interval 2
+    python src/live_feed_simulator.py --speed 10     # in another terminal
+"""
+
+import datetime
+import time
+
+from pymongo import DeleteMany, MongoClient, ReplaceOne
+from pymongo.errors import OperationFailure
+
+from demo_constants import (MONGO_URI, DATABASE_NAME)
+from gen_mv_cloud_waste import STATE_COLLECTION, fold_new_points, incremental_waste_pipeline
+from gen_mv_cost_anomalies import cost_anomaly_pipeline
+from gen_mv_cost_rollups import watermark_upper_bound
+from mv_registry import VIEWS, resolve_window, run_view
+from timeseries_schema import detect_schema_mode, resource_id_path
+
+WATCHED_COLLECTIONS = ("cost_data", "resource_utilization")
+WASTE_VIEW = "mv_cloud_waste"
+ANOMALY_VIEW = "mv_cost_anomalies"
+DEFAULT_INTERVAL = 2.0
+DEFAULT_BATCH_WINDOW = 0.5
+DEFAULT_GRACE_SECONDS = 5.0
+MAX_AWAIT_MS = 200
+
+
+def open_change_stream(db, collection_names=WATCHED_COLLECTIONS):
+    """
+    Change stream of the inserts into the watched collections.
+
+    Returns:
+        The stream, or None when change streams cannot report these writes
+        (time-series collections, or a server that is not a replica set)
+    """
+    timeseries = [info["name"] for info in db.list_collections(
+        filter={"name": {"$in": list(collection_names)}, "type": "timeseries"})]
+    if timeseries:
+        print(f"Change streams do not report writes to time-series collections ({', '.join(timeseries)}); polling.")
+        return None
+    try:
+        return db.watch([{"$match": {"operationType": "insert", "ns.coll": {"$in": list(collection_names)}}}],
+                        max_await_time_ms=MAX_AWAIT_MS)
+    except OperationFailure as e:
+        print(f"Change streams unavailable ({e.details.get('errmsg', e) if e.details else e}); polling.")
+        return None
+
+
+def wait_for_changes(stream, timeout, batch_window=DEFAULT_BATCH_WINDOW):
+    """
+    Wait up to timeout seconds for a write, then keep reading events for batch_window
+    seconds so that a burst of inserts is handled as one micro-batch. Without a
+    stream this simply sleeps for timeout.
+
+    Returns:
+        Number of change events read
+    """
+    if stream is None:
+        time.sleep(timeout)
+        return 0
+    events = 0
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if stream.try_next() is not None:
+            events += 1
+            deadline = min(deadline, time.monotonic() + batch_window)
+    return events
+
+
+def affected_resources(db, collection_name, id_range, schema_mode):
+    """
+    Resources with points in an _id range.
+
+    Returns:
+        ({resource_id: set of months (first day) of its new points}, oldest _id or None)
+    """
+    pipeline = [
+        {"$match": {"_id": id_range}},
+        {"$group": {"_id": f"${resource_id_path(schema_mode)}",
+                    "months": {"$addToSet": {"$dateTrunc": {"date": "$timestamp", "unit": "month"}}},
+                    "first_id": {"$min": "$_id"}}},
+    ]
+    resources, oldest = {}, None
+    for row in db[collection_name].aggregate(pipeline, allowDiskUse=True):
+        resources[row["_id"]] = set(row["months"])
+        if oldest is None or row["first_id"] < oldest:
+            oldest = row["first_id"]
+    return resources, oldest
+
+
+def _naive(value):
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+
+def anomaly_delta_ops(affected, rows):
+    """
+    Writes that bring the anomaly rows of the affected resources up to date.
+
+    Args:
+        affected: Resource ids that were recomputed
+        rows: Pipeline output for them (anomalies only)
+    """
+    ops = [ReplaceOne({"_id": row["_id"]}, row, upsert=True) for row in rows]
+    gone = sorted(set(affected) - {row["_id"] for row in rows})
+    if gone:
+        ops.append(DeleteMany({"_id": {"$in": gone}}))
+    return ops
+
+
+class ViewWatcher:
+    """Applies one micro-batch of new points to the views per tick()."""
+
+    def __init__(self, db, schema_mode=None, grace_seconds=DEFAULT_GRACE_SECONDS):
+        self.db = db
+        self.schema_mode = schema_mode or detect_schema_mode(db)
+        self.grace = datetime.timedelta(seconds=grace_seconds)
+        self.anomaly_windows = None
+
+    def update_waste(self, resources):
+        """Rebuild the waste rows of the affected resources; returns the number of rows written."""
+        latest = self.db[STATE_COLLECTION].find_one({}, {"month": 1}, sort=[("month", -1)])
+        if latest is None:
+            return 0
+        month = latest["month"]
+        reported = self.db[WASTE_VIEW].find_one({"period_start": {"$exists": True}}, {"period_start": 1})
+        if reported is None or reported["period_start"] != month:
+            # First run or a new month: report every resource of the latest month
+            self.db[STATE_COLLECTION].aggregate(incremental_waste_pipeline(month, WASTE_VIEW, self.schema_mode))
+            self.db[WASTE_VIEW].delete_many({"period_start": {"$ne": month}})
+            return self.db[WASTE_VIEW].count_documents({})
+        touched = [resource_id for resource_id, months in resources.items() if month in months]
+        if touched:
+            self.db[STATE_COLLECTION].aggregate(
+                incremental_waste_pipeline(month, WASTE_VIEW, self.schema_mode, resource_ids=touched))
+        return len(touched)
+
+    def update_anomalies(self, resources):
+        """
+        Recompute the anomaly rows of the affected resources.
+
+        Returns:
+            (rows upserted, rows deleted), or None when the view was rebuilt
+        """
+        view = VIEWS[ANOMALY_VIEW]
+        windows = {key: resolve_window(self.db, window) for key, window in view.windows.items()}
+        if any(window is None for window in windows.values()):
+            return 0, 0
+        if windows != self.anomaly_windows:
+            record = run_view(self.db, view, self.schema_mode)
+            if record["status"] == "ok":
+                self.anomaly_windows = windows
+            else:
+                print(f"{ANOMALY_VIEW} rebuild {record['status']}: {record.get('error')}")
+            return None
+        since = _naive(windows["previous"].start)
+        touched = [resource_id for resource_id, months in resources.items()
+                   if any(_naive(month) >= since for month in months)]
+        if not touched:
+            return 0, 0
+        pipeline = cost_anomaly_pipeline(ANOMALY_VIEW, self.schema_mode, previous_start=windows["previous"].start,
+                                         current_start=windows["current"].start, end=windows["current"].end,
+                                         resource_ids=touched)
+        rows = list(self.db["cost_data"].aggregate([stage for stage in pipeline if "$merge" not in stage],
+                                                   allowDiskUse=True))
+        ops = anomaly_delta_ops(touched, rows)
+        if ops:
+            self.db[ANOMALY_VIEW].bulk_write(ops, ordered=False)
+        return len(rows), len(touched) - len(rows)
+
+    def tick(self, now=None):
+        """
+        Process every point inserted since the previous tick, up to the points whose
+        _id is younger than the grace period (those are left for the next tick).
+
+        Returns:
+            Dict with the affected resources per collection, view updates and the
+            lag in seconds between the oldest new point's insert and the end of the
+            tick (None when nothing was new)
+        """
+        # Points with a later _id wait for the next tick, even if they are already inserted
+        upper = watermark_upper_bound(now, self.grace)
+        folded = fold_new_points(self.db, upper, WASTE_VIEW, self.schema_mode)
+        changes, oldest = {}, None
+        for collection_name in WATCHED_COLLECTIONS:
+            changes[collection_name], first_id = affected_resources(self.db, collection_name,
+                                                                    folded[collection_name], self.schema_mode)
+            if first_id is not None and (oldest is None or first_id < oldest):
+                oldest = first_id
+
+        stats = {"resources": {name: len(resources) for name, resources in changes.items()}, "lag_seconds": None}
+        if oldest is None and self.anomaly_windows is not None:
+            return stats
+        waste_resources = dict(changes["resource_utilization"])
+        for resource_id, months in changes["cost_data"].items():
+            waste_resources.setdefault(resource_id, set()).update(months)
+        stats["waste_rows"] = self.update_waste(waste_resources)
+        stats["anomalies"] = self.update_anomalies(changes["cost_data"])
+        if oldest is not None:
+            end = now or datetime.datetime.now(datetime.timezone.utc)
+            stats["lag_seconds"] = (end - oldest.generation_time).total_seconds()
+        return stats
+
+
+def watch_views(interval=DEFAULT_INTERVAL, batch_window=DEFAULT_BATCH_WINDOW, ticks=None, db=None,
+                grace_seconds=DEFAULT_GRACE_SECONDS):
+    """
+    Run micro-batches until interrupted (or for `ticks` batches).
+
+    Args:
+        interval: Longest wait between two batches, in seconds
+        batch_window: With a change stream, how long to keep collecting events after the first one
+        grace_seconds: Points whose _id is younger than this are left for a later batch
+    """
+    client = None
+    if db is None:
+        client = MongoClient(MONGO_URI)
+        db = client[DATABASE_NAME]
+    watcher = ViewWatcher(db, grace_seconds=grace_seconds)
+    stream = open_change_stream(db)
+    print(f"Watching {', '.join(WATCHED_COLLECTIONS)} for {WASTE_VIEW} and {ANOMALY_VIEW}. Ctrl+C to stop.")
+    done = 0
+    try:
+        while ticks is None or done < ticks:
+            stats = watcher.tick()
+            done += 1
+            if stats["lag_seconds"] is not None:
+                anomalies = stats["anomalies"]
+                anomalies = "rebuilt" if anomalies is None else f"{anomalies[0]} upserted, {anomalies[1]} cleared"
+                print(f"[{datetime.datetime.now():%H:%M:%S}] {stats['resources']['cost_data']} cost / "
+                      f"{stats['resources']['resource_utilization']} utilization resource(s): "
+                      f"{WASTE_VIEW} {stats['waste_rows']} row(s), {ANOMALY_VIEW} {anomalies}, "
+                      f"lag {stats['lag_seconds']:.1f}s")
+            if ticks is None or done < ticks:
+                wait_for_changes(stream, interval, batch_window)
+    except KeyboardInterrupt:
+        print("\nStopping view watcher.")
+    finally:
+        if stream is not None:
+            stream.close()
+        if client is not None:
+            client.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Keep mv_cloud_waste and mv_cost_anomalies current as data arrives")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help="Longest wait between micro-batches in seconds (default: 2)")
+    parser.add_argument("--batch-window", type=float, default=DEFAULT_BATCH_WINDOW,
+                        help="With a change stream, seconds to collect events after the first one (default: 0.5)")
+    parser.add_argument("--ticks", type=int, default=None, help="Stop after this many micro-batches")
+    parser.add_argument("--grace-seconds", type=float, default=DEFAULT_GRACE_SECONDS,
+                        help="Leave points with a younger _id for the next micro-batch, so inserts still in "
+                             "flight are not skipped (default: 5); detection lags ingest by at least this")
+    args = parser.parse_args()
+
+    watch_views(interval=args.interval, batch_window=args.batch_window, ticks=args.ticks,
+                grace_seconds=args.grace_seconds)
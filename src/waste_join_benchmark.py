@@ -0,0 +1,135 @@
+"""
+Benchmark of the two cost joins of the mv_cloud_waste pipeline.
+
+- lookup: the original plan, a correlated $lookup into cost_data for every resource
+  group, i.e. one cost_data query per resource
+- union: cost_data points of the window are $unionWith-ed into the utilization
+  stream and summed by the same $group, so cost_data is read once
+
+For each size the benchmark recreates the collections in a scratch database
+(<DATABASE_NAME>_joinbench), loads one month (December) of hourly data for
+--sizes resources per location with the scale_dataset catalog, runs both plans
+(without their $merge stage) and checks they return the same rows. The scratch
+database is dropped afterwards unless --keep is given.
+
+    python src/waste_join_benchmark.py --sizes 2 8 32
+"""
+
+import random
+import time
+
+from pymongo import MongoClient
+
+from demo_constants import (YEAR_TO_GENERATE, MONGO_URI, DATABASE_NAME)
+from create_collections import create_collections
+from gen_mv_cloud_waste import COST_JOINS, WINDOW_END, WINDOW_START, cloud_waste_pipeline
+from parallel_loader import plan_shards, store_hourly_data_parallel
+from scale_dataset import generate_scaled_applications, generate_scaled_resources
+from timeseries_schema import SCHEMA_FLAT, SCHEMA_META, SCHEMA_MODES, build_metas
+
+BENCH_DATABASE = f"{DATABASE_NAME}_joinbench"
+DEFAULT_SIZES = [2, 8, 32]
+DEFAULT_REPEATS = 3
+
+
+def plan_pipeline(cost_join, schema_mode):
+    """The waste pipeline for one cost join, minus the $merge stage."""
+    return [stage for stage in cloud_waste_pipeline(schema_mode=schema_mode, cost_join=cost_join)
+            if "$merge" not in stage]
+
+
+def time_plan(collection, pipeline, repeats=DEFAULT_REPEATS):
+    """
+    Returns:
+        (best runtime in seconds, result rows of the last run)
+    """
+    best, rows = None, []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rows = list(collection.aggregate(pipeline, allowDiskUse=True))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def same_rows(left, right):
+    """Both plans report the same resources with the same cost (up to float summation order)."""
+    def costs(rows):
+        return {row["_id"]: row["monthly_cost"] for row in rows}
+    left_costs, right_costs = costs(left), costs(right)
+    return left_costs.keys() == right_costs.keys() and all(
+        abs(left_costs[key] - right_costs[key]) <= 1e-6 * max(1.0, abs(left_costs[key])) for key in left_costs)
+
+
+def run_size(resources_per_location, seed=0, max_workers=None, schema_mode=SCHEMA_FLAT,
+             database_name=BENCH_DATABASE, repeats=DEFAULT_REPEATS, keep=False):
+    """
+    Load one month for resources_per_location resources per location and time both plans.
+
+    Returns:
+        Dict with the resource count, per-plan runtimes in seconds and whether the outputs match
+    """
+    client = MongoClient(MONGO_URI)
+    client.drop_database(database_name)
+    db = client[database_name]
+    create_collections(schema_mode, database_name=database_name)
+
+    random.seed(seed)
+    apps = generate_scaled_applications(2)
+    resources, resource_ids = generate_scaled_resources(apps, resources_per_location)
+    db["applications"].insert_many([app for _, app in apps])
+    db["cloud_resources"].insert_many(resources)
+    metas = build_metas(resources, [app for _, app in apps]) if schema_mode == SCHEMA_META else None
+    shards = []
+    for profile, ids in resource_ids.items():
+        shards.extend(shard for shard in plan_shards(profile, ids, [YEAR_TO_GENERATE], seed, metas=metas)
+                      if shard["month"] == WINDOW_START.month)
+    store_hourly_data_parallel(shards, max_workers=max_workers, database_name=database_name)
+
+    result = {"resources": len(resources)}
+    outputs = {}
+    for cost_join in COST_JOINS:
+        seconds, outputs[cost_join] = time_plan(db["resource_utilization"], plan_pipeline(cost_join, schema_mode),
+                                                repeats)
+        result[f"{cost_join}_seconds"] = seconds
+    result["rows"] = len(outputs["lookup"])
+    result["same_output"] = same_rows(outputs["lookup"], outputs["union"])
+    if not keep:
+        client.drop_database(database_name)
+    client.close()
+    return result
+
+
+def run_benchmark(sizes=None, seed=0, max_workers=None, schema_mode=SCHEMA_FLAT, repeats=DEFAULT_REPEATS,
+                  keep=False):
+    """Run every size; returns {resources_per_location: result}."""
+    results = {}
+    for size in sizes or DEFAULT_SIZES:
+        print(f"\n=== {size} resources per location, {WINDOW_START:%Y-%m-%d} to {WINDOW_END:%Y-%m-%d} ===")
+        results[size] = run_size(size, seed, max_workers, schema_mode, repeats=repeats, keep=keep)
+    return results
+
+
+def print_results(results):
+    print(f"\n{'per location':>12} {'resources':>10} {'lookup s':>9} {'union s':>8} {'speedup':>8}  output")
+    for size, result in results.items():
+        speedup = result["lookup_seconds"] / result["union_seconds"] if result["union_seconds"] else float("inf")
+        print(f"{size:>12} {result['resources']:>10} {result['lookup_seconds']:>9.3f} "
+              f"{result['union_seconds']:>8.3f} {speedup:>7.1f}x  {'same' if result['same_output'] else 'DIFFERS'}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare the $lookup and $unionWith cost joins of mv_cloud_waste")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Resources per location")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Runs per plan; the best one counts")
+    parser.add_argument("--schema-mode", choices=SCHEMA_MODES, default=SCHEMA_FLAT)
+    parser.add_argument("--keep", action="store_true", help=f"Keep the last size's data in {BENCH_DATABASE}")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, seed=args.seed, max_workers=args.workers, schema_mode=args.schema_mode,
+                            repeats=args.repeats, keep=args.keep)
+    print_results(results)